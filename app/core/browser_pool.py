@@ -0,0 +1,363 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import WebDriverException
+from app.core.config_manager import ConfigManager
+from app.core.resource_monitor import register_shared_process, unregister_shared_process
+
+try:
+    import psutil
+except ImportError: # RSS-based recycling is skipped without it
+    psutil = None
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+]
+
+HIDE_WEBDRIVER = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    })
+"""
+
+
+class PooledBrowser:
+    def __init__(self, driver, profile: str):
+        self.driver = driver
+        self.profile = profile
+        self.pages = 0
+        self.leases = 0
+        self.created_at = time.time()
+        self.last_used = time.time()
+        self.leased_by = None
+        self.aborted = False
+        self.origins = set() # visited since the last reset, for clearing storage
+
+    def rss_mb(self) -> Optional[float]:
+        """RSS of chromedriver plus the Chrome processes it started."""
+        if not psutil:
+            return None
+        try:
+            proc = psutil.Process(self.driver.service.process.pid)
+            procs = [proc] + proc.children(recursive=True)
+            return sum(p.memory_info().rss for p in procs) / 1048576
+        except (psutil.Error, AttributeError):
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        rss = self.rss_mb()
+        return {
+            "profile": self.profile,
+            "leased_by": self.leased_by,
+            "pages": self.pages,
+            "leases": self.leases,
+            "age_s": round(time.time() - self.created_at, 1),
+            "idle_s": round(time.time() - self.last_used, 1) if not self.leased_by else 0,
+            "rss_mb": round(rss, 1) if rss is not None else None
+        }
+
+
+class BrowserPool:
+    """
+    Shared Chrome instances for plugins that drive a browser.
+
+    Profiles: "headless" (scraping) and "visible" (a window the user can see
+    and interact with). Idle instances are reused; on release a headless
+    browser is reset (extra tabs closed, cookies and storage cleared, a new
+    user agent) so the next lease starts clean. An instance is retired after
+    `max_pages` navigations, above `max_rss_mb`, or after `idle_ttl_s` unused,
+    except that the `prewarm` count of idle headless browsers is kept warm once
+    a plugin has asked for it. Each profile has its own cap: `max_instances`
+    headless and `max_visible` visible browsers, so a long-lived visible window
+    never takes a scraping slot. Further leases wait. The chromedriver path is
+    resolved once per process.
+    """
+    _instance = None
+
+    def __init__(self):
+        cfg = ConfigManager.get_browser_pool_config()
+        self.max_instances = int(cfg.get("max_instances", 3))
+        self.caps = {"headless": self.max_instances, "visible": int(cfg.get("max_visible", 1))}
+        self.prewarm_count = int(cfg.get("prewarm", 1))
+        self.max_pages = int(cfg.get("max_pages", 50))
+        self.max_rss_mb = float(cfg.get("max_rss_mb", 1500))
+        self.idle_ttl = float(cfg.get("idle_ttl_s", 600))
+        self.lease_timeout = float(cfg.get("lease_timeout_s", 60))
+        # "eager" returns from driver.get at DOMContentLoaded instead of waiting for every subresource.
+        self.page_load_strategy = cfg.get("page_load_strategy", "eager")
+        self._driver_path = cfg.get("driver_path")
+        self._path_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._idle: List[PooledBrowser] = []
+        self._leased: Dict[int, PooledBrowser] = {}
+        self._starting: Dict[str, int] = {} # profile -> launches in progress
+        self._warm_target = 0 # idle headless browsers to keep, set by prewarm()
+        self._closed = False
+        self.stats = {"created": 0, "reused": 0, "recycled": 0, "waits": 0}
+        threading.Thread(target=self._reap_loop, name="browser-pool-reaper", daemon=True).start()
+
+    @classmethod
+    def get_instance(cls):
+        if not cls._instance:
+            cls._instance = cls()
+        return cls._instance
+
+    def driver_path(self) -> str:
+        with self._path_lock:
+            if not self._driver_path:
+                from webdriver_manager.chrome import ChromeDriverManager
+                self._driver_path = ChromeDriverManager().install()
+                print(f"[BrowserPool] Using chromedriver at {self._driver_path}")
+            return self._driver_path
+
+    def _options(self, profile: str):
+        options = webdriver.ChromeOptions()
+        options.add_argument(f"user-agent={random.choice(USER_AGENTS)}")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option("useAutomationExtension", False)
+        if profile == "headless":
+            options.page_load_strategy = self.page_load_strategy
+            options.add_argument("--headless")
+            options.add_argument("--window-size=1920,1080")
+            options.add_argument("--lang=en-US")
+            options.add_argument("--accept-lang=en-US,en;q=0.9")
+            # Stability Flags
+            options.add_argument("--no-sandbox")
+            options.add_argument("--disable-dev-shm-usage")
+            options.add_argument("--disable-gpu")
+        return options
+
+    def _create(self, profile: str) -> PooledBrowser:
+        service = Service(self.driver_path(), log_output="chromedriver.log")
+        driver = webdriver.Chrome(service=service, options=self._options(profile))
+        # Pool browsers outlive the task that leased them; task limits must not count or kill them.
+        register_shared_process(service.process.pid, "browser_pool")
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": HIDE_WEBDRIVER})
+        browser = PooledBrowser(driver, profile)
+        navigate = driver.get
+        def counted_get(url):
+            browser.pages += 1
+            parts = urlsplit(url)
+            if parts.scheme in ("http", "https"):
+                browser.origins.add(f"{parts.scheme}://{parts.netloc}")
+            return navigate(url)
+        driver.get = counted_get
+        self.stats["created"] += 1
+        return browser
+
+    def _count(self, profile: str) -> int:
+        """Browsers of `profile` running or starting. Call with the lock held."""
+        running = sum(1 for b in self._idle if b.profile == profile) + sum(1 for b in self._leased.values() if b.profile == profile)
+        return running + self._starting.get(profile, 0)
+
+    def acquire(self, profile: str = "headless", owner: str = None, timeout: float = None):
+        """Returns a WebDriver for exclusive use until `release()`. Raises TimeoutError if the pool stays full."""
+        timeout = self.lease_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        cap = self.caps.get(profile, 1)
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is shut down.")
+                browser = next((b for b in self._idle if b.profile == profile), None)
+                if browser:
+                    self._idle.remove(browser)
+                    self._leased[id(browser.driver)] = browser
+                    self.stats["reused"] += 1
+                    break
+                if self._count(profile) < cap:
+                    self._starting[profile] = self._starting.get(profile, 0) + 1
+                    browser = None
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"No {profile} browser free after {timeout:.0f}s ({cap} in use).")
+                self.stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        if browser is None:
+            try:
+                browser = self._create(profile)
+            finally:
+                with self._cond:
+                    self._starting[profile] -= 1
+                    if browser:
+                        self._leased[id(browser.driver)] = browser
+                    self._cond.notify_all()
+        browser.leases += 1
+        browser.leased_by = owner or profile
+        return browser.driver
+
+    def release(self, driver, broken: bool = False):
+        """Returns a driver to the pool, resetting it for the next lease or retiring it."""
+        with self._cond:
+            browser = self._leased.pop(id(driver), None)
+        if not browser:
+            return
+        browser.leased_by = None
+        browser.last_used = time.time()
+        keep = not broken and not browser.aborted and not self._closed and self._healthy(browser)
+        if keep:
+            keep = self._reset(browser)
+        if not keep:
+            self._quit(browser)
+            self.stats["recycled"] += 1
+        with self._cond:
+            if keep:
+                self._idle.append(browser)
+            self._cond.notify_all()
+        if not keep and browser.profile == "headless" and self._warm_target:
+            self._top_up(self._warm_target)
+
+    @contextmanager
+    def lease(self, profile: str = "headless", owner: str = None, timeout: float = None):
+        driver = self.acquire(profile, owner, timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = not self.is_alive(driver)
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def abort(self, driver):
+        """
+        Kills a leased browser from another thread, e.g. to cancel a slow page
+        load. The holder's pending call fails and its release discards it.
+        """
+        with self._cond:
+            browser = self._leased.get(id(driver))
+        if browser and not browser.aborted:
+            browser.aborted = True
+            self._quit(browser)
+
+    def prewarm(self, count: int = None, profile: str = "headless"):
+        """Starts idle browsers in the background until `count` of this profile are idle."""
+        count = self.prewarm_count if count is None else count
+        if profile == "headless":
+            with self._cond:
+                self._warm_target = max(self._warm_target, count)
+        self._top_up(count, profile)
+
+    def _top_up(self, count: int, profile: str = "headless"):
+        """Starts idle browsers of `profile` up to `count`, within its cap."""
+        with self._cond:
+            idle = sum(1 for b in self._idle if b.profile == profile)
+            needed = max(0, min(count - idle, self.caps.get(profile, 1) - self._count(profile)))
+            self._starting[profile] = self._starting.get(profile, 0) + needed
+        for _ in range(needed):
+            threading.Thread(target=self._warm_one, args=(profile,), name="browser-prewarm", daemon=True).start()
+
+    def _warm_one(self, profile: str):
+        browser = None
+        try:
+            browser = self._create(profile)
+        except Exception as e:
+            print(f"[BrowserPool] Prewarm failed: {e}")
+        with self._cond:
+            self._starting[profile] -= 1
+            if browser and self._closed:
+                browser, closing = None, browser
+            else:
+                closing = None
+            if browser:
+                self._idle.append(browser)
+            self._cond.notify_all()
+        if closing:
+            self._quit(closing)
+
+    def is_alive(self, driver) -> bool:
+        try:
+            driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _healthy(self, browser: PooledBrowser) -> bool:
+        if browser.pages >= self.max_pages:
+            print(f"[BrowserPool] Retiring browser after {browser.pages} pages.")
+            return False
+        rss = browser.rss_mb()
+        if rss is not None and rss > self.max_rss_mb:
+            print(f"[BrowserPool] Retiring browser at {rss:.0f} MB RSS.")
+            return False
+        return True
+
+    def _reset(self, browser: PooledBrowser) -> bool:
+        """Clears per-lease state. Visible browsers are left as the user had them."""
+        if browser.profile != "headless":
+            return self.is_alive(browser.driver)
+        driver = browser.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in browser.origins:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "local_storage,indexeddb,service_workers,cache_storage"})
+            browser.origins.clear()
+            driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": random.choice(USER_AGENTS)})
+            driver.get("about:blank")
+            browser.pages -= 1 # the reset navigation is not a page load
+            return True
+        except Exception as e:
+            print(f"[BrowserPool] Reset failed, discarding browser: {e}")
+            return False
+
+    def _quit(self, browser: PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+        try:
+            unregister_shared_process(browser.driver.service.process.pid)
+        except AttributeError:
+            pass
+
+    def _reap_loop(self):
+        while not self._closed:
+            time.sleep(min(30, max(1, self.idle_ttl / 4)))
+            now = time.time()
+            with self._cond:
+                # The most recently used idle headless browsers, up to the prewarm target, stay warm.
+                headless = sorted((b for b in self._idle if b.profile == "headless"), key=lambda b: b.last_used, reverse=True)
+                keep = {id(b) for b in headless[:self._warm_target]}
+                stale = [b for b in self._idle if now - b.last_used > self.idle_ttl and id(b) not in keep]
+                for b in stale:
+                    self._idle.remove(b)
+            for b in stale:
+                self._quit(b)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            browsers = list(self._leased.values()) + list(self._idle)
+            starting = sum(self._starting.values())
+        return {
+            "max_instances": self.max_instances,
+            "max_visible": self.caps["visible"],
+            "starting": starting,
+            "browsers": [b.status() for b in browsers],
+            **self.stats
+        }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            browsers = self._idle + list(self._leased.values())
+            self._idle = []
+            self._leased = {}
+            self._cond.notify_all()
+        for b in browsers:
+            self._quit(b)
@@ -0,0 +1,154 @@
+import time
+import asyncio
+from typing import Dict, List
+
+class StatusMessage:
+    """
+    A single chat message that is edited in place as a task progresses.
+    Edits are throttled; intermediate updates collapse into the latest one.
+    """
+
+    def __init__(self, outbox, chat_id, message_id, text: str):
+        self.outbox = outbox
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+        self._pending = None
+        self._last_edit = time.monotonic()
+        self._flush_task = None
+
+    async def update(self, text: str):
+        if text == self.text or text == self._pending:
+            return
+        self._pending = text
+        wait = self.outbox.min_edit_interval - (time.monotonic() - self._last_edit)
+        if wait <= 0:
+            await self._apply()
+        elif not self._flush_task:
+            self._flush_task = asyncio.create_task(self._deferred(wait))
+
+    async def finish(self, text: str):
+        """Final edit; waits out the throttle window instead of dropping it."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = text
+        wait = self.outbox.min_edit_interval - (time.monotonic() - self._last_edit)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self._apply()
+
+    async def _deferred(self, wait: float):
+        await asyncio.sleep(wait)
+        self._flush_task = None
+        await self._apply()
+
+    async def _apply(self):
+        text, self._pending = self._pending, None
+        if text is None or text == self.text:
+            return
+        self._last_edit = time.monotonic()
+        try:
+            await self.outbox.throttle()
+            await self.outbox.bot.edit_message_text(chat_id=self.chat_id, message_id=self.message_id, text=text[:self.outbox.max_len])
+            self.text = text
+        except Exception as e:
+            print(f"[Outbox] Edit failed for chat {self.chat_id}: {e}")
+
+
+class ChatOutbox:
+    """
+    Outbound message queue for a Telegram bot.
+
+    Texts sent to the same chat in quick succession are coalesced into one
+    message, every chat is held to `min_send_interval` between messages, and
+    the bot as a whole stays under `global_rate` calls per second, which keeps
+    us inside Telegram's flood limits.
+    """
+
+    def __init__(self, bot, min_send_interval: float = 1.0, min_edit_interval: float = 3.0,
+                 global_rate: float = 25.0, max_len: int = 4096):
+        self.bot = bot
+        self.min_send_interval = min_send_interval
+        self.min_edit_interval = min_edit_interval
+        self.max_len = max_len
+        self._global_gap = 1.0 / global_rate
+        self._global_next = 0.0
+        self._global_lock = asyncio.Lock()
+        self._pending: Dict[int, List[str]] = {}
+        self._last_send: Dict[int, float] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    async def throttle(self):
+        async with self._global_lock:
+            now = time.monotonic()
+            wait = self._global_next - now
+            self._global_next = max(now, self._global_next) + self._global_gap
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def status(self, chat_id, text: str) -> StatusMessage:
+        """Sends a message right away and returns a handle for editing it later."""
+        await self.throttle()
+        msg = await self.bot.send_message(chat_id=chat_id, text=text)
+        self._last_send[chat_id] = time.monotonic()
+        return StatusMessage(self, chat_id, msg.message_id, text)
+
+    def send(self, chat_id, text: str):
+        """Queues a text message; a burst of queued texts goes out as one message."""
+        self._pending.setdefault(chat_id, []).append(text)
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+
+    async def send_files(self, chat_id, paths: List[str]):
+        """Uploads files as media groups (up to 10 per message) instead of one message each."""
+        from telegram import InputMediaDocument
+        for i in range(0, len(paths), 10):
+            chunk = paths[i:i + 10]
+            handles = [open(p, "rb") for p in chunk]
+            try:
+                await self.throttle()
+                if len(handles) == 1:
+                    await self.bot.send_document(chat_id=chat_id, document=handles[0])
+                else:
+                    await self.bot.send_media_group(chat_id=chat_id, media=[InputMediaDocument(h) for h in handles])
+            finally:
+                for h in handles:
+                    h.close()
+
+    async def flush(self, chat_id):
+        worker = self._workers.get(chat_id)
+        if worker:
+            await worker
+
+    async def _drain(self, chat_id):
+        try:
+            while self._pending.get(chat_id):
+                wait = self.min_send_interval - (time.monotonic() - self._last_send.get(chat_id, 0))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                texts = self._pending.pop(chat_id, [])
+                for chunk in self._coalesce(texts):
+                    await self.throttle()
+                    try:
+                        await self.bot.send_message(chat_id=chat_id, text=chunk)
+                    except Exception as e:
+                        print(f"[Outbox] Send failed for chat {chat_id}: {e}")
+                    self._last_send[chat_id] = time.monotonic()
+        finally:
+            self._workers.pop(chat_id, None)
+
+    def _coalesce(self, texts: List[str]) -> List[str]:
+        chunks = []
+        current = ""
+        for text in texts:
+            for part in [text[i:i + self.max_len] for i in range(0, len(text), self.max_len)] or [""]:
+                candidate = f"{current}\n\n{part}" if current else part
+                if len(candidate) <= self.max_len:
+                    current = candidate
+                else:
+                    chunks.append(current)
+                    current = part
+        if current:
+            chunks.append(current)
+        return chunks
@@ -0,0 +1,109 @@
+import time
+import threading
+from typing import Dict, Any, List
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker for an unreliable dependency.
+
+    CLOSED: calls flow; consecutive failures are counted.
+    OPEN: calls are refused until `cooldown` seconds have passed.
+    HALF_OPEN: one probe call is let through; success closes the breaker,
+    failure re-opens it for another cooldown.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.total_failures = 0
+        self.total_successes = 0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may proceed. In HALF_OPEN only one probe is allowed at a time."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self.failures = 0
+            self.state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.total_failures += 1
+            self.failures += 1
+            self.last_error = str(error)[:200] if error else None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.time()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Frees a HALF_OPEN probe slot when the call ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_in(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.time() - self.opened_at))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "retry_in_s": round(self.retry_in(), 1),
+            "last_error": self.last_error,
+            "total_failures": self.total_failures,
+            "total_successes": self.total_successes
+        }
+
+
+_registry: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(name: str, failure_threshold: int = 3, cooldown: float = 30.0) -> CircuitBreaker:
+    """
+    Returns the process-wide breaker for `name`, creating it on first use. The
+    thresholds passed are applied to an existing breaker too, so a config
+    reload takes effect without losing its state.
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = CircuitBreaker(name, failure_threshold, cooldown)
+        breaker = _registry[name]
+        breaker.failure_threshold = failure_threshold
+        breaker.cooldown = cooldown
+        return breaker
+
+def all_breakers() -> List[Dict[str, Any]]:
+    with _registry_lock:
+        breakers = list(_registry.values())
+    return [b.status() for b in breakers]
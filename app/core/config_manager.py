@@ -29,6 +29,22 @@ class ConfigManager:
     def get_plugin_config(cls, plugin_id: str):
         return cls._config.get("plugins", {}).get(plugin_id, {})
 
+    @classmethod
+    def get_plugin_loading_config(cls):
+        return cls._config.get("plugin_loading", {})
+
+    @classmethod
+    def get_browser_pool_config(cls):
+        return cls._config.get("browser_pool", {})
+
+    @classmethod
+    def get_telegram_config(cls):
+        return cls._config.get("telegram", {})
+
+    @classmethod
+    def get_llm_config(cls):
+        return cls._config.get("llm", {})
+
     @classmethod
     def is_docker_allowed(cls):
         return cls.get_features().get("docker_enabled", False)
@@ -0,0 +1,166 @@
+import time
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+from sqlalchemy import create_engine, Column, Integer, String, Float, Text, func
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from app.core.config_manager import ConfigManager
+
+Base = declarative_base()
+
+class CacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    key = Column(String, primary_key=True)
+    provider = Column(String)
+    model = Column(String)
+    site = Column(String, index=True)
+    response_text = Column(Text)
+    size_bytes = Column(Integer)
+    prompt_chars = Column(Integer)
+    latency_s = Column(Float) # provider latency when the entry was recorded
+    created_at = Column(Float)
+    last_access = Column(Float, index=True)
+    hits = Column(Integer, default=0)
+
+
+class LLMCache:
+    """
+    Opt-in disk cache for LLM responses, keyed on provider, model and a hash of
+    the prompt. Call sites opt in by name (e.g. "deals.analyze"); each name can
+    be switched off or given its own TTL under `llm.cache.sites` in config.json.
+    Total size is capped and the least recently used entries are evicted.
+    """
+    _instance = None
+
+    def __init__(self, path: str = "llm_cache.db", max_bytes: int = 50 * 1024 * 1024,
+                 default_ttl: float = 86400, enabled: bool = True, sites: Dict[str, Any] = None):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sites = sites or {}
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self._lock = threading.Lock()
+        self.stats_by_site: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def get_instance(cls):
+        if not cls._instance:
+            cfg = ConfigManager.get_llm_config().get("cache", {})
+            cls._instance = cls(
+                path=cfg.get("path", "llm_cache.db"),
+                max_bytes=int(cfg.get("max_mb", 50) * 1024 * 1024),
+                default_ttl=cfg.get("default_ttl_s", 86400),
+                enabled=cfg.get("enabled", True),
+                sites=cfg.get("sites", {})
+            )
+        return cls._instance
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{provider}:{model}:{digest}"
+
+    def site_policy(self, site: str) -> Optional[float]:
+        """Returns the TTL for a call site, or None if caching is off for it."""
+        if not self.enabled or not site:
+            return None
+        policy = self.sites.get(site, {})
+        if policy.get("enabled") is False:
+            return None
+        return policy.get("ttl_s", self.default_ttl)
+
+    def _site_stats(self, site: str) -> Dict[str, float]:
+        if site not in self.stats_by_site:
+            self.stats_by_site[site] = {"hits": 0, "misses": 0, "saved_latency_s": 0.0, "saved_tokens_est": 0}
+        return self.stats_by_site[site]
+
+    def get(self, site: str, key, ttl: float) -> Optional[str]:
+        """Looks up `key` (or the first live entry among a list of keys)."""
+        now = time.time()
+        keys = key if isinstance(key, list) else [key]
+        with self._lock:
+            db = self.Session()
+            try:
+                stats = self._site_stats(site)
+                entry = None
+                for k in keys:
+                    candidate = db.get(CacheEntry, k)
+                    if candidate and not (ttl and now - candidate.created_at > ttl):
+                        entry = candidate
+                        break
+                if not entry:
+                    stats["misses"] += 1
+                    return None
+                entry.last_access = now
+                entry.hits = (entry.hits or 0) + 1
+                db.commit()
+                stats["hits"] += 1
+                stats["saved_latency_s"] += entry.latency_s or 0.0
+                # Rough token estimate (~4 chars per token) for prompt + completion.
+                stats["saved_tokens_est"] += (entry.prompt_chars + len(entry.response_text)) // 4
+                return entry.response_text
+            finally:
+                db.close()
+
+    def put(self, site: str, key: str, provider: str, model: str, prompt: str, text: str, latency_s: float):
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            db = self.Session()
+            try:
+                db.merge(CacheEntry(
+                    key=key, provider=provider, model=model, site=site,
+                    response_text=text, size_bytes=size, prompt_chars=len(prompt),
+                    latency_s=latency_s, created_at=now, last_access=now, hits=0
+                ))
+                db.commit()
+                self._evict(db)
+            finally:
+                db.close()
+
+    def _evict(self, db):
+        total = db.query(func.coalesce(func.sum(CacheEntry.size_bytes), 0)).scalar()
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in db.query(CacheEntry.key, CacheEntry.size_bytes).order_by(CacheEntry.last_access.asc()):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size or 0
+        db.query(CacheEntry).filter(CacheEntry.key.in_(victims)).delete(synchronize_session=False)
+        db.commit()
+
+    def clear(self):
+        with self._lock:
+            db = self.Session()
+            try:
+                db.query(CacheEntry).delete()
+                db.commit()
+            finally:
+                db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        db = self.Session()
+        try:
+            entries, size = db.query(func.count(CacheEntry.key), func.coalesce(func.sum(CacheEntry.size_bytes), 0)).one()
+        finally:
+            db.close()
+        sites = {k: dict(v) for k, v in self.stats_by_site.items()}
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": sum(s["hits"] for s in sites.values()),
+            "misses": sum(s["misses"] for s in sites.values()),
+            "saved_latency_s": round(sum(s["saved_latency_s"] for s in sites.values()), 2),
+            "saved_tokens_est": sum(s["saved_tokens_est"] for s in sites.values()),
+            "sites": sites
+        }
@@ -1,91 +1,423 @@
 import os
+import time
+import queue
+import random
+import asyncio
+import threading
+from collections import deque
+from app.core.config_manager import ConfigManager
+from app.core.llm_cache import LLMCache
+from app.core.llm_providers import create_provider, ClientPool
+from app.core.circuit_breaker import get_breaker
+from app.core.llm_replay import recording_enabled, wrap_for_recording
 
 class LLMResponse:
     def __init__(self, text: str):
         self.text = text
 
+_STREAM_END = object()
+
+class LLMStream:
+    """
+    Blocking iterator over a streamed generation running on the LLM loop.
+
+    Yields text chunks as they arrive and tracks how much has been received.
+    Closing it (or leaving its `with` block early, e.g. when a plugin's
+    check_stop raises) cancels the request mid-stream.
+    """
+
+    def __init__(self, loop, agen, idle_timeout: float):
+        self._loop = loop
+        self._queue = queue.Queue()
+        self._idle_timeout = idle_timeout
+        self._done = False
+        self.chunks = 0
+        self.bytes_received = 0
+        self.started_at = time.time()
+        self._future = asyncio.run_coroutine_threadsafe(self._pump(agen), loop)
+
+    async def _pump(self, agen):
+        try:
+            async for chunk in agen:
+                self._queue.put(chunk)
+            self._queue.put(_STREAM_END)
+        except asyncio.CancelledError:
+            self._queue.put(_STREAM_END)
+            raise
+        except BaseException as e:
+            self._queue.put(e)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self._done:
+            raise StopIteration
+        try:
+            item = self._queue.get(timeout=self._idle_timeout)
+        except queue.Empty:
+            self.close()
+            raise TimeoutError(f"LLM stream stalled for {self._idle_timeout}s.")
+        if item is _STREAM_END:
+            self._done = True
+            raise StopIteration
+        if isinstance(item, BaseException):
+            self._done = True
+            raise item
+        self.chunks += 1
+        self.bytes_received += len(item.encode("utf-8"))
+        return item
+
+    def close(self):
+        self._done = True
+        if not self._future.done():
+            self._future.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Timeouts, connection drops, rate limits and 5xx responses are worth retrying elsewhere."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        code = getattr(exc, "code", None)
+        status = code if isinstance(code, int) else None
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return any(marker in name for marker in (
+        "RateLimit", "Timeout", "Connection", "ServiceUnavailable",
+        "ResourceExhausted", "InternalServer", "DeadlineExceeded", "Overloaded"
+    ))
+
+
+class ProviderHandle:
+    """One provider in the failover chain: its client pool, breaker and latency history."""
+
+    def __init__(self, provider, pool_size: int, breaker_cfg: dict):
+        self.provider = provider
+        self.name = provider.name
+        self.pool = ClientPool(provider, pool_size)
+        self.breaker = get_breaker(
+            f"llm:{provider.name}",
+            failure_threshold=breaker_cfg.get("failure_threshold", 3),
+            cooldown=breaker_cfg.get("cooldown_s", 30)
+        )
+        self.latencies = deque(maxlen=200)
+        self.calls = 0
+        self.errors = 0
+
+    def percentile(self, pct: float):
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+    def stats(self):
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            **self.pool.stats(),
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_s": round(p50, 2) if p50 is not None else None,
+            "p95_s": round(p95, 2) if p95 is not None else None,
+            "breaker": self.breaker.state
+        }
+
+
 class LLMManager:
+    """
+    Process-wide entry point for LLM calls.
+
+    All provider I/O runs on one background event loop. `agenerate_content` is
+    the native API; `generate_content` is a blocking shim for existing callers.
+    Each provider gets a pool of async clients whose size caps concurrent
+    requests, and every request is bounded by a timeout.
+
+    Providers form an ordered chain (`LLM_PROVIDERS`, or just `LLM_PROVIDER`).
+    Transient errors are retried with backoff and then fail over down the
+    chain; a per-provider circuit breaker skips providers that keep failing.
+    With hedging enabled, a second provider is started if the first has not
+    answered within its p95 latency, and the first good answer wins.
+    """
     _instance = None
+    _instance_lock = threading.Lock()
 
     def __init__(self):
+        cfg = ConfigManager.get_llm_config()
         self.provider = None
         self.model_name = None
-        self._client = None
-        self._model = None
+        self.timeout = float(os.getenv("LLM_TIMEOUT", cfg.get("timeout_s", 120)))
+        self.concurrency = cfg.get("concurrency", {})
+        self.retries = int(cfg.get("retries", 2))
+        self.backoff = float(cfg.get("retry_backoff_s", 0.5))
+        self.breaker_cfg = cfg.get("circuit_breaker", {})
+        hedge = cfg.get("hedge", {})
+        self.hedge_enabled = bool(hedge.get("enabled", False))
+        self.hedge_percentile = float(hedge.get("percentile", 95))
+        self.hedge_min_delay = float(hedge.get("min_delay_s", 1.0))
+        self.hedge_default_delay = float(hedge.get("default_delay_s", 8.0))
+        self.hedge_stats = {"fired": 0, "won": 0}
+        self.chain = []
+        self._loop = None
+        self._loop_thread = None
         self._configure_from_env()
 
     @classmethod
     def get_instance(cls):
         if not cls._instance:
-            cls._instance = cls()
+            with cls._instance_lock:
+                if not cls._instance:
+                    cls._instance = cls()
         return cls._instance
 
     def _configure_from_env(self):
         provider = os.getenv("LLM_PROVIDER", "gemini").strip().lower()
+        names = [provider]
+        for extra in os.getenv("LLM_PROVIDERS", "").split(","):
+            extra = extra.strip().lower()
+            if extra and extra not in names:
+                names.append(extra)
+
+        # The primary provider must be usable; fallbacks without keys are skipped.
+        self.chain = []
+        for name in names:
+            try:
+                instance = create_provider(name)
+            except ValueError as e:
+                if name == provider:
+                    raise
+                print(f"[LLM] Skipping fallback provider '{name}': {e}")
+                continue
+            if name != "replay" and recording_enabled():
+                instance = wrap_for_recording(instance)
+            self.chain.append(ProviderHandle(instance, int(self.concurrency.get(name, 4)), self.breaker_cfg))
+
         self.provider = provider
+        self.model_name = self.chain[0].provider.model_name
 
-        if provider == "gemini":
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY not set for Gemini.")
-            import google.generativeai as genai
-            genai.configure(api_key=api_key)
-            self.model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
-            self._model = genai.GenerativeModel(self.model_name)
-            self._client = None
-            return
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._instance_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._loop_thread = threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True)
+                    self._loop_thread.start()
+                    self._loop = loop
+        return self._loop
 
-        if provider == "gpt":
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY not set for GPT.")
-            from openai import OpenAI
-            self._client = OpenAI(api_key=api_key)
-            self.model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-            self._model = None
-            return
+    def generate_content(self, prompt: str, cache: str = None, timeout: float = None):
+        """
+        Blocking wrapper around `agenerate_content` for synchronous callers.
+        Pass `cache="<site name>"` to opt this call site into the response cache.
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._loop_thread:
+            raise RuntimeError("generate_content() called from the LLM event loop; await agenerate_content() instead.")
+        future = asyncio.run_coroutine_threadsafe(self._generate(prompt, cache, timeout), loop)
+        return future.result()
+
+    async def agenerate_content(self, prompt: str, cache: str = None, timeout: float = None):
+        """Async generation. Safe to await from any event loop."""
+        loop = self._ensure_loop()
+        coro = self._generate(prompt, cache, timeout)
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def stream_content(self, prompt: str, timeout: float = None) -> LLMStream:
+        """
+        Streams a generation as a blocking iterator of text chunks.
+        `timeout` bounds the wait for each chunk, not the whole response.
+        """
+        loop = self._ensure_loop()
+        return LLMStream(loop, self._stream_provider(prompt), timeout or self.timeout)
 
-        if provider == "claude":
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY not set for Claude.")
-            from anthropic import Anthropic
-            self._client = Anthropic(api_key=api_key)
-            self.model_name = os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-latest")
-            self._model = None
+    async def astream_content(self, prompt: str, timeout: float = None):
+        """Async iterator of text chunks. Safe to consume from any event loop."""
+        loop = self._ensure_loop()
+        agen = self._stream_provider(prompt)
+        if asyncio.get_running_loop() is loop:
+            async for chunk in agen:
+                yield chunk
             return
+        with LLMStream(loop, agen, timeout or self.timeout) as stream:
+            while True:
+                chunk = await asyncio.to_thread(next, stream, _STREAM_END)
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+
+    async def _stream_provider(self, prompt: str):
+        # Stall detection is done by the consumer (LLMStream's idle timeout), which
+        # cancels this generator; wrapping each chunk in wait_for would move the SDK
+        # stream across tasks.
+        # Failover is only possible before the first chunk has been handed out.
+        last_error = None
+        for handle in self.chain:
+            if not handle.breaker.allow():
+                continue
+            started = False
+            handle.calls += 1
+            try:
+                async with handle.pool.lease() as client:
+                    agen = handle.provider.stream(client, prompt)
+                    try:
+                        async for chunk in agen:
+                            started = True
+                            yield chunk
+                    finally:
+                        await agen.aclose()
+                handle.breaker.record_success()
+                return
+            except asyncio.CancelledError:
+                handle.breaker.release_probe()
+                raise
+            except GeneratorExit:
+                handle.breaker.release_probe()
+                raise
+            except Exception as e:
+                handle.errors += 1
+                if is_transient_error(e):
+                    handle.breaker.record_failure(e)
+                else:
+                    handle.breaker.release_probe()
+                if started:
+                    raise
+                print(f"[LLM] {handle.provider.label} stream failed, trying next provider: {e}")
+                last_error = e
+        raise RuntimeError(f"All LLM providers failed or are unavailable. Last error: {last_error}")
 
-        raise ValueError(f"Unsupported LLM_PROVIDER '{provider}'.")
+    async def _generate(self, prompt: str, cache: str, timeout: float):
+        llm_cache = LLMCache.get_instance()
+        ttl = llm_cache.site_policy(cache)
+        if ttl is None:
+            text, _ = await self._call_chain(prompt, timeout)
+            return LLMResponse(text)
 
-    def generate_content(self, prompt: str):
-        if self.provider == "gemini":
-            return self._model.generate_content(prompt)
+        # An answer from any provider in the chain is acceptable.
+        keys = [LLMCache.make_key(h.name, h.provider.model_name, prompt) for h in self.chain]
+        text = await asyncio.to_thread(llm_cache.get, cache, keys, ttl)
+        if text is not None:
+            return LLMResponse(text)
 
-        if self.provider == "gpt":
-            # Prefer Responses API, fall back to Chat Completions if needed.
+        start = time.time()
+        text, handle = await self._call_chain(prompt, timeout)
+        key = LLMCache.make_key(handle.name, handle.provider.model_name, prompt)
+        await asyncio.to_thread(llm_cache.put, cache, key, handle.name, handle.provider.model_name, prompt, text, time.time() - start)
+        return LLMResponse(text)
+
+    async def _call_chain(self, prompt: str, timeout: float = None):
+        """Runs the prompt down the provider chain. Returns (text, answering handle)."""
+        remaining = list(self.chain)
+        errors = []
+
+        if self.hedge_enabled and len(remaining) >= 2:
+            result = await self._call_hedged(prompt, timeout, remaining, errors)
+            if result:
+                return result
+
+        while remaining:
+            handle = remaining.pop(0)
+            if not handle.breaker.allow():
+                errors.append(f"{handle.name}: circuit open")
+                continue
+            try:
+                return await self._call_with_retry(handle, prompt, timeout), handle
+            except Exception as e:
+                errors.append(f"{handle.name}: {e}")
+                print(f"[LLM] {handle.provider.label} failed, trying next provider: {e}")
+        raise RuntimeError("All LLM providers failed. " + "; ".join(errors))
+
+    async def _call_hedged(self, prompt, timeout, remaining, errors):
+        """
+        Starts the first available provider; if it has not answered after its
+        p95 latency, starts the next one too and takes whichever succeeds first.
+        Consumes the handles it tried from `remaining`. Returns None if all failed.
+        """
+        handles = []
+        while remaining and len(handles) < 2:
+            handle = remaining.pop(0)
+            if handle.breaker.allow():
+                handles.append(handle)
+            else:
+                errors.append(f"{handle.name}: circuit open")
+        if not handles:
+            return None
+
+        tasks = {asyncio.ensure_future(self._call_with_retry(handles[0], prompt, timeout)): handles[0]}
+        if len(handles) > 1:
+            p = handles[0].percentile(self.hedge_percentile)
+            delay = max(self.hedge_min_delay, p) if p is not None else self.hedge_default_delay
+            done, _ = await asyncio.wait(tasks.keys(), timeout=delay)
+            if not done or next(iter(done)).exception() is not None:
+                self.hedge_stats["fired"] += 1
+                tasks[asyncio.ensure_future(self._call_with_retry(handles[1], prompt, timeout))] = handles[1]
+            else:
+                # Primary answered in time; the hedge slot was never used.
+                handles[1].breaker.release_probe()
+
+        pending = set(tasks.keys())
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] is not handles[0]:
+                            self.hedge_stats["won"] += 1
+                        return task.result(), tasks[task]
+                    errors.append(f"{tasks[task].name}: {task.exception()}")
+        finally:
+            for task in pending:
+                task.cancel()
+        return None
+
+    async def _call_with_retry(self, handle: ProviderHandle, prompt: str, timeout: float = None) -> str:
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            handle.calls += 1
+            start = time.time()
             try:
-                resp = self._client.responses.create(
-                    model=self.model_name,
-                    input=prompt
-                )
-                return LLMResponse(resp.output_text)
-            except Exception:
-                resp = self._client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                text = resp.choices[0].message.content if resp.choices else ""
-                return LLMResponse(text or "")
-
-        if self.provider == "claude":
-            resp = self._client.messages.create(
-                model=self.model_name,
-                max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            text = ""
-            if resp.content and len(resp.content) > 0:
-                text = resp.content[0].text
-            return LLMResponse(text or "")
-
-        raise ValueError(f"Unsupported LLM_PROVIDER '{self.provider}'.")
+                async with handle.pool.lease() as client:
+                    try:
+                        text = await asyncio.wait_for(handle.provider.generate(client, prompt), timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"{handle.provider.label} request timed out after {timeout}s.")
+                handle.latencies.append(time.time() - start)
+                handle.breaker.record_success()
+                return text
+            except asyncio.CancelledError:
+                handle.breaker.release_probe()
+                raise
+            except Exception as e:
+                handle.errors += 1
+                if not is_transient_error(e):
+                    # Bad request, auth, etc. Not a health signal; let the chain move on.
+                    handle.breaker.release_probe()
+                    raise
+                handle.breaker.record_failure(e)
+                if attempt >= self.retries or not handle.breaker.allow():
+                    raise
+                attempt += 1
+                delay = self.backoff * (2 ** (attempt - 1))
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    def pool_stats(self):
+        return self.chain[0].pool.stats()
+
+    def stats(self):
+        return {
+            "provider": self.provider,
+            "model": self.model_name,
+            "chain": [h.stats() for h in self.chain],
+            "hedging": {"enabled": self.hedge_enabled, **self.hedge_stats}
+        }
@@ -0,0 +1,211 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator
+
+class LLMProvider:
+    """
+    Adapter for one LLM provider. Subclasses know how to build an async SDK
+    client and run a single prompt through it; pooling, timeouts and caching
+    live in LLMManager.
+    """
+    name = None
+    label = None
+    env_key = None
+    model_env = None
+    default_model = None
+
+    def __init__(self):
+        self.api_key = os.getenv(self.env_key) if self.env_key else None
+        if self.env_key and not self.api_key:
+            raise ValueError(f"{self.env_key} not set for {self.label}.")
+        self.model_name = os.getenv(self.model_env, self.default_model) if self.model_env else self.default_model
+
+    def create_client(self):
+        raise NotImplementedError
+
+    async def generate(self, client, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def stream(self, client, prompt: str) -> AsyncIterator[str]:
+        """Yields text deltas as the provider produces them."""
+        raise NotImplementedError
+        yield
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    label = "Gemini"
+    env_key = "GOOGLE_API_KEY"
+    model_env = "GEMINI_MODEL"
+    default_model = "gemini-2.0-flash"
+
+    def create_client(self):
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(self.model_name)
+
+    async def generate(self, client, prompt: str) -> str:
+        resp = await client.generate_content_async(prompt)
+        return resp.text
+
+    async def stream(self, client, prompt: str) -> AsyncIterator[str]:
+        resp = await client.generate_content_async(prompt, stream=True)
+        async for chunk in resp:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) raise on .text
+                continue
+            if text:
+                yield text
+
+
+class OpenAIProvider(LLMProvider):
+    name = "gpt"
+    label = "GPT"
+    env_key = "OPENAI_API_KEY"
+    model_env = "OPENAI_MODEL"
+    default_model = "gpt-4o-mini"
+
+    def create_client(self):
+        from openai import AsyncOpenAI
+        # Retries and failover are handled by LLMManager.
+        return AsyncOpenAI(api_key=self.api_key, max_retries=0)
+
+    async def generate(self, client, prompt: str) -> str:
+        # Prefer Responses API, fall back to Chat Completions if needed.
+        try:
+            resp = await client.responses.create(model=self.model_name, input=prompt)
+            return resp.output_text
+        except Exception:
+            resp = await client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            text = resp.choices[0].message.content if resp.choices else ""
+            return text or ""
+
+    async def stream(self, client, prompt: str) -> AsyncIterator[str]:
+        # Same preference as generate(); fall back only if nothing was streamed yet.
+        streamed = False
+        try:
+            events = await client.responses.create(model=self.model_name, input=prompt, stream=True)
+            async for event in events:
+                if event.type == "response.output_text.delta" and event.delta:
+                    streamed = True
+                    yield event.delta
+            return
+        except Exception:
+            if streamed:
+                raise
+        events = await client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for event in events:
+            delta = event.choices[0].delta.content if event.choices else None
+            if delta:
+                yield delta
+
+
+class ClaudeProvider(LLMProvider):
+    name = "claude"
+    label = "Claude"
+    env_key = "ANTHROPIC_API_KEY"
+    model_env = "CLAUDE_MODEL"
+    default_model = "claude-3-5-sonnet-latest"
+
+    def create_client(self):
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(api_key=self.api_key, max_retries=0)
+
+    async def generate(self, client, prompt: str) -> str:
+        resp = await client.messages.create(
+            model=self.model_name,
+            max_tokens=2048,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        text = ""
+        if resp.content and len(resp.content) > 0:
+            text = resp.content[0].text
+        return text or ""
+
+    async def stream(self, client, prompt: str) -> AsyncIterator[str]:
+        async with client.messages.stream(
+            model=self.model_name,
+            max_tokens=2048,
+            messages=[{"role": "user", "content": prompt}]
+        ) as events:
+            async for text in events.text_stream:
+                if text:
+                    yield text
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    OpenAIProvider.name: OpenAIProvider,
+    ClaudeProvider.name: ClaudeProvider,
+}
+
+def create_provider(name: str) -> LLMProvider:
+    if name == "replay":
+        # Offline provider backed by recorded fixtures (see llm_replay.py).
+        from app.core.llm_replay import ReplayProvider
+        return ReplayProvider()
+    provider_class = PROVIDERS.get(name)
+    if not provider_class:
+        raise ValueError(f"Unsupported LLM_PROVIDER '{name}'.")
+    return provider_class()
+
+
+class ClientPool:
+    """
+    Pool of async SDK clients for one provider. The semaphore caps how many
+    requests are in flight at once; clients are created lazily up to that cap
+    and reused. Must only be used from the LLMManager event loop.
+    """
+
+    def __init__(self, provider: LLMProvider, size: int):
+        self.provider = provider
+        self.size = size
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def lease(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            if self._idle:
+                client = self._idle.pop()
+            else:
+                client = self.provider.create_client()
+                self._created += 1
+            self._in_use += 1
+            try:
+                yield client
+            finally:
+                self._in_use -= 1
+                self._idle.append(client)
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider.name,
+            "model": self.provider.model_name,
+            "size": self.size,
+            "clients": self._created,
+            "in_use": self._in_use,
+            "waiting": self._waiting
+        }
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import asyncio
+import difflib
+import hashlib
+import threading
+from typing import Dict, Any, List, AsyncIterator, Optional
+from app.core.config_manager import ConfigManager
+from app.core.llm_providers import LLMProvider
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """
+    Recorded LLM exchanges in a JSON-lines file, one exchange per line.
+    Several recordings of the same prompt are replayed round-robin.
+    """
+    _stores: Dict[str, "FixtureStore"] = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._load()
+
+    @classmethod
+    def open(cls, path: str) -> "FixtureStore":
+        with cls._stores_lock:
+            if path not in cls._stores:
+                cls._stores[path] = cls(path)
+            return cls._stores[path]
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._by_key.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self):
+        return sum(len(v) for v in self._by_key.values())
+
+    def find(self, prompt: str, nearest: bool = False) -> Optional[Dict[str, Any]]:
+        key = prompt_key(prompt)
+        with self._lock:
+            entries = self._by_key.get(key)
+            if not entries and nearest and self._by_key:
+                # Prompts that embed timestamps or scraped data rarely repeat exactly.
+                candidates = [v[0] for v in self._by_key.values()]
+                best = max(candidates, key=lambda e: difflib.SequenceMatcher(None, prompt, e.get("prompt", "")).quick_ratio())
+                key = best["key"]
+                entries = self._by_key[key]
+            if not entries:
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return entries[index % len(entries)]
+
+    def append(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._by_key.setdefault(entry["key"], []).append(entry)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def _replay_config() -> Dict[str, Any]:
+    cfg = dict(ConfigManager.get_llm_config().get("replay", {}))
+    cfg["path"] = os.getenv("LLM_FIXTURES", cfg.get("path", "llm_fixtures.jsonl"))
+    return cfg
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Serves recorded responses instead of calling a real model.
+
+    `llm.replay.latency` is either "recorded" (replay the captured timing) or a
+    fixed number of seconds; `latency_scale` multiplies it. Streams are split
+    into `chunk_chars` pieces spread over the latency. With `on_miss: "nearest"`
+    an unknown prompt gets the most similar recorded one; otherwise it fails.
+    """
+    name = "replay"
+    label = "Replay"
+    default_model = "replay"
+
+    def __init__(self):
+        super().__init__()
+        self.settings = _replay_config()
+        self.store = FixtureStore.open(self.settings["path"])
+        print(f"[LLM] Replay provider: {len(self.store)} recorded exchanges from {self.settings['path']}")
+
+    def create_client(self):
+        return self.store
+
+    def _lookup(self, store: FixtureStore, prompt: str) -> Dict[str, Any]:
+        entry = store.find(prompt, nearest=self.settings.get("on_miss") == "nearest")
+        if not entry:
+            raise LookupError(f"No recorded response for prompt {prompt_key(prompt)[:12]} ({len(prompt)} chars).")
+        return entry
+
+    def _latency(self, entry: Dict[str, Any]):
+        latency = self.settings.get("latency", "recorded")
+        scale = float(self.settings.get("latency_scale", 1.0))
+        if latency == "recorded":
+            total = float(entry.get("latency_s") or 0.0)
+            ttft = float(entry.get("ttft_s") or total)
+        else:
+            total = float(latency)
+            ttft = total * 0.2
+        return total * scale, min(ttft, total) * scale
+
+    async def generate(self, client, prompt: str) -> str:
+        entry = self._lookup(client, prompt)
+        total, _ = self._latency(entry)
+        await asyncio.sleep(total)
+        return entry["response"]
+
+    async def stream(self, client, prompt: str) -> AsyncIterator[str]:
+        entry = self._lookup(client, prompt)
+        total, ttft = self._latency(entry)
+        text = entry["response"]
+        size = max(1, int(self.settings.get("chunk_chars", 64)))
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        gap = (total - ttft) / max(1, len(chunks) - 1)
+        await asyncio.sleep(ttft)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(gap)
+            yield chunk
+
+
+class RecordingProvider:
+    """
+    Wraps a real provider and appends every completed exchange to a fixture
+    store. Keeps the wrapped provider's name and model, so breakers, pools
+    and cache keys are unchanged.
+    """
+
+    def __init__(self, inner: LLMProvider, store: FixtureStore):
+        self.inner = inner
+        self.store = store
+        self.name = inner.name
+        self.label = inner.label
+        self.model_name = inner.model_name
+
+    def create_client(self):
+        return self.inner.create_client()
+
+    def _record(self, prompt: str, text: str, latency_s: float, ttft_s: float = None):
+        self.store.append({
+            "key": prompt_key(prompt),
+            "provider": self.name,
+            "model": self.model_name,
+            "prompt": prompt,
+            "response": text,
+            "latency_s": round(latency_s, 3),
+            "ttft_s": round(ttft_s, 3) if ttft_s is not None else None,
+            "recorded_at": time.time()
+        })
+
+    async def generate(self, client, prompt: str) -> str:
+        start = time.time()
+        text = await self.inner.generate(client, prompt)
+        self._record(prompt, text, time.time() - start)
+        return text
+
+    async def stream(self, client, prompt: str) -> AsyncIterator[str]:
+        start = time.time()
+        ttft = None
+        chunks = []
+        agen = self.inner.stream(client, prompt)
+        try:
+            async for chunk in agen:
+                if ttft is None:
+                    ttft = time.time() - start
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await agen.aclose()
+        # Only completed streams are recorded; an aborted one never reaches here.
+        self._record(prompt, "".join(chunks), time.time() - start, ttft)
+
+
+def recording_enabled() -> bool:
+    env = os.getenv("LLM_RECORD")
+    if env is not None:
+        return env.strip().lower() in ("1", "true", "yes")
+    return bool(_replay_config().get("record", False))
+
+def wrap_for_recording(provider: LLMProvider) -> RecordingProvider:
+    return RecordingProvider(provider, FixtureStore.open(_replay_config()["path"]))
@@ -73,6 +73,9 @@ def _prompt_api_key(provider):
 def main():
     load_dotenv(ENV_PATH)
     provider_id = os.getenv("LLM_PROVIDER", "").strip().lower()
+    if provider_id == "replay":
+        print("Current LLM provider: Replay (recorded fixtures, no API key needed)")
+        return
     provider_by_id = {v["id"]: v for v in PROVIDERS.values()}
     if provider_id in provider_by_id:
         provider = provider_by_id[provider_id]
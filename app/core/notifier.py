@@ -0,0 +1,84 @@
+import time
+import threading
+from typing import Dict, Any, Optional
+from app.core.config_manager import ConfigManager
+
+class Notifier:
+    """
+    Sends messages nobody is waiting on (alerts, not command replies) to the
+    chat a command came from. The chat is identified by the command's origin:
+
+      {"channel": "telegram", "bot_id": "...", "chat_id": ...}
+      {"channel": "whatsapp", "jid": "..."}
+
+    Telegram goes straight to the Bot API; WhatsApp goes through the bridge
+    plugin's IPC channel. Telegram sends are spaced to stay under the bot-wide
+    flood limit when one event fans out to many chats.
+    """
+    _instance = None
+
+    def __init__(self, global_rate: float = 25.0):
+        self._gap = 1.0 / global_rate
+        self._next_send = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if not cls._instance:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def address(origin: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Stable key for the chat behind an origin, e.g. "telegram:123:456"; None if it cannot be notified."""
+        if not origin:
+            return None
+        if origin.get("channel") == "telegram" and origin.get("bot_id") and origin.get("chat_id") is not None:
+            return f"telegram:{origin['bot_id']}:{origin['chat_id']}"
+        if origin.get("channel") == "whatsapp" and origin.get("jid"):
+            return f"whatsapp:{origin['jid']}"
+        return None
+
+    def send(self, origin: Dict[str, Any], text: str) -> bool:
+        channel = (origin or {}).get("channel")
+        try:
+            if channel == "telegram":
+                return self._send_telegram(origin, text)
+            if channel == "whatsapp":
+                return self._send_whatsapp(origin, text)
+        except Exception as e:
+            print(f"[Notifier] {channel} send to {self.address(origin)} failed: {e}")
+            return False
+        print(f"[Notifier] Cannot notify origin {origin}.")
+        return False
+
+    def _send_telegram(self, origin: Dict[str, Any], text: str) -> bool:
+        import requests
+        from app.core.telegram_webhook import TelegramWebhookManager
+        token = next((t for t in TelegramWebhookManager.get_tokens() if t.split(":", 1)[0] == str(origin["bot_id"])), None)
+        if not token:
+            print(f"[Notifier] No token for Telegram bot {origin['bot_id']}.")
+            return False
+        base = (ConfigManager.get_telegram_config().get("api_base_url") or "https://api.telegram.org").rstrip("/")
+        self._throttle()
+        res = requests.post(f"{base}/bot{token}/sendMessage", json={"chat_id": origin["chat_id"], "text": text[:4096]}, timeout=10)
+        if res.status_code != 200:
+            print(f"[Notifier] Telegram answered {res.status_code}: {res.text[:200]}")
+            return False
+        return True
+
+    def _send_whatsapp(self, origin: Dict[str, Any], text: str) -> bool:
+        from app.core.plugin_manager import PluginManager
+        bridge = PluginManager.get_instance().get_plugin_by_id("whatsapp")
+        if not bridge:
+            print("[Notifier] WhatsApp bridge is not loaded.")
+            return False
+        return bridge.notify(origin["jid"], text)
+
+    def _throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_send - now
+            self._next_send = max(now, self._next_send) + self._gap
+        if wait > 0:
+            time.sleep(wait)
@@ -3,7 +3,8 @@ import datetime
 from sqlalchemy.orm import Session
 from app.core.plugin_manager import PluginManager
 from app.core.config_manager import ConfigManager
-from app.core.task_store import TaskLog, SessionLocal
+from app.core.task_store import TaskLog, SessionLocal, get_task_status, record_task_usage
+from app.core.resource_monitor import TaskResourceMonitor
 from app.core.watchdog import Watchdog
 
 class Orchestrator:
@@ -12,6 +13,8 @@ class Orchestrator:
     def __init__(self):
         self.lock = threading.Lock()
         self.active_plugin_id = None
+        self.active_plugin = None # the instance running the task; may be an old one draining after a reload
+        self.origins = {} # task_id -> chat the command came from, until the task runs
         self.plugin_manager = PluginManager.get_instance()
         self.watchdog = Watchdog(self)
         self.watchdog.start()
@@ -22,10 +25,12 @@ class Orchestrator:
             cls._instance = cls()
         return cls._instance
 
-    def create_task(self, text: str) -> str:
+    def create_task(self, text: str, origin: dict = None) -> str:
         """
         Creates a task entry in the DB and returns the ID.
-        This runs synchronously and quickly.
+        This runs synchronously and quickly. `origin` identifies the chat the
+        command came from (see Notifier) and is handed to the plugin in its
+        execute context.
         """
         # 1. Parse Trigger (Basic)
         parts = text.strip().split(" ", 1)
@@ -38,6 +43,8 @@ class Orchestrator:
         db.refresh(task)
         task_id = str(task.id)
         db.close()
+        if origin:
+            self.origins[task_id] = origin
         return task_id
 
     def handle_command(self, task_id: str):
@@ -45,6 +52,7 @@ class Orchestrator:
         Executes a task by ID.
         Runs in background thread.
         """
+        origin = self.origins.pop(str(task_id), None)
         db = SessionLocal()
         task = db.query(TaskLog).filter(TaskLog.id == int(task_id)).first()
         if not task:
@@ -65,7 +73,7 @@ class Orchestrator:
         plugin = self.plugin_manager.get_plugin_by_trigger(trigger)
         if not plugin:
             if not text.startswith("/"):
-                plugin = self.plugin_manager.get_plugin_by_id("system")
+                plugin = self.plugin_manager.ensure_loaded("system")
                 payload = text 
                 trigger = "(default)"
             else:
@@ -91,26 +99,56 @@ class Orchestrator:
              return
 
         self.active_plugin_id = plugin.config.get("id", "unknown")
+        self.active_plugin = plugin
         task.plugin_id = self.active_plugin_id
         db.commit()
-        
+
+        limits = ConfigManager.get_plugin_config(self.active_plugin_id).get("limits")
+        monitor = TaskResourceMonitor(plugin, limits).start()
         try:
             # Execute
-            result = plugin.execute(payload, {"trigger": trigger})
+            with self.plugin_manager.track(plugin):
+                result = plugin.execute(payload, {"trigger": trigger, "origin": origin})
             task.status = "DONE"
             task.result_message = str(result)
         except InterruptedError:
             task.status = "FAILED"
-            task.error_message = "User Aborted"
+            task.error_message = f"Aborted: {monitor.abort_reason}" if monitor.abort_reason else "User Aborted"
         except Exception as e:
             task.status = "FAILED"
             task.error_message = str(e)
         finally:
+            usage = monitor.stop()
+            plugin_id = self.active_plugin_id
             self.active_plugin_id = None
+            self.active_plugin = None
             self.lock.release()
             task.updated_at = datetime.datetime.now()
             db.commit()
             db.close()
+            try:
+                record_task_usage(task_id, plugin_id, usage)
+            except Exception as e:
+                print(f"[Orchestrator] Could not record usage for task {task_id}: {e}")
+
+    def describe_task(self, task_id):
+        """
+        Task status as served to chat bridges. While the task is running this
+        includes the owning plugin's heartbeat so clients can show progress.
+        """
+        task = get_task_status(task_id)
+        if not task:
+            return None
+        if task["status"] == "RUNNING" and task.get("plugin_id"):
+            plugin = self.active_plugin if task["plugin_id"] == self.active_plugin_id else None
+            plugin = plugin or self.plugin_manager.get_plugin_by_id(task["plugin_id"])
+            if plugin:
+                try:
+                    hb = plugin.heartbeat()
+                    task["progress"] = {"phase": hb.get("progress"), "message": hb.get("message")}
+                except Exception:
+                    pass
+        return task
 
     def abort_active_task(self):
         """
@@ -119,7 +157,7 @@ class Orchestrator:
         if not self.active_plugin_id:
             return "No active task to stop."
         
-        plugin = self.plugin_manager.get_plugin_by_id(self.active_plugin_id)
+        plugin = self.active_plugin or self.plugin_manager.get_plugin_by_id(self.active_plugin_id)
         if plugin:
             plugin.request_stop()
             # We could also force kill if it doesn't stop in X seconds context
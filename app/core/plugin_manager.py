@@ -1,17 +1,54 @@
 import os
+import sys
 import json
+import time
+import fnmatch
+import queue
+import threading
 import importlib.util
-from typing import Dict, Type
+from contextlib import contextmanager
+from typing import Dict, Type, List, Optional, Set
 from app.core.plugin_base import PluginBase
 from app.core.config_manager import ConfigManager
+from app.core.startup_timeline import StartupTimeline
 
 class PluginManager:
+    """
+    Discovers plugins from their `plugin.json` manifests without importing them.
+    A plugin's module is imported and its `on_load` run on its first command,
+    on an explicit `warmup()`, or at startup if its manifest sets `"autoload": true`
+    or it is listed in `plugin_loading.warmup`.
+
+    Warmup loads independent plugins concurrently on a bounded pool. Manifest
+    `dependencies` entries that name another plugin id are loaded first (other
+    entries, such as pip package names, are ignored). A plugin whose load
+    exceeds `plugin_loading.timeout_s` is marked timed out; its dependents are
+    skipped and everything else carries on.
+    """
     _instance = None
-    
+
     def __init__(self):
-        self.plugins: Dict[str, PluginBase] = {} # id -> instance
-        self.trigger_map: Dict[str, PluginBase] = {} # trigger -> instance
+        self.plugins: Dict[str, PluginBase] = {} # id -> instance (loaded plugins only)
+        self.trigger_map: Dict[str, str] = {} # trigger -> plugin id
         self.manifests: Dict[str, dict] = {} # id -> manifest
+        self.folders: Dict[str, str] = {} # id -> plugin folder
+        self.load_errors: Dict[str, str] = {} # id -> last load error
+        self.load_state: Dict[str, dict] = {} # id -> {state, deps, queued_ms, started_ms, finished_ms}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.generations: Dict[str, int] = {} # id -> how many times it has been (re)loaded, from 0
+        self._in_flight: Dict[int, int] = {} # id(instance) -> running commands
+        self._in_flight_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watch_snapshots: Dict[str, Dict[str, float]] = {}
+        self._watcher = None
+
+        cfg = ConfigManager.get_plugin_loading_config()
+        self.load_workers = int(cfg.get("workers", 4))
+        self.load_timeout = float(cfg.get("timeout_s", 30))
+        # Off by default; start_synapse.sh turns it on for development via SYNAPSE_HOT_RELOAD=1.
+        self.hot_reload = os.getenv("SYNAPSE_HOT_RELOAD", str(cfg.get("hot_reload", False))).strip().lower() in ("1", "true", "yes")
+        self.watch_interval = float(cfg.get("watch_interval_s", 1.0))
+        self.drain_timeout = float(cfg.get("drain_timeout_s", 300))
 
     @classmethod
     def get_instance(cls):
@@ -20,81 +57,424 @@ class PluginManager:
         return cls._instance
 
     def load_plugins(self, plugin_dir: str = "app/plugins"):
+        """Indexes plugin manifests and starts warming up the startup set in the background."""
         print(f"Scanning for plugins in {plugin_dir}...")
         if not os.path.exists(plugin_dir):
             print(f"Plugin directory {plugin_dir} does not exist.")
             return
 
-        for entry in os.scandir(plugin_dir):
-            if entry.is_dir():
-                manifest_path = os.path.join(entry.path, "plugin.json")
-                if os.path.exists(manifest_path):
-                    self._load_single_plugin(entry.path, manifest_path)
+        with StartupTimeline.get_instance().span("plugins:discover"):
+            for entry in os.scandir(plugin_dir):
+                if entry.is_dir():
+                    manifest_path = os.path.join(entry.path, "plugin.json")
+                    if os.path.exists(manifest_path):
+                        self._register_manifest(entry.path, manifest_path)
+            self._break_dependency_cycles()
+
+        if self.hot_reload:
+            self.start_watcher()
+
+        startup = [pid for pid, m in self.manifests.items() if m.get("autoload")]
+        for pid in ConfigManager.get_plugin_loading_config().get("warmup", []):
+            if pid not in startup:
+                startup.append(pid)
+        if startup:
+            self.warmup(startup)
 
-    def _load_single_plugin(self, folder_path: str, manifest_path: str):
+    def _read_manifest(self, folder_path: str, manifest_path: str) -> Optional[dict]:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+        # Validate Manifest
+        required_keys = ["name", "id", "version", "entry_point", "triggers"]
+        for key in required_keys:
+            if key not in manifest:
+                print(f"Skipping {folder_path}: Missing mandatory key '{key}' in manifest.")
+                return None
+        return manifest
+
+    def _register_manifest(self, folder_path: str, manifest_path: str):
         try:
-            with open(manifest_path, 'r') as f:
-                manifest = json.load(f)
-            
-            # Validate Manifest
-            required_keys = ["name", "id", "version", "entry_point", "triggers"]
-            for key in required_keys:
-                if key not in manifest:
-                    print(f"Skipping {folder_path}: Missing mandatory key '{key}' in manifest.")
-                    return
+            manifest = self._read_manifest(folder_path, manifest_path)
+            if not manifest:
+                return
 
             plugin_id = manifest["id"]
-            
+
             # Check Config if enabled
-            plugin_config = ConfigManager.get_plugin_config(plugin_id)
-            if plugin_config.get("enabled") is False:
+            if ConfigManager.get_plugin_config(plugin_id).get("enabled") is False:
                 print(f"Plugin {plugin_id} is disabled in config.json. Skipping.")
                 return
 
-            # Import Entry Point
-            entry_point_str = manifest["entry_point"]
-            module_name, class_name = entry_point_str.rsplit(".", 1)
-            
-            # Construct absolute module path for importlib
-            file_path = os.path.join(folder_path, f"{module_name.split('.')[0]}.py")
-            if not os.path.exists(file_path):
-                 # Try assuming the module_name matches filename exactly in that folder
-                 # But usually entry_point is "filename.ClassName"
-                 file_path = os.path.join(folder_path, f"{module_name}.py")
-            
-            spec = importlib.util.spec_from_file_location(f"plugins.{plugin_id}", file_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            plugin_class: Type[PluginBase] = getattr(module, class_name)
-            
-            # Instantiate
-            plugin_instance = plugin_class(plugin_config)
-            plugin_instance.on_load()
-            
-            # Register
-            self.plugins[plugin_id] = plugin_instance
             self.manifests[plugin_id] = manifest
-            
+            self.folders[plugin_id] = folder_path
+            self._load_locks[plugin_id] = threading.Lock()
+            self.load_state[plugin_id] = {"state": "registered"}
+
             for trigger in manifest["triggers"]:
                 if trigger in self.trigger_map:
                     print(f"Conflict: Trigger '{trigger}' already registered. Skipping for {plugin_id}.")
                 else:
-                    self.trigger_map[trigger] = plugin_instance
-            
+                    self.trigger_map[trigger] = plugin_id
+
+            print(f"Registered Plugin: {manifest['name']} ({plugin_id})")
+
+        except Exception as e:
+            print(f"Failed to read plugin manifest in {folder_path}: {e}")
+
+    def plugin_dependencies(self, plugin_id: str) -> List[str]:
+        """Manifest dependencies that refer to other registered plugins."""
+        deps = self.manifests.get(plugin_id, {}).get("dependencies", [])
+        return [d for d in deps if d in self.manifests and d != plugin_id]
+
+    def _break_dependency_cycles(self):
+        """Drops dependency edges that would form a cycle, so loading can always make progress."""
+        visiting, visited = set(), set()
+
+        def visit(pid):
+            visiting.add(pid)
+            for dep in self.plugin_dependencies(pid):
+                if dep in visiting:
+                    print(f"Dependency cycle: {pid} -> {dep}. Ignoring this dependency.")
+                    self.manifests[pid]["dependencies"] = [d for d in self.manifests[pid]["dependencies"] if d != dep]
+                elif dep not in visited:
+                    visit(dep)
+            visiting.discard(pid)
+            visited.add(pid)
+
+        for pid in list(self.manifests):
+            if pid not in visited:
+                visit(pid)
+
+    def ensure_loaded(self, plugin_id: str) -> Optional[PluginBase]:
+        """Returns the plugin instance, importing and initialising it (and its dependencies) on first use."""
+        plugin = self.plugins.get(plugin_id)
+        if plugin or plugin_id not in self.manifests:
+            return plugin
+        for dep in self.plugin_dependencies(plugin_id):
+            if not self.ensure_loaded(dep):
+                self.load_errors[plugin_id] = f"Dependency '{dep}' failed to load."
+                self.load_state[plugin_id]["state"] = "failed"
+                return None
+        lock = self._load_locks[plugin_id]
+        # Don't queue forever behind a load that is hung.
+        if not lock.acquire(timeout=self.load_timeout):
+            return None
+        try:
+            if plugin_id not in self.plugins:
+                self._load_single_plugin(plugin_id)
+        finally:
+            lock.release()
+        return self.plugins.get(plugin_id)
+
+    def _load_single_plugin(self, plugin_id: str):
+        manifest = self.manifests[plugin_id]
+        state = self.load_state[plugin_id]
+        state.update(state="loading", started_ms=self._now_ms())
+        try:
+            plugin_instance = self._instantiate(plugin_id, manifest)
+
+            # Register
+            self.plugins[plugin_id] = plugin_instance
+            self.load_errors.pop(plugin_id, None)
+            if state.get("state") == "timeout":
+                print(f"Plugin {plugin_id} finished loading after its timeout.")
+            state.update(state="loaded", finished_ms=self._now_ms())
             print(f"Loaded Plugin: {manifest['name']} ({plugin_id})")
 
         except Exception as e:
-            print(f"Failed to load plugin from {folder_path}: {e}")
+            self.load_errors[plugin_id] = str(e)
+            state.update(state="failed", finished_ms=self._now_ms())
+            print(f"Failed to load plugin from {self.folders[plugin_id]}: {e}")
+
+    def _instantiate(self, plugin_id: str, manifest: dict) -> PluginBase:
+        """Imports the plugin's entry point into a fresh module and runs its on_load."""
+        folder_path = self.folders[plugin_id]
+        timeline = StartupTimeline.get_instance()
+        plugin_config = dict(ConfigManager.get_plugin_config(plugin_id))
+        plugin_config.setdefault("id", plugin_id)
+
+        # Import Entry Point
+        entry_point_str = manifest["entry_point"]
+        module_name, class_name = entry_point_str.rsplit(".", 1)
+
+        # Construct absolute module path for importlib
+        file_path = os.path.join(folder_path, f"{module_name.split('.')[0]}.py")
+        if not os.path.exists(file_path):
+             # Try assuming the module_name matches filename exactly in that folder
+             # But usually entry_point is "filename.ClassName"
+             file_path = os.path.join(folder_path, f"{module_name}.py")
+
+        # Each (re)load gets its own module name so old and new code can coexist while draining.
+        generation = self.generations.get(plugin_id, -1) + 1
+        unique_name = f"plugins.{plugin_id}" if generation == 0 else f"plugins.{plugin_id}_r{generation}"
+        with timeline.span(f"plugin:{plugin_id}:import", plugin=plugin_id, generation=generation):
+            spec = importlib.util.spec_from_file_location(unique_name, file_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+        plugin_class: Type[PluginBase] = getattr(module, class_name)
+
+        # Instantiate
+        with timeline.span(f"plugin:{plugin_id}:init", plugin=plugin_id, generation=generation):
+            plugin_instance = plugin_class(plugin_config)
+            plugin_instance.on_load()
+        self.generations[plugin_id] = generation
+        return plugin_instance
+
+    def warmup(self, plugin_ids: List[str] = None, background: bool = True):
+        """Loads the given plugins (default: all), plus their dependencies, ahead of their first command."""
+        ids = [pid for pid in (plugin_ids or list(self.manifests.keys())) if pid in self.manifests]
+        if background:
+            threading.Thread(target=self._load_concurrently, args=(ids,), name="plugin-warmup", daemon=True).start()
+        else:
+            self._load_concurrently(ids)
+        return ids
+
+    def _load_concurrently(self, plugin_ids: List[str]):
+        # Include dependencies of the requested plugins.
+        wanted: List[str] = []
+        def add(pid):
+            if pid in wanted:
+                return
+            for dep in self.plugin_dependencies(pid):
+                add(dep)
+            wanted.append(pid)
+        for pid in plugin_ids:
+            add(pid)
+
+        pending = {pid: set(self.plugin_dependencies(pid)) for pid in wanted if pid not in self.plugins}
+        done: Set[str] = set(pid for pid in wanted if pid in self.plugins)
+        failed: Set[str] = set()
+        ready: List[str] = []
+        running: Dict[str, float] = {} # plugin id -> load start time
+        results = queue.Queue()
+
+        def run(pid):
+            try:
+                ok = self.ensure_loaded(pid) is not None
+            except Exception as e:
+                self.load_errors[pid] = str(e)
+                ok = False
+            results.put((pid, ok))
+
+        while pending or ready or running:
+            for pid in [p for p, deps in pending.items() if deps & failed]:
+                dep = next(iter(pending[pid] & failed))
+                self.load_errors[pid] = f"Dependency '{dep}' failed to load."
+                self.load_state[pid]["state"] = "skipped"
+                failed.add(pid)
+                del pending[pid]
+            for pid in [p for p, deps in pending.items() if deps <= done]:
+                self.load_state[pid].update(state="queued", queued_ms=self._now_ms())
+                ready.append(pid)
+                del pending[pid]
+            # Bounded concurrency. Loader threads are daemons so a hung on_load never blocks exit.
+            while ready and len(running) < self.load_workers:
+                pid = ready.pop(0)
+                running[pid] = time.time()
+                threading.Thread(target=run, args=(pid,), name=f"plugin-load-{pid}", daemon=True).start()
+            if not running:
+                break
+
+            try:
+                pid, ok = results.get(timeout=0.1)
+                if pid in running:
+                    del running[pid]
+                    (done if ok else failed).add(pid)
+            except queue.Empty:
+                pass
+
+            now = time.time()
+            for pid, started in list(running.items()):
+                if now - started > self.load_timeout:
+                    print(f"Plugin {pid} did not load within {self.load_timeout}s. Continuing without it.")
+                    self.load_errors[pid] = f"Load timed out after {self.load_timeout}s."
+                    self.load_state[pid].update(state="timeout", finished_ms=self._now_ms())
+                    failed.add(pid)
+                    del running[pid]
+
+    def _now_ms(self):
+        return round((time.time() - StartupTimeline.get_instance().started_at) * 1000, 1)
+
+    def load_report(self) -> Dict[str, dict]:
+        """Per-plugin load state and timings (ms since startup) for the startup timeline."""
+        report = {}
+        for pid in self.manifests:
+            entry = dict(self.load_state.get(pid, {}))
+            entry["dependencies"] = self.plugin_dependencies(pid)
+            if pid in self.load_errors:
+                entry["error"] = self.load_errors[pid]
+            if "started_ms" in entry and "finished_ms" in entry:
+                entry["load_ms"] = round(entry["finished_ms"] - entry["started_ms"], 1)
+            report[pid] = entry
+        return report
+
+    @contextmanager
+    def track(self, plugin: PluginBase):
+        """Counts a command running on `plugin`, so a reload can wait for it to drain."""
+        key = id(plugin)
+        with self._in_flight_lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            yield plugin
+        finally:
+            with self._in_flight_lock:
+                self._in_flight[key] -= 1
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+
+    def _drain(self, plugin_id: str, plugin: PluginBase) -> bool:
+        """Waits until no commands run on `plugin` (up to drain_timeout_s), then shuts it down."""
+        deadline = time.time() + self.drain_timeout
+        while self._in_flight.get(id(plugin)) and time.time() < deadline:
+            time.sleep(0.2)
+        drained = not self._in_flight.get(id(plugin))
+        if not drained:
+            print(f"[Reload] Old {plugin_id} instance still busy after {self.drain_timeout}s; shutting it down anyway.")
+        try:
+            plugin.shutdown()
+        except Exception as e:
+            print(f"[Reload] Error shutting down old {plugin_id} instance: {e}")
+        return drained
+
+    def _purge_modules(self, plugin_id: str):
+        """Drops the plugin package's cached submodules so the next import reads the new code."""
+        package = f"app.plugins.{os.path.basename(os.path.normpath(self.folders[plugin_id]))}"
+        for name in [m for m in sys.modules if m == package or m.startswith(package + ".")]:
+            del sys.modules[name]
+
+    def reload_plugin(self, plugin_id: str) -> str:
+        """
+        Re-imports one plugin and swaps it in without dropping traffic.
+
+        The new instance is loaded first; if that fails the old one keeps
+        serving (for restart-strategy plugins, a fresh instance of the old code). Otherwise its triggers replace the old ones in one assignment,
+        new commands go to the new instance, and the old instance is shut down
+        once its in-flight commands finish. Plugins whose manifest sets
+        `"reload_strategy": "restart"` (e.g. ones owning an external process)
+        are drained and shut down before the new instance starts.
+        """
+        if plugin_id not in self.manifests:
+            return f"Unknown plugin '{plugin_id}'."
+        folder_path = self.folders[plugin_id]
+        with self._reload_lock:
+            try:
+                manifest = self._read_manifest(folder_path, os.path.join(folder_path, "plugin.json"))
+            except Exception as e:
+                manifest = None
+                print(f"[Reload] Could not read manifest for {plugin_id}: {e}")
+            if not manifest or manifest["id"] != plugin_id:
+                return f"Reload of {plugin_id} skipped: invalid manifest."
+
+            self._purge_modules(plugin_id)
+            old = self.plugins.get(plugin_id)
+            if old is None:
+                # Not loaded yet; the next command imports the new code.
+                self.manifests[plugin_id] = manifest
+                self._swap_triggers(plugin_id, manifest)
+                return f"{plugin_id} re-indexed (not loaded)."
+
+            start = time.time()
+            restart = manifest.get("reload_strategy") == "restart"
+            if restart:
+                self._drain(plugin_id, old)
+            try:
+                new = self._instantiate(plugin_id, manifest)
+            except Exception as e:
+                self.load_errors[plugin_id] = f"Reload failed: {e}"
+                print(f"[Reload] {plugin_id} failed to load new code, keeping the running version: {e}")
+                if restart:
+                    # The old instance is already shut down and may still be winding down its
+                    # threads; run a fresh instance of the previously loaded class instead.
+                    try:
+                        revived = type(old)(old.config)
+                        revived.on_load()
+                        self.plugins[plugin_id] = revived
+                    except Exception as revive_error:
+                        self.plugins.pop(plugin_id, None)
+                        print(f"[Reload] Could not restart the previous {plugin_id} either: {revive_error}")
+                return f"Reload of {plugin_id} failed: {e}"
+
+            self.manifests[plugin_id] = manifest
+            self.plugins[plugin_id] = new
+            self._swap_triggers(plugin_id, manifest)
+            self.load_errors.pop(plugin_id, None)
+            self.load_state[plugin_id].update(reloads=self.generations[plugin_id], last_reload_ms=round((time.time() - start) * 1000, 1))
+            print(f"[Reload] {plugin_id} reloaded (generation {self.generations[plugin_id]}) in {(time.time() - start) * 1000:.0f} ms.")
+            if not restart:
+                threading.Thread(target=self._drain, args=(plugin_id, old), name=f"plugin-drain-{plugin_id}", daemon=True).start()
+            return f"{plugin_id} reloaded."
+
+    def _swap_triggers(self, plugin_id: str, manifest: dict):
+        trigger_map = {t: pid for t, pid in self.trigger_map.items() if pid != plugin_id}
+        for trigger in manifest["triggers"]:
+            if trigger in trigger_map:
+                print(f"Conflict: Trigger '{trigger}' already registered. Skipping for {plugin_id}.")
+            else:
+                trigger_map[trigger] = plugin_id
+        # Readers see either the old map or the new one, never a partial update.
+        self.trigger_map = trigger_map
+
+    def start_watcher(self):
+        if self._watcher:
+            return
+        for pid in self.manifests:
+            self._watch_snapshots[pid] = self._snapshot(pid)
+        self._watcher = threading.Thread(target=self._watch_loop, name="plugin-watcher", daemon=True)
+        self._watcher.start()
+        print(f"[Reload] Watching {len(self.manifests)} plugin folders for changes.")
+
+    def _snapshot(self, plugin_id: str) -> Dict[str, float]:
+        """mtimes of the plugin's watched files: *.py and plugin.json, plus manifest `watch` globs."""
+        folder = self.folders[plugin_id]
+        patterns = ["*.py", "plugin.json"] + list(self.manifests[plugin_id].get("watch", []))
+        snapshot = {}
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if d not in ("node_modules", "__pycache__") and not d.startswith(".")]
+            for name in files:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, folder)
+                if any(fnmatch.fnmatch(rel, p) for p in patterns):
+                    try:
+                        snapshot[rel] = os.path.getmtime(path)
+                    except OSError:
+                        pass
+        return snapshot
+
+    def _watch_loop(self):
+        changed_at: Dict[str, Dict[str, float]] = {}
+        while True:
+            time.sleep(self.watch_interval)
+            for pid in list(self.manifests):
+                try:
+                    snapshot = self._snapshot(pid)
+                except Exception:
+                    continue
+                if snapshot == self._watch_snapshots.get(pid):
+                    continue
+                # Wait one more interval for the files to settle (editors write in bursts).
+                if changed_at.get(pid) != snapshot:
+                    changed_at[pid] = snapshot
+                    continue
+                changed_at.pop(pid, None)
+                self._watch_snapshots[pid] = snapshot
+                print(f"[Reload] Change detected in {pid}.")
+                try:
+                    print(f"[Reload] {self.reload_plugin(pid)}")
+                except Exception as e:
+                    print(f"[Reload] Reload of {pid} crashed: {e}")
 
     def get_plugin_by_trigger(self, trigger: str) -> PluginBase:
-        return self.trigger_map.get(trigger)
+        plugin_id = self.trigger_map.get(trigger)
+        return self.ensure_loaded(plugin_id) if plugin_id else None
 
     def get_plugin_by_id(self, plugin_id: str) -> PluginBase:
+        """Returns the plugin only if it is already loaded."""
         return self.plugins.get(plugin_id)
 
     def shutdown_all(self):
-        for p in self.plugins.values():
+        for p in list(self.plugins.values()):
             try:
                 p.shutdown()
             except Exception as e:
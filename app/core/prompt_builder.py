@@ -0,0 +1,282 @@
+import re
+from typing import Dict, Any, List, Optional
+
+# Average characters per token for English prose/code. Used when no exact
+# tokenizer is available; close enough for budgeting.
+CHARS_PER_TOKEN = {
+    "gemini": 4.0,
+    "gpt": 4.0,
+    "claude": 3.5,
+}
+
+_encoders = {}
+
+def _tiktoken_encoder(model: Optional[str]):
+    """Returns a tiktoken encoder if the optional package is installed, else None."""
+    if "gpt" not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders["gpt"] = tiktoken.encoding_for_model(model or "gpt-4o-mini")
+            except KeyError:
+                _encoders["gpt"] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoders["gpt"] = None
+    return _encoders["gpt"]
+
+def count_tokens(text: str, provider: str = None, model: str = None) -> int:
+    """Token count for `text` as seen by `provider` (exact for GPT when tiktoken is installed)."""
+    if not text:
+        return 0
+    if provider == "gpt":
+        encoder = _tiktoken_encoder(model)
+        if encoder:
+            return len(encoder.encode(text))
+    ratio = CHARS_PER_TOKEN.get(provider, 4.0)
+    return int(len(text) / ratio) + 1
+
+
+class PromptBuilder:
+    """
+    Assembles a prompt from named sections and keeps it within a token budget.
+
+    - `ref()` swaps long values (URLs, whole records) for short IDs; `lookup()`
+      and `resolve()` map them back once the model answers.
+    - `table()` serializes records as compact pipe-delimited rows instead of
+      Python reprs.
+    - `build()` trims the lowest-priority trimmable sections until the prompt
+      fits the budget.
+    """
+
+    def __init__(self, provider: str = None, model: str = None, budget: int = None):
+        self.provider = provider
+        self.model = model
+        self.budget = budget
+        self.sections: List[Dict[str, Any]] = []
+        self.refs: Dict[str, Any] = {}
+        self._ref_ids: Dict[tuple, str] = {}
+        self.stats: Dict[str, Any] = {}
+
+    def tokens(self, text: str) -> int:
+        return count_tokens(text, self.provider, self.model)
+
+    def add(self, text: str, name: str = None, priority: int = 0, trim: bool = False):
+        """Adds a section. Only sections with `trim=True` are shortened to meet the budget."""
+        self.sections.append({"name": name, "text": text.strip(), "priority": priority, "trim": trim})
+        return self
+
+    def ref(self, value: Any, prefix: str = "r") -> str:
+        """Returns a short stable ID for `value` (e.g. "r3")."""
+        key = ("s", value) if isinstance(value, str) else ("o", id(value))
+        if key not in self._ref_ids:
+            ref_id = f"{prefix}{len(self.refs) + 1}"
+            self._ref_ids[key] = ref_id
+            self.refs[ref_id] = value
+        return self._ref_ids[key]
+
+    def lookup(self, ref_id: Any) -> Any:
+        return self.refs.get(str(ref_id).strip()) if ref_id is not None else None
+
+    def resolve(self, obj: Any) -> Any:
+        """Replaces any short IDs in a parsed response with the values they stand for."""
+        if isinstance(obj, dict):
+            return {k: self.resolve(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self.resolve(v) for v in obj]
+        if isinstance(obj, str) and obj.strip() in self.refs:
+            return self.refs[obj.strip()]
+        return obj
+
+    def table(self, rows: List[Dict[str, Any]], fields: List[str], max_field_chars: int = 120) -> str:
+        """Serializes records as a header line plus one `a|b|c` row per record."""
+        lines = ["|".join(fields)]
+        for row in rows:
+            cells = []
+            for field in fields:
+                value = row.get(field, "")
+                if isinstance(value, float):
+                    value = f"{value:.2f}"
+                value = " ".join(str(value).replace("|", "/").split())
+                cells.append(value[:max_field_chars])
+            lines.append("|".join(cells))
+        return "\n".join(lines)
+
+    def build(self) -> str:
+        sections = [dict(s) for s in self.sections]
+        raw_tokens = sum(self.tokens(s["text"]) for s in sections)
+        trimmed = []
+
+        if self.budget:
+            total = raw_tokens
+            for section in sorted((s for s in sections if s["trim"]), key=lambda s: s["priority"]):
+                if total <= self.budget:
+                    break
+                before = self.tokens(section["text"])
+                allowed = max(0, before - (total - self.budget))
+                section["text"] = self._trim_to(section["text"], allowed)
+                total -= before - self.tokens(section["text"])
+                trimmed.append(section["name"])
+
+        prompt = "\n\n".join(s["text"] for s in sections if s["text"])
+        self.stats = {
+            "tokens": self.tokens(prompt),
+            "raw_tokens": raw_tokens,
+            "budget": self.budget,
+            "trimmed": trimmed,
+            "refs": len(self.refs)
+        }
+        return prompt
+
+    def _trim_to(self, text: str, max_tokens: int) -> str:
+        """Keeps whole lines from the top of `text` while they fit in `max_tokens`."""
+        lines = text.splitlines()
+        kept = []
+        used = 0
+        for line in lines:
+            cost = self.tokens(line + "\n")
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        dropped = len(lines) - len(kept)
+        if dropped:
+            kept.append(f"[... {dropped} more lines omitted]")
+        return "\n".join(kept)
+
+
+def split_markdown_sections(text: str) -> List[Dict[str, str]]:
+    """
+    Splits markdown into sections at `#`/`##`/... headings. Text before the
+    first heading becomes a section with an empty heading.
+    """
+    sections = []
+    current = {"heading": "", "body": []}
+    in_fence = False
+    for line in text.splitlines():
+        if line.strip().startswith("```"):
+            in_fence = not in_fence
+        if not in_fence and re.match(r"^#{1,6}\s+\S", line):
+            if current["heading"] or any(l.strip() for l in current["body"]):
+                sections.append(current)
+            current = {"heading": line.rstrip(), "body": []}
+        else:
+            current["body"].append(line)
+    if current["heading"] or any(l.strip() for l in current["body"]):
+        sections.append(current)
+    return [{"heading": s["heading"], "body": "\n".join(s["body"]).strip("\n")} for s in sections]
+
+def join_markdown_sections(sections: List[Dict[str, str]]) -> str:
+    parts = []
+    for s in sections:
+        parts.append(f"{s['heading']}\n{s['body']}".strip("\n") if s["heading"] else s["body"])
+    return "\n\n".join(p for p in parts if p.strip()) + "\n"
+
+def _heading_key(heading: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", heading.lstrip("#").lower()).strip()
+
+def _words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]{3,}", text.lower())}
+
+def summarize_markdown(text: str, query: str, budget: int, provider: str = None) -> Dict[str, Any]:
+    """
+    Shrinks a markdown document to roughly `budget` tokens for an edit request.
+
+    Every heading is kept so the model sees the document's shape; section
+    bodies are included in order of word overlap with `query` until the budget
+    is spent, and the rest are reduced to their first line.
+    Returns {"text", "full": [headings sent in full], "sections"}.
+    """
+    sections = split_markdown_sections(text)
+    query_words = _words(query)
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda i: -len(query_words & _words(sections[i]["heading"] + " " + sections[i]["body"]))
+    )
+
+    # Headings and first lines are always sent; spend what is left on full bodies.
+    def first_line(body):
+        for line in body.splitlines():
+            if line.strip():
+                return line.strip()[:160]
+        return ""
+
+    used = sum(count_tokens(s["heading"] + "\n" + first_line(s["body"]), provider) for s in sections)
+    full = set()
+    for i in ranked:
+        cost = count_tokens(sections[i]["body"], provider)
+        if used + cost <= budget:
+            full.add(i)
+            used += cost
+
+    parts = []
+    for i, s in enumerate(sections):
+        if i in full:
+            body = s["body"]
+        else:
+            lines = len([l for l in s["body"].splitlines() if l.strip()])
+            body = f"{first_line(s['body'])}\n[... section summarized, {lines} lines unchanged]" if lines > 1 else s["body"]
+        parts.append(f"{s['heading']}\n{body}".strip("\n"))
+    return {
+        "text": "\n\n".join(parts),
+        "full": [sections[i]["heading"] for i in sorted(full)],
+        "sections": sections
+    }
+
+def _heading_level(heading: str) -> int:
+    return len(heading) - len(heading.lstrip("#"))
+
+def _heading_paths(sections: List[Dict[str, str]]) -> List[tuple]:
+    """Each section's heading path: the keys of its parent headings, then its own."""
+    paths, stack = [], [] # stack of (level, key)
+    for s in sections:
+        if not s["heading"]:
+            paths.append(())
+            continue
+        level = _heading_level(s["heading"])
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, _heading_key(s["heading"])))
+        paths.append(tuple(key for _, key in stack))
+    return paths
+
+def merge_markdown_sections(original: str, updates: str, skipped: List[str] = None) -> str:
+    """
+    Applies updated sections (each starting with its heading) to `original`.
+
+    Sections are matched by heading path, so "### Notes" under "## Frontend"
+    never replaces "### Notes" under "## Backend". `updates` may precede a
+    section with its parent heading lines alone (no body) to say where it
+    belongs; those are context, not replacements. A section whose path ends
+    exactly one original path replaces it; one that matches none is added
+    after its parent (or at the end). A heading that matches several sections
+    is left out rather than guessed, and listed in `skipped` if given.
+    """
+    base = split_markdown_sections(original)
+    base_paths = _heading_paths(base)
+    incoming = split_markdown_sections(updates)
+    incoming_paths = _heading_paths(incoming)
+    for i, (section, path) in enumerate(zip(incoming, incoming_paths)):
+        if not path:
+            continue
+        child_follows = i + 1 < len(incoming) and incoming_paths[i + 1][:len(path)] == path and len(incoming_paths[i + 1]) > len(path)
+        if not section["body"].strip() and child_follows:
+            continue # a parent heading given only to place what follows
+        matches = [j for j, p in enumerate(base_paths) if p and p[-len(path):] == path]
+        if len(matches) == 1:
+            base[matches[0]] = section
+            continue
+        if matches:
+            if skipped is not None:
+                skipped.append(section["heading"])
+            continue
+        # New section: place it after the subtree of its parent, when the parent is known.
+        parents = [j for j, p in enumerate(base_paths) if len(path) > 1 and p and p[-(len(path) - 1):] == path[:-1]]
+        at = len(base)
+        if len(parents) == 1:
+            at = parents[0] + 1
+            depth = len(base_paths[parents[0]])
+            while at < len(base) and len(base_paths[at]) > depth:
+                at += 1
+        base.insert(at, section)
+        base_paths.insert(at, base_paths[parents[0]] + path[-1:] if len(parents) == 1 else path)
+    return join_markdown_sections(base)
@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+try:
+    import psutil
+except ImportError: # accounting degrades to wall/CPU time only
+    psutil = None
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+# Long-lived processes that serve the whole server rather than one task:
+# pooled browsers (chromedriver + Chrome), the WhatsApp bridge. They and
+# their descendants are never counted as a task's children, nor killed.
+_shared_pids: Dict[int, str] = {}
+_shared_lock = threading.Lock()
+
+def register_shared_process(pid: int, owner: str):
+    with _shared_lock:
+        _shared_pids[pid] = owner
+
+def unregister_shared_process(pid: int):
+    with _shared_lock:
+        _shared_pids.pop(pid, None)
+
+def shared_processes() -> Dict[int, str]:
+    with _shared_lock:
+        return dict(_shared_pids)
+
+
+class TaskResourceMonitor:
+    """
+    Measures one orchestrator task: wall time, CPU time of the executing
+    thread and of the whole process, peak process RSS, and the usage of child
+    processes started during the task (npm/pip builds, docker, etc.).
+
+    A task's children are the server's descendants that appeared during the
+    task and do not descend from a process that predates it or from a
+    registered shared process (see `register_shared_process`), so pooled
+    browsers, prewarms and a restarted WhatsApp bridge are left alone.
+
+    A background sampler tracks RSS and live children. If the plugin config
+    has `limits` (`wall_s`, `cpu_s`, `rss_mb`), exceeding one asks the plugin
+    to stop; if it is still running `grace_s` later, the task's child
+    processes are terminated. `rss_mb` applies to the task's children only;
+    the server's own RSS is shared by every plugin and is just reported
+    (`peak_rss_mb`), as is process-wide CPU, which `cpu_s` also counts.
+
+    `start()` and `stop()` must be called from the thread that runs the task.
+    """
+
+    def __init__(self, plugin, limits: Dict[str, Any] = None, interval: float = 0.5):
+        self.plugin = plugin
+        self.limits = limits or {}
+        self.interval = interval
+        self.abort_reason: Optional[str] = None
+        self._aborted_at = None
+        self._killed_children = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._proc = psutil.Process(os.getpid()) if psutil else None
+        self._peak_rss = 0
+        self._peak_children_rss = 0
+        self._max_children = 0
+        self._children_cpu: Dict[int, float] = {} # pid -> last seen cpu seconds
+        self._existing = set() # descendants that predate the task, e.g. the WhatsApp bridge
+
+    def start(self):
+        self._started = time.time()
+        self._thread_cpu = time.thread_time()
+        self._process_cpu = time.process_time()
+        self._rusage_children = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+        if self._proc:
+            try:
+                self._existing = {c.pid for c in self._proc.children(recursive=True)}
+            except psutil.Error:
+                pass
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="task-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._sample()
+        usage = {
+            "wall_s": round(time.time() - self._started, 3),
+            "cpu_thread_s": round(time.thread_time() - self._thread_cpu, 3),
+            "cpu_process_s": round(time.process_time() - self._process_cpu, 3),
+            "peak_rss_mb": round(self._peak_rss / 1048576, 1) if self._proc else None,
+            "children_cpu_s": None,
+            "children_peak_rss_mb": round(self._peak_children_rss / 1048576, 1) if self._proc else None,
+            "children_max": self._max_children if self._proc else None,
+            "children_killed": self._killed_children,
+            "abort_reason": self.abort_reason
+        }
+        children_cpu = sum(self._children_cpu.values())
+        if self._rusage_children:
+            # rusage covers children that exited and were reaped; psutil covers the rest.
+            now = resource.getrusage(resource.RUSAGE_CHILDREN)
+            reaped = (now.ru_utime - self._rusage_children.ru_utime) + (now.ru_stime - self._rusage_children.ru_stime)
+            children_cpu = max(children_cpu, reaped)
+        if self._proc or self._rusage_children:
+            usage["children_cpu_s"] = round(children_cpu, 3)
+        return usage
+
+    def _task_children(self):
+        """Descendants started during the task, excluding subtrees of older and shared processes."""
+        descendants = self._proc.children(recursive=True)
+        parents = {}
+        for child in descendants:
+            try:
+                parents[child.pid] = child.ppid()
+            except psutil.Error:
+                pass
+        excluded = self._existing | set(shared_processes())
+
+        def owned(pid):
+            while pid in parents:
+                if pid in excluded:
+                    return False
+                pid = parents[pid]
+            return True
+
+        return [c for c in descendants if owned(c.pid)]
+
+    def _sample(self):
+        if not self._proc:
+            return
+        try:
+            self._peak_rss = max(self._peak_rss, self._proc.memory_info().rss)
+            children_rss = 0
+            children = self._task_children()
+            for child in children:
+                try:
+                    children_rss += child.memory_info().rss
+                    cpu = child.cpu_times()
+                    self._children_cpu[child.pid] = cpu.user + cpu.system
+                except psutil.Error:
+                    pass
+            self._peak_children_rss = max(self._peak_children_rss, children_rss)
+            self._max_children = max(self._max_children, len(children))
+        except psutil.Error:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+            self._check_limits()
+
+    def _check_limits(self):
+        if self.abort_reason:
+            grace = float(self.limits.get("grace_s", 10))
+            if not self._killed_children and time.time() - self._aborted_at > grace and self._proc:
+                self._kill_children()
+            return
+        wall = time.time() - self._started
+        cpu = (time.process_time() - self._process_cpu) + sum(self._children_cpu.values())
+        rss_mb = self._peak_children_rss / 1048576
+        reason = None
+        if self.limits.get("wall_s") and wall > self.limits["wall_s"]:
+            reason = f"wall time over {self.limits['wall_s']}s"
+        elif self.limits.get("cpu_s") and cpu > self.limits["cpu_s"]:
+            reason = f"CPU time over {self.limits['cpu_s']}s"
+        elif self.limits.get("rss_mb") and rss_mb > self.limits["rss_mb"]:
+            reason = f"memory over {self.limits['rss_mb']} MB"
+        if reason:
+            self.abort_reason = reason
+            self._aborted_at = time.time()
+            print(f"[Limits] {self.plugin.config.get('id')} exceeded its soft limit ({reason}). Requesting stop.")
+            self.plugin.request_stop()
+
+    def _kill_children(self):
+        children = self._task_children()
+        for child in children:
+            try:
+                child.terminate()
+            except psutil.Error:
+                pass
+        gone, alive = psutil.wait_procs(children, timeout=3)
+        for child in alive:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+        self._killed_children = len(children)
+        if children:
+            print(f"[Limits] Terminated {len(children)} child processes of the runaway task.")
@@ -0,0 +1,86 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+class StartupTimeline:
+    """
+    Records how long each startup step takes, relative to when the API module
+    started importing. Plugin imports and initialisation are recorded too,
+    whether they happen at startup or lazily on first use.
+    """
+    _instance = None
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.ready_at = None
+        self._last_mark = None
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if not cls._instance:
+            cls._instance = cls()
+        return cls._instance
+
+    @contextmanager
+    def span(self, name: str, **info):
+        start = time.time()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            event = {
+                "name": name,
+                "start_ms": round((start - self.started_at) * 1000, 1),
+                "duration_ms": round((time.time() - start) * 1000, 1),
+                "thread": threading.current_thread().name,
+                **info
+            }
+            if error:
+                event["error"] = error
+            with self._lock:
+                self.events.append(event)
+
+    def mark(self, name: str):
+        """Records a step that started when the previous mark (or startup) ended."""
+        now = time.time()
+        start = self._last_mark or self.started_at
+        with self._lock:
+            self.events.append({
+                "name": name,
+                "start_ms": round((start - self.started_at) * 1000, 1),
+                "duration_ms": round((now - start) * 1000, 1),
+                "thread": threading.current_thread().name
+            })
+        self._last_mark = now
+
+    def mark_ready(self):
+        self.ready_at = time.time()
+
+    def ready_ms(self):
+        if self.ready_at is None:
+            return None
+        return round((self.ready_at - self.started_at) * 1000, 1)
+
+    def report(self, budget_ms: float = None) -> Dict[str, Any]:
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["start_ms"])
+        ready = self.ready_ms()
+        return {
+            "ready_ms": ready,
+            "budget_ms": budget_ms,
+            "within_budget": ready is not None and budget_ms is not None and ready <= budget_ms,
+            "events": events
+        }
+
+    def print_report(self, budget_ms: float):
+        ready = self.ready_ms()
+        status = "OK" if ready <= budget_ms else "OVER BUDGET"
+        print(f"[Startup] API ready in {ready:.0f} ms (budget {budget_ms:.0f} ms) {status}")
+        for event in sorted(self.events, key=lambda e: -e["duration_ms"])[:5]:
+            print(f"[Startup]   {event['name']}: {event['duration_ms']:.0f} ms")
@@ -1,5 +1,5 @@
 import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Float, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -23,6 +23,23 @@ class TaskLog(Base):
     error_message = Column(Text, nullable=True)
     result_message = Column(Text, nullable=True)
 
+class TaskUsage(Base):
+    """Resources used by one task, recorded by the orchestrator when it finishes."""
+    __tablename__ = "task_usage"
+
+    task_id = Column(Integer, primary_key=True)
+    plugin_id = Column(String, index=True)
+    wall_s = Column(Float)
+    cpu_thread_s = Column(Float) # the thread that ran plugin.execute
+    cpu_process_s = Column(Float) # whole API process, includes helper threads
+    peak_rss_mb = Column(Float, nullable=True)
+    children_cpu_s = Column(Float, nullable=True)
+    children_peak_rss_mb = Column(Float, nullable=True)
+    children_max = Column(Integer, nullable=True)
+    children_killed = Column(Integer, default=0)
+    abort_reason = Column(String, nullable=True) # soft limit that was exceeded, if any
+    recorded_at = Column(DateTime, default=datetime.datetime.now)
+
 class PluginState(Base):
     __tablename__ = "plugin_state"
     
@@ -33,3 +50,68 @@ class PluginState(Base):
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+
+def get_task_status(task_id) -> dict:
+    """Returns the API view of a task, or None if it does not exist."""
+    db = SessionLocal()
+    try:
+        task = db.query(TaskLog).filter(TaskLog.id == int(task_id)).first()
+        if not task:
+            return None
+        return {
+            "id": task.id,
+            "status": task.status,
+            "plugin_id": task.plugin_id,
+            "result": task.result_message,
+            "error": task.error_message
+        }
+    finally:
+        db.close()
+
+def record_task_usage(task_id, plugin_id: str, usage: dict):
+    db = SessionLocal()
+    try:
+        db.merge(TaskUsage(task_id=int(task_id), plugin_id=plugin_id, **usage))
+        db.commit()
+    finally:
+        db.close()
+
+def get_task_usage(task_id) -> dict:
+    db = SessionLocal()
+    try:
+        row = db.query(TaskUsage).filter(TaskUsage.task_id == int(task_id)).first()
+        if not row:
+            return None
+        return {c.name: getattr(row, c.name) for c in TaskUsage.__table__.columns}
+    finally:
+        db.close()
+
+def usage_summary(since: datetime.datetime = None) -> dict:
+    """Per-plugin totals, averages and peaks, for capacity planning."""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            TaskUsage.plugin_id,
+            func.count(TaskUsage.task_id),
+            func.avg(TaskUsage.wall_s), func.max(TaskUsage.wall_s),
+            func.sum(TaskUsage.cpu_process_s), func.sum(TaskUsage.children_cpu_s),
+            func.max(TaskUsage.peak_rss_mb), func.max(TaskUsage.children_peak_rss_mb),
+            func.count(TaskUsage.abort_reason)
+        )
+        if since:
+            query = query.filter(TaskUsage.recorded_at >= since)
+        summary = {}
+        for pid, count, avg_wall, max_wall, cpu, children_cpu, rss, children_rss, aborted in query.group_by(TaskUsage.plugin_id):
+            summary[pid] = {
+                "tasks": count,
+                "avg_wall_s": round(avg_wall or 0, 3),
+                "max_wall_s": max_wall,
+                "cpu_s": round(cpu or 0, 3),
+                "children_cpu_s": round(children_cpu or 0, 3),
+                "peak_rss_mb": rss,
+                "children_peak_rss_mb": children_rss,
+                "limit_aborts": aborted
+            }
+        return summary
+    finally:
+        db.close()
@@ -0,0 +1,155 @@
+import os
+import json
+import asyncio
+from typing import Dict, Any
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
+from app.core.chat_outbox import ChatOutbox, StatusMessage
+
+class HTTPSynapseClient:
+    """Talks to a Synapse server over its REST API (used by the polling bot)."""
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8000"):
+        self.base_url = base_url.rstrip("/")
+
+    async def submit(self, text: str, origin: Dict[str, Any] = None) -> str:
+        import requests
+        res = await asyncio.to_thread(requests.post, f"{self.base_url}/api/command", json={"text": text, "origin": origin})
+        if res.status_code != 200:
+            raise RuntimeError(f"API Error: {res.status_code}")
+        return res.json().get("task_id")
+
+    async def get_task(self, task_id: str) -> Dict[str, Any]:
+        import requests
+        res = await asyncio.to_thread(requests.get, f"{self.base_url}/api/task/{task_id}")
+        if res.status_code != 200:
+            return None
+        return res.json()
+
+
+class LocalSynapseClient:
+    """Submits straight into the in-process Orchestrator (used by webhook mode)."""
+
+    async def submit(self, text: str, origin: Dict[str, Any] = None) -> str:
+        from app.core.orchestrator import Orchestrator
+        orc = Orchestrator.get_instance()
+        task_id = await asyncio.to_thread(orc.create_task, text, origin)
+        asyncio.get_running_loop().run_in_executor(None, orc.handle_command, task_id)
+        return task_id
+
+    async def get_task(self, task_id: str) -> Dict[str, Any]:
+        from app.core.orchestrator import Orchestrator
+        return await asyncio.to_thread(Orchestrator.get_instance().describe_task, task_id)
+
+
+class TelegramBridge:
+    """
+    Chat handlers shared by the polling bot (run_bot.py) and the webhook mode
+    served from the FastAPI app. Only the Synapse client differs between them.
+
+    Each command gets one status message that is edited in place with the
+    plugin's progress and finally replaced by the result.
+    """
+
+    def __init__(self, client, poll_interval: float = 2, timeout: float = 120, min_edit_interval: float = 3):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.min_edit_interval = min_edit_interval
+        self._outboxes: Dict[int, ChatOutbox] = {} # bot id -> outbox
+
+    def register(self, application):
+        application.add_handler(CommandHandler("start", self.start))
+        # Handle ALL text messages including commands that aren't /start
+        application.add_handler(MessageHandler(filters.TEXT, self.handle_msg))
+
+    def outbox_for(self, bot) -> ChatOutbox:
+        if bot.id not in self._outboxes:
+            self._outboxes[bot.id] = ChatOutbox(bot, min_edit_interval=self.min_edit_interval)
+        return self._outboxes[bot.id]
+
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        self.outbox_for(context.bot).send(update.effective_chat.id, "Synapse Connected. Use /ag, /gcli, or /sys commands.")
+
+    async def handle_msg(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
+        outbox = self.outbox_for(context.bot)
+        text = update.message.text
+        # Lets plugins message this chat later (e.g. price alerts).
+        origin = {"channel": "telegram", "bot_id": str(context.bot.id), "chat_id": chat_id}
+        try:
+            task_id = await self.client.submit(text, origin)
+        except Exception as e:
+            outbox.send(chat_id, f"Connection Error: {e}")
+            return
+
+        status = await outbox.status(chat_id, f"Command Queued (Task {task_id})...")
+
+        # Poll for result, reflecting plugin progress in the status message
+        for _ in range(int(self.timeout / self.poll_interval)):
+            await asyncio.sleep(self.poll_interval)
+            try:
+                t_data = await self.client.get_task(task_id)
+                if not t_data:
+                    continue
+                state = t_data.get("status")
+                if state == "DONE":
+                    await self._send_result(outbox, status, t_data.get("result", ""))
+                    return
+                elif state == "FAILED":
+                    await status.finish(f"Error: {t_data.get('error')}")
+                    return
+                elif state == "RUNNING":
+                    await status.update(self._format_progress(task_id, t_data))
+            except Exception as e:
+                print(f"Polling Error: {e}")
+
+        await status.finish(f"Task {task_id} timed out (check logs).")
+
+    def _format_progress(self, task_id, t_data) -> str:
+        progress = t_data.get("progress") or {}
+        line = f"Task {task_id} running ({t_data.get('plugin_id') or '?'})"
+        phase = progress.get("phase")
+        if phase and phase != "N/A":
+            line += f" [{phase}]"
+        if progress.get("message"):
+            line += f"\n{progress['message']}"
+        return line
+
+    async def _send_result(self, outbox: ChatOutbox, status: StatusMessage, raw_result):
+        # Try Parse JSON
+        try:
+            res_obj = json.loads(raw_result)
+            message = res_obj.get("message", str(raw_result))
+            files = res_obj.get("files", [])
+        except Exception:
+            message = str(raw_result)
+            files = []
+
+        # The status message becomes the result; overflow goes through the queue.
+        await status.finish(message[:outbox.max_len] or "Done.")
+        if len(message) > outbox.max_len:
+            outbox.send(status.chat_id, message[outbox.max_len:])
+            await outbox.flush(status.chat_id)
+
+        files = [f for f in files if os.path.exists(f)]
+        if files:
+            await outbox.send_files(status.chat_id, files)
+
+
+def build_application(token: str, bridge: TelegramBridge, api_base_url: str = None, webhook: bool = False):
+    """
+    Builds a python-telegram-bot Application wired to the bridge handlers.
+    In webhook mode there is no Updater; updates are pushed in by the API.
+    `api_base_url` points the bot at an alternative Bot API (e.g. the fake
+    server in telegram_harness.py) for offline runs.
+    """
+    builder = ApplicationBuilder().token(token).concurrent_updates(True)
+    if api_base_url:
+        base = api_base_url.rstrip("/")
+        builder = builder.base_url(f"{base}/bot").base_file_url(f"{base}/file/bot")
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+    bridge.register(application)
+    return application
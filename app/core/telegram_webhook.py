@@ -0,0 +1,163 @@
+import os
+import hmac
+import hashlib
+import secrets
+from collections import OrderedDict
+from typing import Dict, Any, List
+from app.core.config_manager import ConfigManager
+
+class TelegramWebhookManager:
+    """
+    Serves one or more Telegram bots from the FastAPI process via webhooks.
+
+    Incoming updates are verified against a per-bot secret token, de-duplicated
+    and put straight onto the bot application's update queue, so the webhook
+    call returns at once and python-telegram-bot processes them.
+    """
+    _instance = None
+
+    def __init__(self):
+        cfg = ConfigManager.get_telegram_config()
+        self.mode = cfg.get("mode", "polling")
+        self.webhook_base_url = (cfg.get("webhook_base_url") or "").rstrip("/")
+        self.api_base_url = cfg.get("api_base_url") or None
+        # Master secret; each bot gets its own token derived from it.
+        self.master_secret = cfg.get("webhook_secret") or os.getenv("TELEGRAM_WEBHOOK_SECRET") or self._stored_secret(cfg.get("webhook_secret_path", ".telegram_webhook_secret"))
+
+        self.applications: Dict[str, Any] = {} # bot_id -> telegram Application
+        self._seen: Dict[str, OrderedDict] = {} # bot_id -> recent update_ids
+        self.stats = {"received": 0, "rejected": 0, "duplicates": 0, "dispatched": 0}
+
+    @classmethod
+    def get_instance(cls):
+        if not cls._instance:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def _stored_secret(path: str) -> str:
+        """
+        Secret kept in `path`, generated on first use. A secret that changed on
+        every restart would make Telegram's in-flight retries fail until the
+        webhooks are registered again.
+        """
+        if os.path.exists(path):
+            with open(path) as f:
+                secret = f.read().strip()
+            if secret:
+                return secret
+        secret = secrets.token_urlsafe(32)
+        try:
+            with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                f.write(secret)
+            print(f"[Telegram] No webhook_secret configured; generated one in {path}.")
+        except OSError as e:
+            print(f"[Telegram] Could not save the generated webhook secret to {path} ({e}); set telegram.webhook_secret or TELEGRAM_WEBHOOK_SECRET so it survives restarts.")
+        return secret
+
+    @staticmethod
+    def get_tokens() -> List[str]:
+        """TELEGRAM_TOKEN plus any extra bots listed comma-separated in TELEGRAM_TOKENS."""
+        tokens = []
+        for raw in [os.getenv("TELEGRAM_TOKEN", "")] + os.getenv("TELEGRAM_TOKENS", "").split(","):
+            t = raw.strip()
+            if t and t not in tokens:
+                tokens.append(t)
+        return tokens
+
+    @staticmethod
+    def derive_secret(master_secret: str, bot_id: str) -> str:
+        # Telegram only allows [A-Za-z0-9_-] here, so hex is a safe encoding.
+        return hmac.new(master_secret.encode(), bot_id.encode(), hashlib.sha256).hexdigest()
+
+    def is_enabled(self) -> bool:
+        return self.mode == "webhook"
+
+    async def start(self):
+        from app.core.telegram_bridge import TelegramBridge, LocalSynapseClient, build_application
+
+        if not self.webhook_base_url:
+            print("[Telegram] webhook_base_url not configured. Webhook mode disabled.")
+            return
+        tokens = self.get_tokens()
+        if not tokens:
+            print("[Telegram] No TELEGRAM_TOKEN found. Webhook mode disabled.")
+            return
+
+        bridge = TelegramBridge(LocalSynapseClient())
+        for token in tokens:
+            bot_id = token.split(":", 1)[0]
+            application = build_application(token, bridge, api_base_url=self.api_base_url, webhook=True)
+            try:
+                await application.initialize()
+                await application.start()
+                await application.bot.set_webhook(
+                    url=f"{self.webhook_base_url}/api/telegram/{bot_id}",
+                    secret_token=self.derive_secret(self.master_secret, bot_id),
+                    allowed_updates=["message"]
+                )
+            except Exception as e:
+                print(f"[Telegram] Failed to start webhook for bot {bot_id}: {e}")
+                continue
+            self.applications[bot_id] = application
+            self._seen[bot_id] = OrderedDict()
+            print(f"[Telegram] Webhook active for bot {bot_id}.")
+
+    async def stop(self):
+        for bot_id, application in self.applications.items():
+            try:
+                await application.stop()
+                await application.shutdown()
+            except Exception as e:
+                print(f"[Telegram] Error stopping bot {bot_id}: {e}")
+        self.applications = {}
+
+    def enqueue(self, bot_id: str, secret_token: str, payload) -> int:
+        """
+        Verifies a webhook payload (one update or a list of them) and hands its
+        updates to the bot's application.
+        Raises KeyError for an unknown bot and PermissionError for a bad secret.
+        Returns the number of updates accepted.
+        """
+        from telegram import Update
+
+        application = self.applications.get(bot_id)
+        if not application:
+            raise KeyError(bot_id)
+        expected = self.derive_secret(self.master_secret, bot_id)
+        if not secret_token or not hmac.compare_digest(secret_token, expected):
+            self.stats["rejected"] += 1
+            raise PermissionError("Invalid webhook secret token.")
+
+        updates = payload if isinstance(payload, list) else [payload]
+        accepted = 0
+        seen = self._seen[bot_id]
+        for data in updates:
+            self.stats["received"] += 1
+            update_id = data.get("update_id") if isinstance(data, dict) else None
+            if update_id is None:
+                continue
+            # Telegram re-delivers on slow responses; drop what we already have.
+            if update_id in seen:
+                self.stats["duplicates"] += 1
+                continue
+            try:
+                update = Update.de_json(data, application.bot)
+            except Exception as e:
+                print(f"[Telegram] Dropping malformed update for bot {bot_id}: {e}")
+                continue
+            seen[update_id] = True
+            if len(seen) > 1000:
+                seen.popitem(last=False)
+            application.update_queue.put_nowait(update)
+            self.stats["dispatched"] += 1
+            accepted += 1
+        return accepted
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "bots": list(self.applications.keys()),
+            "queued": sum(app.update_queue.qsize() for app in self.applications.values()),
+            **self.stats
+        }
@@ -27,7 +27,7 @@ class Watchdog:
             active_plugin_id = self.orchestrator.active_plugin_id
             
             if active_plugin_id:
-                plugin = PluginManager.get_instance().get_plugin_by_id(active_plugin_id)
+                plugin = self.orchestrator.active_plugin or PluginManager.get_instance().get_plugin_by_id(active_plugin_id)
                 if plugin:
                     heartbeat = plugin.heartbeat()
                     # Here we could implement advanced logic:
@@ -1,23 +1,35 @@
-from fastapi import FastAPI, BackgroundTasks, Depends
+from app.core.startup_timeline import StartupTimeline
+timeline = StartupTimeline.get_instance()
+
+import os
+import sqlite3
+import datetime
+from fastapi import FastAPI, BackgroundTasks, Depends, Request, Header, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from app.core.config_manager import ConfigManager
 from app.core.plugin_manager import PluginManager
 from app.core.orchestrator import Orchestrator
-from app.core.task_store import init_db, SessionLocal, TaskLog
+from app.core.task_store import init_db, SessionLocal, TaskLog, get_task_usage, usage_summary
+from app.core.telegram_webhook import TelegramWebhookManager
+from app.core.llm_cache import LLMCache
+from app.core.circuit_breaker import all_breakers
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Any, Optional
+timeline.mark("imports")
 
 # Load Config
 from dotenv import load_dotenv
 load_dotenv()
 ConfigManager.load()
+timeline.mark("config")
 
 # Init DB
-init_db()
+with timeline.span("db:init"):
+    init_db()
 
-# Load Plugins
+# Index Plugins (imported lazily on first use; autoload ones warm up in the background)
 pm = PluginManager.get_instance()
 pm.load_plugins()
 
@@ -26,6 +38,42 @@ app = FastAPI()
 # Mount Static
 app.mount("/web", StaticFiles(directory="web", html=True), name="web")
 
+@app.on_event("startup")
+async def start_telegram_webhooks():
+    hooks = TelegramWebhookManager.get_instance()
+    if hooks.is_enabled():
+        with timeline.span("telegram:webhooks"):
+            await hooks.start()
+    timeline.mark_ready()
+    timeline.print_report(ConfigManager.get_server_config().get("startup_budget_ms", 1000))
+
+@app.on_event("startup")
+def resume_price_watches():
+    # The deals plugin runs the price-watch loop. Load it at startup only if
+    # some chat has a watch; otherwise it loads on its first /deals command.
+    path = ConfigManager.get_plugin_config("deals").get("history", {}).get("path", "price_history.db")
+    if not os.path.exists(path):
+        return
+    try:
+        with sqlite3.connect(path) as db:
+            watches = db.execute("SELECT COUNT(*) FROM price_watches").fetchone()[0]
+    except sqlite3.Error:
+        return
+    if watches:
+        print(f"[Deals] {watches} price watches pending; loading the deals plugin.")
+        pm.warmup(["deals"])
+
+@app.on_event("shutdown")
+async def stop_telegram_webhooks():
+    await TelegramWebhookManager.get_instance().stop()
+
+@app.on_event("shutdown")
+def stop_browsers():
+    # Imported here so selenium is not loaded at startup.
+    from app.core.browser_pool import BrowserPool
+    if BrowserPool._instance:
+        BrowserPool._instance.shutdown()
+
 @app.get("/")
 async def root():
     return RedirectResponse(url="/web/")
@@ -39,27 +87,78 @@ def get_db():
 
 class CommandReq(BaseModel):
     text: str
+    origin: Optional[Dict[str, Any]] = None # chat to notify later, e.g. {"channel": "telegram", "bot_id", "chat_id"}
 
 @app.post("/api/command")
 def send_command(req: CommandReq, bg: BackgroundTasks):
     orc = Orchestrator.get_instance()
     # Synchronous Create
-    task_id = orc.create_task(req.text)
+    task_id = orc.create_task(req.text, req.origin)
     # Async Execute
     bg.add_task(orc.handle_command, task_id)
     return {"status": "Queued", "task_id": task_id}
     
 @app.get("/api/task/{task_id}")
-def get_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(TaskLog).filter(TaskLog.id == task_id).first()
+def get_task(task_id: int):
+    task = Orchestrator.get_instance().describe_task(task_id)
     if not task:
         return {"status": "NOT_FOUND"}
-    return {
-        "id": task.id,
-        "status": task.status,
-        "result": task.result_message,
-        "error": task.error_message
-    }
+    return task
+
+@app.get("/api/task/{task_id}/usage")
+def get_task_resource_usage(task_id: int):
+    usage = get_task_usage(task_id)
+    if not usage:
+        return {"status": "NOT_FOUND"}
+    return usage
+
+@app.get("/api/usage")
+def get_usage_summary(hours: float = None):
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours) if hours else None
+    return {"plugins": usage_summary(since)}
+
+@app.post("/api/telegram/{bot_id}")
+async def telegram_webhook(bot_id: str, request: Request, x_telegram_bot_api_secret_token: str = Header(None)):
+    hooks = TelegramWebhookManager.get_instance()
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON.")
+    try:
+        accepted = hooks.enqueue(bot_id, x_telegram_bot_api_secret_token, payload)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown bot.")
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Invalid secret token.")
+    return {"ok": True, "accepted": accepted}
+
+@app.get("/api/llm")
+def llm_status():
+    from app.core.llm_manager import LLMManager
+    try:
+        llm = LLMManager.get_instance()
+    except Exception as e:
+        return {"status": "unconfigured", "error": str(e)}
+    return {"status": "ready", **llm.stats()}
+
+@app.get("/api/llm/cache")
+def llm_cache_stats():
+    return LLMCache.get_instance().stats()
+
+@app.get("/api/circuits")
+def circuit_status():
+    return {"circuits": all_breakers()}
+
+@app.get("/api/browsers")
+def browser_status():
+    from app.core.browser_pool import BrowserPool
+    if not BrowserPool._instance:
+        return {"status": "not started"}
+    return BrowserPool._instance.status()
+
+@app.get("/api/telegram")
+def telegram_status():
+    return TelegramWebhookManager.get_instance().status()
 
 @app.post("/api/stop")
 def stop_command():
@@ -75,9 +174,19 @@ def get_logs(db: Session = Depends(get_db)):
 def list_plugins():
     pm = PluginManager.get_instance()
     res = []
-    for pid, p in pm.plugins.items():
-        # Get manifest info
-        m = pm.manifests.get(pid, {})
+    for pid, m in pm.manifests.items():
+        p = pm.get_plugin_by_id(pid)
+        if not p:
+            # Not imported yet; it loads on its first command.
+            error = pm.load_errors.get(pid)
+            res.append({
+                "id": pid,
+                "name": m.get("name"),
+                "status": "error" if error else "not loaded",
+                "progress": None,
+                "message": error or "Loads on first use"
+            })
+            continue
         # Get realtime status
         hb = p.heartbeat()
         res.append({
@@ -89,6 +198,26 @@ def list_plugins():
         })
     return res
 
+class WarmupReq(BaseModel):
+    ids: List[str] = []
+
+@app.post("/api/plugins/warmup")
+def warmup_plugins(req: WarmupReq):
+    ids = PluginManager.get_instance().warmup(req.ids or None)
+    return {"warming": ids}
+
+@app.post("/api/plugins/{plugin_id}/reload")
+def reload_plugin(plugin_id: str):
+    pm = PluginManager.get_instance()
+    if plugin_id not in pm.manifests:
+        raise HTTPException(status_code=404, detail="Unknown plugin.")
+    return {"status": pm.reload_plugin(plugin_id)}
+
+@app.get("/api/startup")
+def startup_report():
+    budget = ConfigManager.get_server_config().get("startup_budget_ms", 1000)
+    return {**timeline.report(budget), "plugins": PluginManager.get_instance().load_report()}
+
 if __name__ == "__main__":
     import uvicorn
     cfg = ConfigManager.get_server_config()
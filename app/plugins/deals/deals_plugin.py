@@ -1,27 +1,53 @@
-import time
 import re
-import random
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+import time
+import queue
+import threading
 from app.core.plugin_base import PluginBase
+from app.core.browser_pool import BrowserPool
 from app.core.llm_manager import LLMManager
+from app.core.config_manager import ConfigManager
+from app.core.prompt_builder import PromptBuilder
+from app.plugins.deals.engine import ScrapeEngine, load_adapters
+from app.plugins.deals.price_history import PriceHistory, normalize
+from app.plugins.deals.watches import WatchList
+from app.plugins.deals.ranking import LocalRanker
+from app.core.notifier import Notifier
+
+WATCH_RE = re.compile(r"^(.+?)\s+(?:below|under)\s+\$?([\d,]+(?:\.\d+)?)$", re.IGNORECASE)
 
 class DealsPlugin(PluginBase):
     def on_load(self):
         self.running = False
+        self.status_message = "Price Engine Ready"
+        # Retailers are data: one JSON adapter per source in sources/ (see engine.SourceAdapter).
+        self.sources = load_adapters()
+        self.engine = ScrapeEngine(self.config, self.sources)
+        print(f"[Deals] Loaded {len(self.sources)} source adapters: {', '.join(a.name for a in self.sources)}")
+        self.ranker = LocalRanker(self.config.get("ranking"))
+        self.history = PriceHistory.get_instance(self.config)
+        self.watches = WatchList(self.history)
+        self._watch_stop = threading.Event()
+        self._checked = {} # normalized product -> last watch check
+        self._watch_slot = None # scrape slot of the watch check in progress
+        self._watch_thread = threading.Thread(target=self._watch_loop, name="deals-watch", daemon=True)
+        self._watch_thread.start()
+        if self.engine.needs_browser():
+            # Start a headless browser now so the first /deals does not pay for the launch.
+            BrowserPool.get_instance().prewarm()
 
     def shutdown(self):
-        pass
+        self._watch_stop.set()
+        slot = self._watch_slot
+        if slot:
+            # Hand the watch check's browser back now rather than after its page load.
+            self._cancel_scrape(BrowserPool.get_instance(), slot)
+        self._watch_thread.join(timeout=10)
 
     def is_busy(self) -> bool:
         return self.running
 
     def heartbeat(self):
-        return {"status": "running" if self.running else "idle", "progress": "N/A", "message": "Price Engine Ready"}
+        return {"status": "running" if self.running else "idle", "progress": "N/A", "message": self.status_message}
 
     def execute(self, command: str, context: dict) -> str:
         # Debug Logger
@@ -33,58 +59,304 @@ class DealsPlugin(PluginBase):
         try:
             # Parse command: /deals iphone 15
             product = command.replace("/deals", "").strip()
+            verb, _, rest = product.partition(" ")
+            verb = verb.lower()
+            if verb == "history":
+                return self._history_report(rest.strip())
+            if verb in ("watch", "watches", "unwatch"):
+                return self._watch_command(verb, rest.strip(), context.get("origin"))
+            fresh = product.startswith("--fresh")
+            if fresh:
+                product = product[len("--fresh"):].strip()
             if not product:
-                return "Usage: /deals <product name>"
-            
-            # Scrape sequentially to prevent ChromeDriver crashes/resource exhaustion
-            # All scrapers now return a LIST of dicts: [{source, price, link, name}, ...]
-            ebay_results = self._safe_scrape(self._scrape_ebay, product) or []
-            amzn_results = self._safe_scrape(self._scrape_amazon, product) or []
-            sd_results = self._safe_scrape(self._scrape_slickdeals, product) or []
-            
-            # Combine all candidates
-            candidates = []
-            candidates.extend(ebay_results)
-            candidates.extend(amzn_results)
-            candidates.extend(sd_results)
+                return ("Usage: /deals [--fresh] <product name> | /deals history <product name>\n"
+                        "       /deals watch <product name> below <price> | /deals watches | /deals unwatch <#id or product>")
+
+            # Repeat lookups are answered from a recent scrape unless --fresh is given.
+            fresh_s = float(self.config.get("history", {}).get("fresh_s", 900))
+            recent = None if fresh else self.history.recent(product, fresh_s)
+            if recent and recent["winner"]:
+                age_min = (time.time() - recent["scraped_at"]) / 60
+                return self._format_winner(recent["winner"], product, note=f"\n(From a scrape {age_min:.0f} min ago; use /deals --fresh {product} to re-check.)")
+
+            # All scrapers return a LIST of dicts: [{source, price, link, name}, ...]
+            candidates, missing = self._scrape_all(product)
             
             if not candidates:
-                 return f"Could not find valid prices for '{product}' on Amazon, eBay, or Slickdeals. (Websites might be blocking the bot)."
+                 return f"Could not find valid prices for '{product}' on {', '.join(a.name for a in self.sources)}. (Websites might be blocking the bot).{self._skipped_note()}"
             
-            # Use the configured LLM to find the best deal if available
-            best_deal = self._analyze_with_llm(candidates, product)
+            best_deal, reason = self._pick_winner(candidates, product)
+            try:
+                self.history.record_search(product, candidates, best_deal)
+            except Exception as e:
+                print(f"[Deals] Could not record price history: {e}")
             
             if best_deal:
-                winner = best_deal
-                reason = "AI Selected for Best Value"
-                return f"Found best deal on {winner['source']}: ${winner['price']}\nProduct: {winner['name']}\nReason: {reason}\nLink: {winner['link']}"
+                note = f"\n(No results from {', '.join(missing)} in time.)" if missing else ""
+                note += self._skipped_note()
+                return self._format_winner(best_deal, product, note=note, reason=reason)
             else:
-                return f"I found {len(candidates)} listings, but my AI analysis determined they were likely accessories or cases, not the actual '{product}'. Please try a more specific query."
+                return f"I found {len(candidates)} listings, but they look like accessories or cases, not the actual '{product}'. Please try a more specific query."
 
         finally:
             self.running = False
-            pass
-
-    def _safe_scrape(self, scrape_func, product):
+            self.status_message = "Price Engine Ready"
+
+    def _skipped_note(self):
+        skipped = self.engine.open_circuits()
+        if not skipped:
+            return ""
+        parts = [f"{s['source']} (blocked, retrying in {max(1, round(s['retry_in_s'] / 60))} min)" for s in skipped]
+        return f"\n(Skipped {', '.join(parts)}.)"
+
+    def _format_winner(self, winner, product, note="", reason="Lowest price after filtering out accessories"):
+        return f"Found best deal on {winner['source']}: ${winner['price']}\nProduct: {winner['name']}\nReason: {reason}\nLink: {winner['link']}{self._trend_line(product)}{note}"
+
+    def _trend_line(self, product, days=30):
+        trend = self.history.trend(product, days)
+        if len(trend) < 2:
+            return ""
+        points = " -> ".join(f"${t['price']:.2f} ({t['day'][5:]})" for t in trend[-5:])
+        low = min(trend, key=lambda t: t["price"])
+        return f"\nTrend ({days}d, daily low): {points}; lowest ${low['price']:.2f} on {low['day']}"
+
+    def _history_report(self, product, days=30):
+        if not product:
+            return "Usage: /deals history <product name>"
+        lows = self.history.source_lows(product, days)
+        if not lows:
+            return f"No price history for '{product}' yet. Run /deals {product} first."
+        lines = [f"Price history for '{product}' (last {days} days):"]
+        trend = self.history.trend(product, days)
+        if trend:
+            lines.append("Picked price by day: " + ", ".join(f"{t['day']} ${t['price']:.2f}" for t in trend[-10:]))
+        lines.append("Lowest listing per source (accessories included):")
+        for entry in lows:
+            low = entry["lowest"]
+            seen = time.strftime("%Y-%m-%d", time.localtime(low["seen_at"]))
+            lines.append(f"- {entry['source']}: ${low['price']:.2f} on {seen}, {low['name'][:60]} ({entry['listings']} listings)\n  {low['link']}")
+        return "\n".join(lines)
+
+    def _watch_command(self, verb, args, origin):
+        chat = Notifier.address(origin)
+        if not chat:
+            return "Price watches send alerts to a chat, so use this command from Telegram or WhatsApp."
+        if verb == "watches":
+            watches = self.watches.for_chat(chat)
+            if not watches:
+                return "No price watches in this chat. Add one with /deals watch <product name> below <price>."
+            lines = ["Price watches in this chat:"]
+            for w in watches:
+                alerted = f" (alerted at ${w['notified']:.2f})" if w["notified"] is not None else ""
+                lines.append(f"#{w['id']} {w['product']}: ${w['below']:.2f} or less{alerted}")
+            return "\n".join(lines)
+        if verb == "unwatch":
+            if not args:
+                return "Usage: /deals unwatch <#id or product name>"
+            removed = self.watches.remove(chat, args)
+            return f"Stopped watching '{removed['product']}'." if removed else f"No watch matching '{args}' in this chat."
+
+        match = WATCH_RE.match(args)
+        if not match:
+            return "Usage: /deals watch <product name> below <price>"
+        product, below = match.group(1).strip(" ,.:"), float(match.group(2).replace(",", ""))
+        cfg = self.config.get("watch", {})
+        limit = int(cfg.get("max_per_chat", 20))
+        if not any(w["query"] == normalize(product) for w in self.watches.for_chat(chat)) and self.watches.count(chat) >= limit:
+            return f"This chat already has {limit} price watches. Remove one with /deals unwatch <id>."
+        watch, created = self.watches.add(product, below, chat, origin)
+        interval_min = float(cfg.get("interval_s", 1800)) / 60
+        action = "Watching" if created else "Updated watch on"
+        return f"{action} '{product}' (#{watch['id']}): I'll message this chat when it is ${below:.2f} or less. Prices are checked every {interval_min:.0f} min."
+
+    def _watch_loop(self):
+        interval = float(self.config.get("watch", {}).get("interval_s", 1800))
+        while not self._watch_stop.wait(min(60.0, interval)):
+            try:
+                self._check_watches(interval)
+            except InterruptedError:
+                return
+            except Exception as e:
+                print(f"[Deals] Watch check failed: {e}")
+
+    def _check_watches(self, interval):
+        """
+        Checks every due product once, however many chats watch it: the
+        price comes from a scrape younger than `interval` when there is one
+        (a /deals lookup or another check), otherwise from one new scrape,
+        and is then fanned out to each subscriber.
+        """
+        checked, scraped, alerts = 0, 0, 0
+        for query, watches in self.watches.by_product().items():
+            if self._watch_stop.is_set():
+                return
+            if time.time() - self._checked.get(query, 0) < interval:
+                continue
+            self._checked[query] = time.time()
+            product = watches[0]["product"]
+            recent = self.history.recent(product, interval)
+            if recent:
+                winner = recent["winner"]
+            else:
+                scraped += 1
+                candidates = self._scrape_for_watch(product)
+                winner = self._pick_winner(candidates, product)[0] if candidates else None
+                if candidates:
+                    try:
+                        self.history.record_search(product, candidates, winner)
+                    except Exception as e:
+                        print(f"[Deals] Could not record price history: {e}")
+            checked += 1
+            for watch in watches:
+                alerts += self._alert_if_below(watch, winner)
+        if checked:
+            print(f"[Deals] Watch check: {checked} products ({scraped} scraped), {alerts} alerts sent.")
+
+    def _scrape_for_watch(self, product):
+        """
+        Background variant of `_scrape_all`: one source at a time, so a watch
+        check holds at most one pooled browser and leaves the rest to /deals
+        commands, with the stop flag checked between sources.
+        """
+        pool = BrowserPool.get_instance()
+        timeout = float(self.config.get("source_timeout_s", 20))
+        candidates = []
+        for adapter in self.sources:
+            if self._watch_stop.is_set():
+                raise InterruptedError("Deals plugin is shutting down.")
+            slot = {"started": time.time(), "driver": None, "cancelled": False}
+            self._watch_slot = slot
+            try:
+                candidates.extend(self.engine.scrape(adapter, product, slot, pool, timeout) or [])
+            except Exception as e:
+                if self._watch_stop.is_set():
+                    raise InterruptedError("Deals plugin is shutting down.")
+                print(f"[Deals] Watch scrape of {adapter.name} failed: {e}")
+            finally:
+                self._watch_slot = None
+        return candidates
+
+    def _alert_if_below(self, watch, winner) -> int:
+        if not winner:
+            return 0
+        price = float(winner["price"])
+        if price > watch["below"]:
+            if watch["notified"] is not None:
+                # Back above the target; the next drop alerts again.
+                self.watches.mark_notified(watch["id"], None)
+            return 0
+        if watch["notified"] is not None and price >= watch["notified"]:
+            return 0 # already told them about this price or a lower one
+        text = (f"Price alert: '{watch['product']}' is ${price:.2f} on {winner['source']} "
+                f"(your target: ${watch['below']:.2f}).\nProduct: {winner['name']}\nLink: {winner['link']}")
+        if not Notifier.get_instance().send(watch["origin"], text):
+            return 0
+        self.watches.mark_notified(watch["id"], price)
+        return 1
+
+    def _scrape_all(self, product):
+        """
+        Scrapes all sources concurrently through the shared engine.
+
+        A source is abandoned after `source_timeout_s`; once `deadline_s` has
+        passed, or `enough_candidates` have arrived, we stop waiting and the
+        browsers of sources still running are killed. Returns the candidates
+        and the names of sources that did not answer.
+        """
         import logging
-        driver = None
+        source_timeout = float(self.config.get("source_timeout_s", 20))
+        deadline = time.time() + float(self.config.get("deadline_s", 30))
+        enough = int(self.config.get("enough_candidates", 10))
+        pool = BrowserPool.get_instance()
+        results = queue.Queue()
+        running = {} # source -> {"started", "driver", "cancelled"}
+
+        def run(adapter):
+            slot = running[adapter.name]
+            try:
+                items = self.engine.scrape(adapter, product, slot, pool, source_timeout)
+                results.put((adapter.name, items or [], None))
+            except Exception as e:
+                results.put((adapter.name, [], e))
+
+        started = time.time()
+        for adapter in self.sources:
+            running[adapter.name] = {"started": time.time(), "driver": None, "cancelled": False}
+            threading.Thread(target=run, args=(adapter,), name=f"deals-{adapter.name}", daemon=True).start()
+
+        candidates = []
+        answered = []
         try:
-            logging.info(f"Scraping {scrape_func.__name__}...")
-            driver = self._get_driver()
-            result = scrape_func(driver, product)
-            logging.info(f"Result from {scrape_func.__name__}: Found {len(result) if result else 0} items")
-            return result
-        except Exception as e:
-            logging.error(f"Scrape Error ({scrape_func.__name__}): {e}")
-            print(f"Scrape Error ({scrape_func.__name__}): {e}")
-            return []
-        finally:
-            if driver:
+            while running:
+                self.check_stop()
+                finished = []
                 try:
-                    driver.quit()
-                    logging.info("Driver closed.")
-                except:
+                    finished.append(results.get(timeout=0.1))
+                    # Take everything else that has already arrived before deciding to stop waiting.
+                    while True:
+                        finished.append(results.get_nowait())
+                except queue.Empty:
                     pass
+                for source, items, error in finished:
+                    if source not in running:
+                        continue
+                    del running[source]
+                    answered.append(source)
+                    candidates.extend(items)
+                    if error:
+                        logging.error(f"Scrape Error ({source}): {error}")
+                        print(f"Scrape Error ({source}): {error}")
+                    logging.info(f"Result from {source}: Found {len(items)} items in {time.time() - started:.1f}s")
+                    self.status_message = f"Scraped {len(answered)}/{len(self.sources)} sources"
+
+                if len(candidates) >= enough and running:
+                    print(f"[Deals] {len(candidates)} candidates after {time.time() - started:.1f}s; not waiting for {', '.join(running)}.")
+                    break
+                now = time.time()
+                if now > deadline:
+                    print(f"[Deals] Deadline reached; answering without {', '.join(running)}.")
+                    break
+                for source, slot in list(running.items()):
+                    if now - slot["started"] > source_timeout:
+                        print(f"[Deals] {source} timed out after {source_timeout:.0f}s.")
+                        self._cancel_scrape(pool, slot)
+                        del running[source]
+        finally:
+            for slot in running.values():
+                self._cancel_scrape(pool, slot)
+
+        missing = [adapter.name for adapter in self.sources if adapter.name not in answered]
+        return candidates, missing
+
+    def _cancel_scrape(self, pool, slot):
+        slot["cancelled"] = True
+        if slot["driver"]:
+            pool.abort(slot["driver"])
+
+    def _pick_winner(self, candidates, product):
+        """
+        Returns (winner, reason). The local ranker drops duplicates and clear
+        accessories and usually settles the pick itself; the LLM is asked only
+        when an unsure listing could undercut the cheapest clear device.
+        `ranking.mode`: "auto" (default), "local" (never call the LLM) or
+        "llm" (always ask it, about every candidate). If the LLM gives no
+        answer, the local pick stands.
+        """
+        mode = self.config.get("ranking", {}).get("mode", "auto")
+        ranking = self.ranker.rank(candidates, product)
+        counts = ranking["counts"]
+        print(f"[Deals] Local filter: {counts['unique']}/{counts['input']} unique, {counts['device']} devices, "
+              f"{counts['accessory'] + counts['other']} excluded, {counts['unsure']} unsure")
+        if mode == "llm" or (mode != "local" and ranking["ambiguous"]):
+            winner = self._analyze_with_llm(candidates if mode == "llm" else ranking["shortlist"], product)
+            if winner:
+                return {k: winner[k] for k in ("source", "price", "link", "name")}, "AI Selected for Best Value"
+            if ranking["best"]:
+                print("[Deals] No pick from the LLM; using the local one.")
+        best = ranking["best"]
+        if not best:
+            return None, None
+        return {k: best[k] for k in ("source", "price", "link", "name")}, "Lowest price after filtering out accessories"
 
     def _analyze_with_llm(self, candidates, product):
         try:
@@ -94,33 +366,25 @@ class DealsPlugin(PluginBase):
             return None
             
         try:
-            prompt = f"""
-            You are a smart shopping assistant. I am searching for: "{product}".
-            
-            Here are the candidate products found on Amazon/eBay/Slickdeals:
-            {candidates}
+            # Candidates go in as compact rows keyed by short IDs; links never enter the prompt.
+            budget = ConfigManager.get_llm_config().get("prompt_budgets", {}).get("deals.analyze")
+            builder = PromptBuilder(provider=llm.provider, model=llm.model_name, budget=budget)
+            rows = [dict(c, id=builder.ref(c, prefix="c")) for c in candidates]
+            builder.add(f"""You are a smart shopping assistant. I am searching for: "{product}".
+Candidate listings from Amazon/eBay/Slickdeals (one per line):""", name="intro")
+            builder.add(builder.table(rows, ["id", "source", "price", "name"]), name="candidates", trim=True)
+            builder.add("""YOUR TASK:
+1. FILTER: Identify which candidates are the ACTUAL DEVICE and which are accessories/cases.
+2. EXCLUDE: Discard any item that is a case, skin, cover, or accessory.
+3. SELECT: From the valid actual devices, pick the one with the lowest price.
+
+If NO valid actual devices are found, return {"error": "No valid products found"}.
+Otherwise return {"id": "<id of the winner>"}.
+Return ONLY valid JSON. No markdown formatting.""", name="task")
+            prompt = builder.build()
+            print(f"[Deals] Analysis prompt: {builder.stats['tokens']} tokens for {len(candidates)} candidates")
             
-            YOUR TASK:
-            1.  **FILTER**: Identify which candidates are the **ACTUAL DEVICE** and which are accessories/cases.
-            2.  **EXCLUDE**: Discard any item that is a case, skin, cover, or accessory.
-            3.  **SELECT**: From the valid actual devices, pick the one with the **lowest price**.
-            
-            If NO valid actual devices are found (all are cases), return {{ "error": "No valid products found" }}.
-            
-            Otherwise, return the JSON object of the best winner EXACTLY as it appears in the list.
-            
-            Example Output Format:
-            {{
-                "source": "Amazon",
-                "price": 999.00,
-                "link": "...",
-                "name": "Iphone 16 Pro 128GB"
-            }}
-            
-            Return ONLY valid JSON. No markdown formatting.
-            """
-            
-            response = llm.generate_content(prompt)
+            response = llm.generate_content(prompt, cache="deals.analyze")
             # Robust JSON cleaning
             text = response.text.strip()
             if text.startswith("```json"):
@@ -132,6 +396,8 @@ class DealsPlugin(PluginBase):
             data = self._safe_json_load(text)
             if not data or "error" in data:
                 return None
+            if "id" in data:
+                data = builder.lookup(data["id"])
             if not self._is_valid_candidate(data):
                 print(f"Invalid candidate shape from model: {data}")
                 return None
@@ -171,283 +437,3 @@ class DealsPlugin(PluginBase):
         except Exception:
             return False
         return True
-
-    def _get_driver(self):
-        options = webdriver.ChromeOptions()
-        # Randomized User Agents
-        uas = [
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        ]
-        options.add_argument(f"user-agent={random.choice(uas)}")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-        options.add_argument("--headless") # Reverted to standard headless for stability
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--lang=en-US")
-        options.add_argument("--accept-lang=en-US,en;q=0.9")
-        # Stability Flags
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        
-        # Force re-install and log to file
-        service = Service(ChromeDriverManager().install(), log_output="chromedriver.log")
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        # Additional undetectable scripts
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": """
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """
-        })
-        return driver
-
-    def _parse_price(self, price_str):
-        if not price_str: return None
-        # Remove $ and , and ' to '
-        clean = price_str.replace('$', '').replace(',', '').strip()
-        try:
-            # Handle range: "10 to 20"
-            if ' ' in clean:
-                clean = clean.split(' ')[0]
-            match = re.search(r"\d+(?:\.\d+)?", clean)
-            if not match:
-                return None
-            return float(match.group(0))
-        except:
-            return None
-
-    def _scrape_ebay(self, driver, product):
-        results = []
-        try:
-            # Simplified search
-            url = f"https://www.ebay.com/sch/i.html?_nkw={product.replace(' ', '+')}&_sop=15"
-            driver.get(url)
-            
-            # Wait for items
-            try:
-                WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, ".s-item")))
-            except:
-                pass 
-            
-            # 1. Structured Scraping
-            items = driver.find_elements(By.CSS_SELECTOR, "li.s-item")
-            for item in items:
-                if "Shop on eBay" in item.text: continue
-                if len(results) >= 5: break
-                try:
-                    link_elem = item.find_element(By.CSS_SELECTOR, ".s-item__link")
-                    title_elem = item.find_element(By.CSS_SELECTOR, ".s-item__title")
-                    
-                    # Price: try multiple classes
-                    price_text = ""
-                    try:
-                        price_text = item.find_element(By.CSS_SELECTOR, ".s-item__price").text
-                    except:
-                        continue # No price, skip
-
-                    link = link_elem.get_attribute("href")
-                    name = title_elem.text
-                    price = self._parse_price(price_text)
-                    
-                    if price:
-                        results.append({"source": "eBay", "price": price, "link": link, "name": name})
-                except:
-                    continue
-            
-            # 2. Fuzzy Fallback if 0 results
-            if not results:
-                print("eBay: Structured scrape failed. Trying fuzzy fallback...")
-                links = driver.find_elements(By.TAG_NAME, "a")
-                for lnk in links:
-                    if len(results) >= 5: break
-                    try:
-                        href = lnk.get_attribute("href")
-                        if href and "/itm/" in href:
-                            # Check text for price
-                            text = lnk.text
-                            # often price is in the link text or parent text
-                            if "$" not in text:
-                                try:
-                                    text = lnk.find_element(By.XPATH, "..").text
-                                except:
-                                    pass
-                            
-                            match = re.search(r'\$(\d+\.\d{2})', text)
-                            if match:
-                                price = float(match.group(1))
-                                if price > 10: # filtering junk
-                                    results.append({"source": "eBay", "price": price, "link": href, "name": text.split('$')[0].strip()[:50]})
-                    except:
-                        continue
-
-            if not results:
-                # DEBUG: Log page source to check for CAPTCHA/Block
-                import logging
-                src = driver.page_source[:2000].replace("\n", " ")
-                logging.warning(f"eBay found 0 items. Page Source Dump: {src}")
-                
-            return results
-        except Exception as e:
-            print(f"eBay Error: {e}")
-            return []
-
-    def _scrape_amazon(self, driver, product):
-        results = []
-        try:
-            url = f"https://www.amazon.com/s?k={product.replace(' ', '+')}"
-            driver.get(url)
-            
-            try:
-                # Wait for any Result item
-                WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.s-result-item")))
-            except:
-                pass
-
-            # 1. Structured Scraping
-            items = driver.find_elements(By.CSS_SELECTOR, "div.s-result-item[data-component-type='s-search-result']")
-            if not items:
-                items = driver.find_elements(By.CSS_SELECTOR, "div.s-result-item")
-            
-            for item in items:
-                if len(results) >= 5: break
-                try:
-                    # Skip if ad holder or special content
-                    if "AdHolder" in item.get_attribute("class"): continue
-
-                    # Name & Link
-                    try:
-                        title_el = item.find_element(By.CSS_SELECTOR, "h2 a")
-                        name = title_el.text
-                        link = title_el.get_attribute("href")
-                    except:
-                        continue
-
-                    # Price
-                    try:
-                        price_el = item.find_element(By.CSS_SELECTOR, ".a-price .a-offscreen")
-                        price_text = price_el.get_attribute("textContent")
-                    except:
-                        # try visible price
-                        try:
-                            price_text = item.find_element(By.CSS_SELECTOR, ".a-price").text
-                        except:
-                            continue # no price
-                    
-                    price = self._parse_price(price_text)
-                    
-                    if price and link and name:
-                        results.append({"source": "Amazon", "price": price, "link": link, "name": name})
-                except:
-                   continue
-
-            # 2. Fuzzy Fallback
-            if not results:
-                print("Amazon: Structured scrape failed. Trying fuzzy fallback...")
-                links = driver.find_elements(By.TAG_NAME, "a")
-                for lnk in links:
-                    if len(results) >= 5: break
-                    try:
-                        href = lnk.get_attribute("href")
-                        if href and "/dp/" in href:
-                             # Look for price in parent text
-                             try:
-                                 parent_text = lnk.find_element(By.XPATH, "../../..").text
-                                 match = re.search(r'\$(\d+\.\d{2})', parent_text)
-                                 if match:
-                                     price = float(match.group(1))
-                                     if price > 10:
-                                         name = lnk.text or "Amazon Product"
-                                         results.append({"source": "Amazon", "price": price, "link": href, "name": name})
-                             except:
-                                 pass
-                    except:
-                        continue
-
-            if not results:
-                # DEBUG: Log page source
-                import logging
-                src = driver.page_source[:2000].replace("\n", " ")
-                logging.warning(f"Amazon found 0 items. Page Source Dump: {src}")
-
-            return results
-
-        except Exception as e:
-            print(f"Amazon Scrape Error: {e}")
-            return []
-
-    def _scrape_slickdeals(self, driver, product):
-        results = []
-        try:
-            url = f"https://slickdeals.net/newsearch.php?q={product.replace(' ', '+')}&searcharea=deals&searchin=first"
-            driver.get(url)
-
-            try:
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".resultRow, .dealTile, .dealCard"))
-                )
-            except:
-                pass
-
-            # 1. Structured scraping
-            items = driver.find_elements(By.CSS_SELECTOR, ".resultRow, .dealTile, .dealCard")
-            for item in items:
-                if len(results) >= 5:
-                    break
-                try:
-                    # Title & link
-                    link_el = None
-                    try:
-                        link_el = item.find_element(By.CSS_SELECTOR, "a.dealLink, a.dealTitle, a")
-                    except:
-                        continue
-                    link = link_el.get_attribute("href")
-                    name = link_el.text.strip()
-
-                    # Price (best effort)
-                    price_text = ""
-                    try:
-                        price_text = item.find_element(By.CSS_SELECTOR, ".price, .dealPrice, .priceInfo, .threadPrice").text
-                    except:
-                        price_text = item.text
-
-                    price = self._parse_price(price_text)
-                    if link and "slickdeals.net" in link and price:
-                        results.append({"source": "Slickdeals", "price": price, "link": link, "name": name or "Slickdeals Deal"})
-                except:
-                    continue
-
-            # 2. Fuzzy fallback
-            if not results:
-                links = driver.find_elements(By.CSS_SELECTOR, "a[href*='slickdeals.net/f/']")
-                for lnk in links:
-                    if len(results) >= 5:
-                        break
-                    try:
-                        href = lnk.get_attribute("href")
-                        text = lnk.text
-                        if not text:
-                            try:
-                                text = lnk.find_element(By.XPATH, "..").text
-                            except:
-                                text = ""
-                        price = self._parse_price(text)
-                        if href and price:
-                            results.append({"source": "Slickdeals", "price": price, "link": href, "name": text.split('$')[0].strip()[:80] or "Slickdeals Deal"})
-                    except:
-                        continue
-
-            if not results:
-                import logging
-                src = driver.page_source[:2000].replace("\n", " ")
-                logging.warning(f"Slickdeals found 0 items. Page Source Dump: {src}")
-
-            return results
-        except Exception as e:
-            print(f"Slickdeals Scrape Error: {e}")
-            return []
@@ -0,0 +1,235 @@
+import re
+from urllib.parse import urljoin
+from typing import Dict, Any
+
+# Runs in the page. Waits (in-page) for `wait_for`, then collects every item
+# described by the spec in one pass, so a whole results page costs a single
+# WebDriver round trip instead of one per element and field.
+EXTRACT_JS = r"""
+var spec = arguments[0], done = arguments[arguments.length - 1];
+
+function read(el, attr) {
+    if (attr === 'text') return el.innerText;
+    if (attr === 'textContent') return el.textContent;
+    // Properties such as href come back as absolute URLs, like Selenium's get_attribute.
+    if (attr in el && typeof el[attr] === 'string') return el[attr];
+    return el.getAttribute(attr);
+}
+
+function pick(root, alternatives) {
+    for (var i = 0; i < alternatives.length; i++) {
+        var alt = alternatives[i];
+        var el = alt.css ? root.querySelector(alt.css) : root;
+        if (!el) continue;
+        var value = read(el, alt.attr || 'text');
+        // An empty match (a blank price span) falls through to the next alternative.
+        if (value != null && String(value).trim()) return String(value).trim();
+    }
+    return null;
+}
+
+function itemNodes() {
+    var selectors = spec.items || [];
+    for (var i = 0; i < selectors.length; i++) {
+        var found = document.querySelectorAll(selectors[i]);
+        if (found.length) return found;
+    }
+    return [];
+}
+
+// Block/CAPTCHA page check (same markers as http_fetch.detect_block). Only run
+// while no result items are on the page, so normal pages never pay for innerText.
+function blockReason() {
+    if (!spec.block_pattern) return null;
+    var text = (document.title || '') + ' ' + (document.body ? document.body.innerText.slice(0, 20000) : '');
+    var match = new RegExp(spec.block_pattern, 'i').exec(text);
+    return match ? 'block page (' + match[0] + ')' : null;
+}
+
+function blocked(reason) {
+    // No fuzzy links and only a short dump: there is nothing to find on a block page.
+    return {items: [], links: [], dump: document.documentElement.outerHTML.slice(0, 300), blocked: reason, metrics: pageMetrics()};
+}
+
+function extract() {
+    var items = [], nodes = itemNodes();
+    for (var i = 0; i < nodes.length && items.length < (spec.max_items || 20); i++) {
+        var node = nodes[i];
+        var text = node.innerText || '';
+        if ((spec.skip_text || []).some(function (t) { return text.indexOf(t) !== -1; })) continue;
+        if (spec.skip_class && String(node.className || '').indexOf(spec.skip_class) !== -1) continue;
+        var row = {}, complete = true;
+        for (var name in spec.fields) {
+            var field = spec.fields[name];
+            var value = pick(node, field.from);
+            if (value == null && !field.optional) { complete = false; break; }
+            row[name] = value;
+        }
+        if (complete) items.push(row);
+    }
+
+    if (!items.length) {
+        var reason = blockReason();
+        if (reason) return blocked(reason);
+    }
+
+    var result = {items: items, links: [], dump: null, blocked: null};
+    if (!items.length && spec.links) {
+        var anchors = document.querySelectorAll(spec.links.css || 'a');
+        for (var j = 0; j < anchors.length && result.links.length < (spec.links.max || 50); j++) {
+            var a = anchors[j], href = a.href || '';
+            if (spec.links.href_contains && href.indexOf(spec.links.href_contains) === -1) continue;
+            var context = a;
+            for (var k = 0; k < (spec.links.up || 0) && context.parentElement; k++) context = context.parentElement;
+            result.links.push({href: href, text: (a.innerText || '').trim(), context: context.innerText || ''});
+        }
+    }
+    if (!items.length) {
+        result.dump = document.documentElement.outerHTML.slice(0, 2000);
+    }
+    result.metrics = pageMetrics();
+    return result;
+}
+
+// Bytes and timings from the Performance API. Cross-origin resources without
+// Timing-Allow-Origin report 0 bytes, so transfer_bytes is a lower bound.
+function pageMetrics() {
+    var nav = performance.getEntriesByType('navigation')[0] || {};
+    var resources = performance.getEntriesByType('resource');
+    var bytes = nav.transferSize || 0;
+    for (var i = 0; i < resources.length; i++) bytes += resources[i].transferSize || 0;
+    return {
+        transfer_bytes: bytes,
+        requests: resources.length + 1,
+        dom_content_loaded_ms: Math.round(nav.domContentLoadedEventEnd || 0),
+        ready_ms: Math.round(performance.now())
+    };
+}
+
+var deadline = Date.now() + (spec.wait_ms || 0), nextBlockCheck = 0;
+(function poll() {
+    if (!spec.wait_for || document.querySelector(spec.wait_for) || Date.now() >= deadline) {
+        done(extract());
+        return;
+    }
+    // A CAPTCHA page never grows the selector we wait for; stop waiting as soon as one shows.
+    if (Date.now() >= nextBlockCheck) {
+        nextBlockCheck = Date.now() + 500;
+        var reason = blockReason();
+        if (reason) {
+            done(blocked(reason));
+            return;
+        }
+    }
+    setTimeout(poll, 100);
+})();
+"""
+
+
+def extract_page(driver, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts items from the current page in one call.
+
+    spec:
+      items      CSS selectors for result containers; the first that matches wins
+      fields     {name: {"from": [{"css": ..., "attr": "text"|"textContent"|<attribute>}], "optional": bool}}
+                 alternatives are tried in order; "css" omitted means the item itself
+      skip_text  item texts to skip; skip_class: class substring to skip
+      wait_for   selector to wait for (up to wait_ms) before extracting
+      block_pattern  regex (JS syntax, case-insensitive) for block/CAPTCHA pages; a match while no
+                 item is found ends the wait early and returns "blocked" with no links
+      links      fuzzy fallback when no item matches:
+                 {"css", "href_contains", "up": ancestor levels for context text, "max"}
+
+    Returns {"items": [{field: str}], "links": [{href, text, context}], "dump": first 2000 chars of HTML if nothing matched,
+             "blocked": reason or None, "metrics": {transfer_bytes, requests, dom_content_loaded_ms, ready_ms}}.
+    """
+    result = driver.execute_async_script(EXTRACT_JS, spec)
+    return result or {"items": [], "links": [], "dump": None, "blocked": None}
+
+
+def _text(el) -> str:
+    """Rough equivalent of innerText: visible text nodes, whitespace collapsed."""
+    parts = el.xpath(".//text()[not(ancestor::script) and not(ancestor::style)]")
+    return " ".join(" ".join(parts).split())
+
+
+def _read(el, attr: str, base_url: str):
+    if attr in ("text", "textContent"):
+        return _text(el)
+    value = el.get(attr)
+    if value is not None and attr in ("href", "src"):
+        value = urljoin(base_url, value)
+    return value
+
+
+def _pick(root, alternatives, base_url):
+    for alt in alternatives:
+        found = root.cssselect(alt["css"]) if alt.get("css") else [root]
+        if not found:
+            continue
+        value = _read(found[0], alt.get("attr", "text"), base_url)
+        if value is not None and value.strip():
+            return value.strip()
+    return None
+
+
+def extract_html(html: str, spec: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    """
+    Same extraction as `extract_page`, over fetched HTML instead of a live page
+    (no scripts run, so only server-rendered results are found). Needs lxml
+    and cssselect. Like the page script, `spec["block_pattern"]` is matched
+    against the title and visible text only when no items were found.
+    """
+    import lxml.html
+    doc = lxml.html.fromstring(html or "<html></html>")
+
+    nodes = []
+    for selector in spec.get("items", []):
+        nodes = doc.cssselect(selector)
+        if nodes:
+            break
+
+    items = []
+    for node in nodes:
+        if len(items) >= spec.get("max_items", 20):
+            break
+        text = _text(node)
+        if any(t in text for t in spec.get("skip_text", [])):
+            continue
+        if spec.get("skip_class") and spec["skip_class"] in (node.get("class") or ""):
+            continue
+        row = {}
+        for name, field in spec["fields"].items():
+            value = _pick(node, field["from"], base_url)
+            if value is None and not field.get("optional"):
+                break
+            row[name] = value
+        else:
+            items.append(row)
+
+    if not items and spec.get("block_pattern"):
+        body = doc.find("body")
+        text = (doc.findtext(".//title") or "") + " " + (_text(body)[:20000] if body is not None else "")
+        match = re.search(spec["block_pattern"], text, re.IGNORECASE)
+        if match:
+            return {"items": [], "links": [], "dump": (html or "")[:300], "blocked": f"block page ({match.group(0)})"}
+
+    result = {"items": items, "links": [], "dump": None, "blocked": None}
+    links = spec.get("links")
+    if not items and links:
+        for a in doc.cssselect(links.get("css") or "a"):
+            if len(result["links"]) >= links.get("max", 50):
+                break
+            href = urljoin(base_url, a.get("href") or "")
+            if links.get("href_contains") and links["href_contains"] not in href:
+                continue
+            context = a
+            for _ in range(links.get("up", 0)):
+                if context.getparent() is None:
+                    break
+                context = context.getparent()
+            result["links"].append({"href": href, "text": _text(a), "context": _text(context)})
+    if not items:
+        result["dump"] = (html or "")[:2000]
+    return result
@@ -0,0 +1,319 @@
+import os
+import re
+import glob
+import json
+import time
+import logging
+import threading
+from collections import deque
+from urllib.parse import quote_plus
+from typing import Dict, Any, List, Optional
+import requests
+from app.plugins.deals.dom_extract import extract_page, extract_html
+from app.plugins.deals.http_fetch import HttpFetcher, SourcePaths, detect_block, BLOCK_MARKERS, HTTP_PARSER_AVAILABLE
+from app.core.circuit_breaker import CircuitBreaker, get_breaker
+
+SOURCES_DIR = os.path.join(os.path.dirname(__file__), "sources")
+
+# URL patterns for the resource types a load profile can block. Chrome's
+# Network.setBlockedURLs matches URLs only, so types map to extensions.
+RESOURCE_PATTERNS = {
+    "image": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"],
+    "font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*"],
+    "stylesheet": ["*.css*"]
+}
+
+DOLLARS_CENTS = re.compile(r'\$(\d+\.\d{2})')
+
+
+def parse_price(price_str):
+    if not price_str: return None
+    # Remove $ and , and ' to '
+    clean = price_str.replace('$', '').replace(',', '').strip()
+    try:
+        # Handle range: "10 to 20"
+        if ' ' in clean:
+            clean = clean.split(' ')[0]
+        match = re.search(r"\d+(?:\.\d+)?", clean)
+        if not match:
+            return None
+        return float(match.group(0))
+    except:
+        return None
+
+
+class SourceAdapter:
+    """
+    One retailer, defined by a JSON file in `sources/`:
+
+      name, base_url, search      URL template; {q} is the quoted query
+      spec                        selector spec for dom_extract (items, fields, links, wait_for)
+      link_contains               structured rows must link to this host
+      default_name                name for rows without one
+      fallback                    rules for the fuzzy link fallback:
+                                    text: link_if_priced | context | link_or_context
+                                    price: dollars_cents | parse
+                                    min_price, name: before_price | link_text, name_max, default_name
+      load_profile                extra browser load-profile settings (block_urls, ready_selector, ...)
+      max_results, rate_limit.min_interval_s, cache_ttl_s, enabled
+    """
+    REQUIRED = ("name", "base_url", "search", "spec")
+
+    def __init__(self, data: Dict[str, Any], path: str = None):
+        missing = [k for k in self.REQUIRED if k not in data]
+        if missing:
+            raise ValueError(f"{path or data.get('name')}: missing {', '.join(missing)}")
+        if "fields" not in data["spec"] or "price" not in data["spec"]["fields"]:
+            raise ValueError(f"{path or data['name']}: spec.fields must include price")
+        self.data = data
+        self.path = path
+        self.name = data["name"]
+        self.base_url = data["base_url"]
+        self.search = data["search"]
+        self.spec = data["spec"]
+        self.enabled = data.get("enabled", True)
+        self.link_contains = data.get("link_contains")
+        self.default_name = data.get("default_name")
+        self.fallback = data.get("fallback", {})
+        self.load_profile = data.get("load_profile", {})
+        self.max_results = int(data.get("max_results", 5))
+        self.min_interval = float(data.get("rate_limit", {}).get("min_interval_s", 0))
+        self.cache_ttl = float(data.get("cache_ttl_s", 0))
+
+    def parse(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Turns extracted rows (or, failing that, fuzzy links) into candidates."""
+        results = []
+        # 1. Structured rows
+        for item in page["items"]:
+            if len(results) >= self.max_results:
+                break
+            price = parse_price(item.get("price"))
+            link = item.get("link")
+            name = item.get("name") or self.default_name
+            if not price or not link or not name:
+                continue
+            if self.link_contains and self.link_contains not in link:
+                continue
+            results.append({"source": self.name, "price": price, "link": link, "name": name})
+
+        # 2. Fuzzy fallback
+        if not results and page["links"]:
+            print(f"{self.name}: Structured scrape failed. Trying fuzzy fallback...")
+            rules = self.fallback
+            for lnk in page["links"]:
+                if len(results) >= self.max_results:
+                    break
+                mode = rules.get("text", "link_or_context")
+                if mode == "context":
+                    text = lnk["context"]
+                elif mode == "link_if_priced":
+                    text = lnk["text"] if "$" in lnk["text"] else lnk["context"]
+                else:
+                    text = lnk["text"] or lnk["context"]
+
+                if rules.get("price", "parse") == "dollars_cents":
+                    match = DOLLARS_CENTS.search(text)
+                    price = float(match.group(1)) if match else None
+                else:
+                    price = parse_price(text)
+                if not price or not lnk["href"] or price <= rules.get("min_price", 0):
+                    continue
+
+                if rules.get("name") == "link_text":
+                    name = lnk["text"]
+                else:
+                    name = text.split('$')[0].strip()
+                name = name[:rules.get("name_max", 80)] or rules.get("default_name") or self.default_name or f"{self.name} Listing"
+                results.append({"source": self.name, "price": price, "link": lnk["href"], "name": name})
+        return results
+
+
+def load_adapters(folder: str = SOURCES_DIR) -> List[SourceAdapter]:
+    adapters = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        try:
+            with open(path) as f:
+                adapter = SourceAdapter(json.load(f), path)
+        except Exception as e:
+            print(f"[Deals] Skipping adapter {os.path.basename(path)}: {e}")
+            continue
+        if adapter.enabled:
+            adapters.append(adapter)
+    return adapters
+
+
+class ScrapeEngine:
+    """
+    Runs any SourceAdapter: rate limiting, a short result cache, the HTTP
+    fast path with escalation to a pooled browser, load profiles, per-source
+    circuit breakers and per-page instrumentation all live here, so adapters
+    are pure data.
+
+    A source that serves a block/CAPTCHA page (or errors) `failure_threshold`
+    times in a row is skipped for `cooldown_s`; then one query probes it again.
+    Breakers are named "deals:<source>" and listed on /api/circuits.
+    """
+
+    def __init__(self, config: Dict[str, Any], adapters: List[SourceAdapter]):
+        self.config = config
+        self.adapters = adapters
+        self.http = HttpFetcher()
+        self.paths = SourcePaths(config.get("paths_file", "deals_paths.json"), float(config.get("http_retry_s", 21600)))
+        self.http_first = HTTP_PARSER_AVAILABLE and config.get("http_first", True)
+        self.page_stats: Dict[str, deque] = {} # source -> recent {"path", "bytes", "load_s"}
+        self._cache: Dict[tuple, tuple] = {} # (source, query) -> (expires_at, results)
+        self._last_request: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        for adapter in adapters:
+            self.breaker(adapter)
+
+    def breaker(self, adapter: SourceAdapter) -> CircuitBreaker:
+        cfg = self.config.get("circuit_breaker", {})
+        return get_breaker(f"deals:{adapter.name}", int(cfg.get("failure_threshold", 2)), float(cfg.get("cooldown_s", 900)))
+
+    def open_circuits(self) -> List[Dict[str, Any]]:
+        """Sources currently skipped: [{"source", "reason", "retry_in_s"}]."""
+        skipped = []
+        for adapter in self.adapters:
+            breaker = self.breaker(adapter)
+            if breaker.state == CircuitBreaker.OPEN and breaker.retry_in() > 0:
+                skipped.append({"source": adapter.name, "reason": breaker.last_error, "retry_in_s": breaker.retry_in()})
+        return skipped
+
+    def needs_browser(self) -> bool:
+        return not self.http_first or any(self.paths.preferred(a.name) == "browser" for a in self.adapters)
+
+    def search_url(self, adapter: SourceAdapter, product: str) -> str:
+        base = self.config.get("base_urls", {}).get(adapter.name, adapter.base_url)
+        return base.rstrip("/") + adapter.search.format(q=quote_plus(product))
+
+    def scrape(self, adapter: SourceAdapter, product: str, slot: Dict[str, Any], pool, timeout: float):
+        """
+        Returns candidates for one source. Tries a plain HTTP fetch first and
+        escalates to a pooled browser when the response looks blocked or
+        yields nothing; the path that worked is remembered per source.
+        `slot` is shared with the caller, which may cancel it.
+        """
+        key = (adapter.name, product.lower())
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.time():
+            print(f"[Deals] {adapter.name}: {len(cached[1])} items from cache")
+            return list(cached[1])
+
+        breaker = self.breaker(adapter)
+        if not breaker.allow():
+            print(f"[Deals] {adapter.name}: skipped, circuit open ({breaker.last_error}); next probe in {breaker.retry_in():.0f}s")
+            return []
+        try:
+            results, blocked = self._scrape_uncached(adapter, product, slot, pool, timeout)
+        except Exception as e:
+            # A cancelled scrape or no free browser says nothing about the site.
+            if slot["cancelled"] or isinstance(e, TimeoutError):
+                breaker.release_probe()
+            else:
+                breaker.record_failure(e)
+            raise
+        if blocked:
+            breaker.record_failure(blocked)
+            if breaker.state == CircuitBreaker.OPEN:
+                print(f"[Deals] {adapter.name}: blocked ({blocked}); skipping it for {breaker.retry_in():.0f}s.")
+        elif slot["cancelled"]:
+            breaker.release_probe()
+        else:
+            breaker.record_success()
+        if results and adapter.cache_ttl:
+            self._cache[key] = (time.time() + adapter.cache_ttl, results)
+        return results
+
+    def _scrape_uncached(self, adapter, product, slot, pool, timeout):
+        """Returns (results, block reason or None)."""
+        name = adapter.name
+        url = self.search_url(adapter, product)
+        if self.http_first and self.paths.preferred(name) == "http":
+            self._wait_turn(adapter, slot)
+            started = time.time()
+            try:
+                resp = self.http.fetch(url, timeout=min(timeout, float(self.config.get("http_timeout_s", 8))))
+                self._record_page(name, "http", len(resp.content), time.time() - started)
+                reason = detect_block(resp.status_code)
+                if not reason:
+                    page = extract_html(resp.text, dict(adapter.spec, block_pattern=BLOCK_MARKERS.pattern), resp.url)
+                    reason = page["blocked"]
+                    results = adapter.parse(page) if not reason else []
+                    if results:
+                        print(f"[Deals] {name}: {len(results)} items over HTTP in {time.time() - started:.1f}s")
+                        self.paths.record(name, "http")
+                        return results, None
+                    reason = reason or "no results in the HTML"
+            except requests.RequestException as e:
+                reason = str(e)
+            print(f"[Deals] {name}: HTTP path failed ({reason}); using the browser.")
+            self.paths.record(name, "browser", reason)
+
+        if slot["cancelled"]:
+            return [], None
+        profile = self.load_profile(adapter)
+        spec = dict(adapter.spec, block_pattern=BLOCK_MARKERS.pattern)
+        spec["wait_for"] = profile.get("ready_selector", spec.get("wait_for"))
+        spec["wait_ms"] = profile.get("ready_timeout_ms", spec.get("wait_ms", 5000))
+        with pool.lease("headless", owner=f"deals:{name}", timeout=timeout) as driver:
+            slot["driver"] = driver
+            if slot["cancelled"]:
+                return [], None
+            self.apply_load_profile(driver, profile)
+            driver.set_page_load_timeout(timeout)
+            self._wait_turn(adapter, slot)
+            started = time.time()
+            driver.get(url)
+            page = extract_page(driver, spec)
+            metrics = page.get("metrics") or {}
+            self._record_page(name, "browser", metrics.get("transfer_bytes"), time.time() - started, metrics.get("requests"))
+        if page.get("blocked"):
+            # Short dump only, and no fuzzy fallback: a block page has no listings.
+            src = (page.get("dump") or "").replace("\n", " ")
+            logging.warning(f"{name} blocked in the browser: {page['blocked']}. Page starts: {src}")
+            return [], page["blocked"]
+        results = adapter.parse(page)
+        if results:
+            self.paths.record(name, "browser")
+        else:
+            # DEBUG: Log page source to check for CAPTCHA/Block
+            src = (page.get("dump") or "").replace("\n", " ")
+            logging.warning(f"{name} found 0 items. Page Source Dump: {src}")
+        return results, None
+
+    def _wait_turn(self, adapter: SourceAdapter, slot: Dict[str, Any]):
+        """Spaces requests to one source at least `rate_limit.min_interval_s` apart."""
+        if not adapter.min_interval:
+            return
+        with self._lock:
+            now = time.time()
+            start_at = max(now, self._last_request.get(adapter.name, 0) + adapter.min_interval)
+            self._last_request[adapter.name] = start_at
+        while time.time() < start_at and not slot["cancelled"]:
+            time.sleep(min(0.1, start_at - time.time()))
+
+    def load_profile(self, adapter: SourceAdapter) -> Dict[str, Any]:
+        """config `load_profile`, then the adapter's, then config `load_profiles.<source>`; block_urls accumulate."""
+        profile = dict(self.config.get("load_profile", {"block_types": ["image", "font", "media"]}))
+        for override in (adapter.load_profile, self.config.get("load_profiles", {}).get(adapter.name, {})):
+            for key, value in override.items():
+                profile[key] = profile.get("block_urls", []) + value if key == "block_urls" else value
+        return profile
+
+    def apply_load_profile(self, driver, profile: Dict[str, Any]):
+        patterns = list(profile.get("block_urls", []))
+        for kind in profile.get("block_types", []):
+            patterns.extend(RESOURCE_PATTERNS.get(kind, []))
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+    def _record_page(self, source: str, path: str, size: Optional[int], load_s: float, requests_made: int = None):
+        stats = self.page_stats.setdefault(source, deque(maxlen=20))
+        stats.append({"path": path, "bytes": size, "load_s": round(load_s, 2)})
+        size_text = f"{size / 1024:.0f} KB" if size is not None else "? KB"
+        extra = f", {requests_made} requests" if requests_made else ""
+        line = f"[Deals] {source} page via {path}: {size_text} in {load_s:.2f}s{extra}"
+        print(line)
+        logging.info(line)
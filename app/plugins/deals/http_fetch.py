@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from typing import Dict, Any, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from app.core.browser_pool import USER_AGENTS
+
+try:
+    import lxml.html # noqa: F401
+    import cssselect # noqa: F401
+    HTTP_PARSER_AVAILABLE = True
+except ImportError: # without a parser every source goes through the browser
+    HTTP_PARSER_AVAILABLE = False
+
+BLOCK_STATUS = {401, 403, 429, 503}
+# Also run in the page by dom_extract (as a JS regex), so keep it to syntax both share.
+BLOCK_MARKERS = re.compile(
+    r"captcha|robot check|are you a robot|verify you are (a )?human|pardon our interruption|"
+    r"access denied|unusual traffic|request blocked|/errors/validatecaptcha|px-captcha",
+    re.IGNORECASE
+)
+
+
+def detect_block(status: int, text: str = "") -> Optional[str]:
+    """
+    Returns why a response looks like a block or CAPTCHA page, or None.
+    `text` is the page title plus visible text, not raw HTML: scripts and
+    attributes of normal pages mention "captcha" too. The marker check on the
+    HTTP path runs in `extract_html`, only when no result items were found.
+    """
+    if status in BLOCK_STATUS:
+        return f"HTTP {status}"
+    if status >= 400:
+        return f"HTTP {status}"
+    match = BLOCK_MARKERS.search(text[:20000] if text else "")
+    if match:
+        return f"block page ({match.group(0)})"
+    return None
+
+
+class HttpFetcher:
+    """Pooled, keep-alive HTTP client for fetching result pages without a browser."""
+
+    def __init__(self, pool_size: int = 10):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9"
+        })
+
+    def fetch(self, url: str, timeout: float):
+        return self.session.get(url, timeout=timeout, headers={"User-Agent": random.choice(USER_AGENTS)})
+
+
+class SourcePaths:
+    """
+    Remembers per source whether the HTTP fast path or the browser last
+    produced results, so later queries go straight to the one that works.
+    Sources pinned to the browser get the HTTP path retried after `retry_http_s`.
+    """
+
+    def __init__(self, path: str = "deals_paths.json", retry_http_s: float = 21600):
+        self.path = path
+        self.retry_http_s = retry_http_s
+        self._lock = threading.Lock()
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.sources = json.load(f)
+            except Exception as e:
+                print(f"[Deals] Ignoring unreadable {path}: {e}")
+
+    def preferred(self, source: str) -> str:
+        entry = self.sources.get(source)
+        if not entry or entry["path"] == "http":
+            return "http"
+        if time.time() - entry.get("since", 0) > self.retry_http_s:
+            return "http"
+        return "browser"
+
+    def record(self, source: str, path: str, reason: str = None):
+        with self._lock:
+            entry = self.sources.get(source, {})
+            if entry.get("path") != path:
+                entry = {"path": path, "since": time.time()}
+            entry["last_used"] = time.time()
+            entry["reason"] = reason
+            entry["hits"] = entry.get("hits", 0) + 1
+            self.sources[source] = entry
+            try:
+                with open(self.path, "w") as f:
+                    json.dump(self.sources, f, indent=2)
+            except OSError as e:
+                print(f"[Deals] Could not save {self.path}: {e}")
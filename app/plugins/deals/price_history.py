@@ -0,0 +1,166 @@
+import re
+import time
+import threading
+from typing import Dict, Any, List, Optional
+from sqlalchemy import create_engine, Column, Integer, String, Text, Index, func
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+Base = declarative_base()
+
+
+def normalize(text: str, limit: int = 120) -> str:
+    """Lowercase alphanumeric tokens, so "iPhone 16 Pro," and "iphone 16 pro" match."""
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").lower()))[:limit]
+
+
+class PriceListing(Base):
+    """One scraped listing. Prices are integer cents and times epoch seconds to keep rows small."""
+    __tablename__ = "price_listings"
+
+    id = Column(Integer, primary_key=True)
+    search_id = Column(Integer, index=True)
+    query = Column(String)
+    source = Column(String)
+    name_key = Column(String)
+    name = Column(String)
+    price_cents = Column(Integer)
+    link = Column(Text)
+    seen_at = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_listing_query_seen", "query", "seen_at"),
+        Index("ix_listing_name_seen", "name_key", "seen_at"),
+    )
+
+
+class PriceSearch(Base):
+    """One scrape of a query, with the listing the LLM picked (if any)."""
+    __tablename__ = "price_searches"
+
+    id = Column(Integer, primary_key=True)
+    query = Column(String)
+    scraped_at = Column(Integer)
+    candidates = Column(Integer)
+    winner_id = Column(Integer, nullable=True)
+    winner_cents = Column(Integer, nullable=True)
+
+    __table_args__ = (Index("ix_search_query_time", "query", "scraped_at"),)
+
+
+def _listing_dict(row: PriceListing) -> Dict[str, Any]:
+    return {"source": row.source, "price": row.price_cents / 100, "link": row.link, "name": row.name, "seen_at": row.seen_at}
+
+
+class PriceHistory:
+    """
+    Local store of every listing the deals scrapers find, so repeat lookups
+    can be answered from recent data and prices can be tracked over time.
+    """
+    _instance = None
+
+    def __init__(self, path: str = "price_history.db", retention_days: float = 180):
+        self.retention_s = retention_days * 86400
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self._lock = threading.Lock()
+        self._last_prune = 0
+
+    @classmethod
+    def get_instance(cls, config: Dict[str, Any] = None):
+        if not cls._instance:
+            cfg = (config or {}).get("history", {})
+            cls._instance = cls(cfg.get("path", "price_history.db"), float(cfg.get("retention_days", 180)))
+        return cls._instance
+
+    def record_search(self, query: str, candidates: List[Dict[str, Any]], winner: Dict[str, Any] = None) -> int:
+        now = int(time.time())
+        key = normalize(query)
+        with self._lock:
+            db = self.Session()
+            try:
+                search = PriceSearch(query=key, scraped_at=now, candidates=len(candidates))
+                db.add(search)
+                db.flush()
+                winner_row = None
+                for c in candidates:
+                    row = PriceListing(
+                        search_id=search.id, query=key, source=c["source"], name_key=normalize(c["name"]),
+                        name=c["name"][:200], price_cents=round(float(c["price"]) * 100), link=c["link"], seen_at=now
+                    )
+                    db.add(row)
+                    if winner and winner_row is None and c["link"] == winner.get("link"):
+                        winner_row = row
+                db.flush()
+                if winner_row:
+                    search.winner_id = winner_row.id
+                    search.winner_cents = winner_row.price_cents
+                db.commit()
+                self._prune(db, now)
+                return search.id
+            finally:
+                db.close()
+
+    def recent(self, query: str, max_age_s: float) -> Optional[Dict[str, Any]]:
+        """The latest scrape of `query` within `max_age_s`: {"scraped_at", "candidates", "winner"}."""
+        key = normalize(query)
+        db = self.Session()
+        try:
+            search = (db.query(PriceSearch)
+                      .filter(PriceSearch.query == key, PriceSearch.scraped_at >= int(time.time() - max_age_s))
+                      .order_by(PriceSearch.scraped_at.desc()).first())
+            if not search:
+                return None
+            rows = db.query(PriceListing).filter(PriceListing.search_id == search.id).all()
+            winner = next((r for r in rows if r.id == search.winner_id), None)
+            return {
+                "scraped_at": search.scraped_at,
+                "candidates": [_listing_dict(r) for r in rows],
+                "winner": _listing_dict(winner) if winner else None
+            }
+        finally:
+            db.close()
+
+    def trend(self, query: str, days: float = 30) -> List[Dict[str, Any]]:
+        """Lowest picked (winning) price per day for `query`, oldest first."""
+        key = normalize(query)
+        since = int(time.time() - days * 86400)
+        day = func.date(PriceSearch.scraped_at, "unixepoch", "localtime")
+        db = self.Session()
+        try:
+            rows = (db.query(day, func.min(PriceSearch.winner_cents))
+                    .filter(PriceSearch.query == key, PriceSearch.scraped_at >= since, PriceSearch.winner_cents.isnot(None))
+                    .group_by(day).order_by(day).all())
+            return [{"day": d, "price": cents / 100} for d, cents in rows]
+        finally:
+            db.close()
+
+    def source_lows(self, query: str, days: float = 30) -> List[Dict[str, Any]]:
+        """Per source: listing count and the lowest listing seen for `query` (accessories included)."""
+        key = normalize(query)
+        since = int(time.time() - days * 86400)
+        db = self.Session()
+        try:
+            lows = []
+            counts = (db.query(PriceListing.source, func.count(PriceListing.id), func.min(PriceListing.price_cents))
+                      .filter(PriceListing.query == key, PriceListing.seen_at >= since)
+                      .group_by(PriceListing.source).all())
+            for source, count, low in counts:
+                row = (db.query(PriceListing)
+                       .filter(PriceListing.query == key, PriceListing.source == source,
+                               PriceListing.seen_at >= since, PriceListing.price_cents == low)
+                       .order_by(PriceListing.seen_at.desc()).first())
+                lows.append({"source": source, "listings": count, "lowest": _listing_dict(row)})
+            return lows
+        finally:
+            db.close()
+
+    def _prune(self, db, now: int):
+        if not self.retention_s or now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        cutoff = int(now - self.retention_s)
+        db.query(PriceListing).filter(PriceListing.seen_at < cutoff).delete(synchronize_session=False)
+        db.query(PriceSearch).filter(PriceSearch.scraped_at < cutoff).delete(synchronize_session=False)
+        db.commit()
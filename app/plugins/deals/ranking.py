@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import math
+import statistics
+from typing import Dict, Any, List, Optional
+from app.plugins.deals.price_history import normalize
+
+try:
+    import numpy as np
+except ImportError: # prices are then normalized with plain Python
+    np = None
+
+# Words that mark a listing as something *for* the product rather than the product.
+ACCESSORY_WORDS = [
+    "case", "cases", "cover", "covers", "skin", "skins", "decal", "sticker", "protector", "protectors",
+    "tempered", "film", "charger", "charging", "cable", "cables", "adapter", "dock", "stand", "mount",
+    "holder", "strap", "band", "bands", "sleeve", "pouch", "wallet", "folio", "bumper", "stylus",
+    "replacement", "compatible", "lens cover"
+]
+ACCESSORY_RE = re.compile(r"\b(" + "|".join(re.escape(w) for w in ACCESSORY_WORDS) + r")\b")
+
+DEVICE, ACCESSORY, UNSURE, OTHER = "device", "accessory", "unsure", "other"
+
+
+class TokenModel:
+    """
+    Optional lightweight text model: per-token log-odds of "accessory" plus a
+    bias, read from a JSON file {"bias": float, "weights": {token: float}}.
+    Tokens that are part of the query are ignored.
+    """
+
+    def __init__(self, bias: float, weights: Dict[str, float]):
+        self.bias = bias
+        self.weights = weights
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> Optional["TokenModel"]:
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return cls(float(data.get("bias", 0)), {k: float(v) for k, v in data["weights"].items()})
+        except Exception as e:
+            print(f"[Deals] Ignoring accessory model {path}: {e}")
+            return None
+
+    def accessory_probability(self, name_tokens: List[str], query_tokens: set) -> float:
+        score = self.bias + sum(self.weights.get(t, 0.0) for t in set(name_tokens) - query_tokens)
+        return 1 / (1 + math.exp(-max(-30.0, min(30.0, score))))
+
+
+def dedupe(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drops listings seen twice across sources (a Slickdeals post linking the
+    same Amazon offer, a repeated row): same link, or same normalized name at
+    the same price. The first occurrence is kept.
+    """
+    seen = set()
+    unique = []
+    for c in candidates:
+        keys = {("link", c["link"]), ("name", normalize(c["name"]), round(float(c["price"]) * 100))}
+        if keys & seen:
+            continue
+        seen |= keys
+        unique.append(c)
+    return unique
+
+
+def price_ratios(prices: List[float], reference: List[float]) -> List[float]:
+    """Each price divided by the median of `reference` (all prices if empty)."""
+    if np is not None:
+        values = np.asarray(prices, dtype=float)
+        ref = np.asarray(reference, dtype=float) if reference else values
+        median = float(np.median(ref)) if ref.size else 0.0
+        return (values / median).tolist() if median > 0 else [1.0] * len(prices)
+    ref = reference or prices
+    median = statistics.median(ref) if ref else 0.0
+    return [p / median for p in prices] if median > 0 else [1.0] * len(prices)
+
+
+class LocalRanker:
+    """
+    Labels deal candidates as device / accessory / unsure without an LLM,
+    using accessory keywords, "for <product>" phrasing, query coverage, how
+    far a price sits below the set's median, and an optional TokenModel.
+
+    The result says whether the pick is clear-cut; only when an unsure
+    listing could undercut the cheapest clear device is the LLM worth asking.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.outlier_ratio = float(config.get("outlier_ratio", 0.35))
+        self.min_coverage = float(config.get("min_coverage", 0.6))
+        self.model = TokenModel.load(config.get("model_path"))
+        self.model_low = float(config.get("model_low", 0.3))
+        self.model_high = float(config.get("model_high", 0.7))
+
+    def rank(self, candidates: List[Dict[str, Any]], product: str) -> Dict[str, Any]:
+        """
+        Returns {"best": cheapest device or None, "ambiguous": bool,
+                 "shortlist": devices and unsure listings (what an LLM should see),
+                 "counts": {"input", "unique", "device", "unsure", "accessory", "other"}}.
+        "other" is a listing without the accessory the query asks for (a phone when searching "phone case").
+        Every candidate in the result carries "label" and "why".
+        """
+        unique = dedupe(candidates)
+        query_tokens = set(normalize(product).split())
+        query_text = normalize(product)
+        # Searching for an accessory ("iphone 16 case") makes "... for iPhone 16" listings the product.
+        wanted = {m.group(1) for m in ACCESSORY_RE.finditer(query_text)}
+        wants_accessory = bool(wanted)
+        rows = []
+        for c in unique:
+            key = normalize(c["name"])
+            words = {m.group(1) for m in ACCESSORY_RE.finditer(key)} - query_tokens
+            words = {w for w in words if w not in query_text}
+            tokens = key.split()
+            coverage = len(query_tokens & set(tokens)) / len(query_tokens) if query_tokens else 1.0
+            for_product = not wants_accessory and bool(query_text) and re.search(r"\b(for|fits|compatible with)\s+" + re.escape(query_text.split()[0]), key) is not None
+            missing = sorted(w for w in wanted if w not in key)
+            rows.append({"candidate": c, "tokens": tokens, "words": words, "coverage": coverage,
+                         "for_product": for_product, "missing": missing})
+
+        # Median of listings without accessory words, so a page full of cases cannot drag it down.
+        prices = [float(r["candidate"]["price"]) for r in rows]
+        reference = [p for p, r in zip(prices, rows) if not r["words"] and not r["for_product"]]
+        # A cheap listing is only suspicious when the query is for the device itself.
+        ratios = [1.0] * len(prices) if wants_accessory else price_ratios(prices, reference)
+
+        labelled = []
+        for row, ratio in zip(rows, ratios):
+            label, why = self._label(row, ratio, query_tokens)
+            labelled.append(dict(row["candidate"], label=label, why=why))
+
+        by_price = sorted(labelled, key=lambda c: float(c["price"]))
+        devices = [c for c in by_price if c["label"] == DEVICE]
+        unsure = [c for c in by_price if c["label"] == UNSURE]
+        best = devices[0] if devices else None
+        # Ambiguous when an unsure listing is cheaper than the best clear device (or there is none).
+        ambiguous = bool(unsure) and (best is None or float(unsure[0]["price"]) < float(best["price"]))
+        return {
+            "best": best,
+            "ambiguous": ambiguous,
+            "shortlist": [c for c in by_price if c["label"] in (DEVICE, UNSURE)],
+            "counts": {
+                "input": len(candidates), "unique": len(unique), "device": len(devices), "unsure": len(unsure),
+                "accessory": sum(1 for c in labelled if c["label"] == ACCESSORY),
+                "other": sum(1 for c in labelled if c["label"] == OTHER)
+            }
+        }
+
+    def _label(self, row: Dict[str, Any], ratio: float, query_tokens: set):
+        outlier = ratio < self.outlier_ratio
+        p = self.model.accessory_probability(row["tokens"], query_tokens) if self.model else None
+        if row["missing"]:
+            return OTHER, f"no '{row['missing'][0]}' in the name"
+        if row["for_product"]:
+            return ACCESSORY, "named as made for the product"
+        if row["words"] and outlier:
+            return ACCESSORY, f"'{sorted(row['words'])[0]}' at {ratio:.0%} of the median price"
+        if p is not None and p >= self.model_high:
+            return ACCESSORY, f"model p={p:.2f}"
+        if row["words"]:
+            return UNSURE, f"mentions '{sorted(row['words'])[0]}' but is priced like the product"
+        if outlier:
+            return UNSURE, f"{ratio:.0%} of the median price"
+        if row["coverage"] < self.min_coverage:
+            return UNSURE, f"matches {row['coverage']:.0%} of the query"
+        if p is not None and p > self.model_low:
+            return UNSURE, f"model p={p:.2f}"
+        return DEVICE, "no accessory signals"
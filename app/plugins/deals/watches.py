@@ -0,0 +1,115 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import Column, Integer, String, Text, Index
+from app.plugins.deals.price_history import Base, PriceHistory, normalize
+
+
+class PriceWatch(Base):
+    """One chat waiting for `query` to drop to `below_cents` or less."""
+    __tablename__ = "price_watches"
+
+    id = Column(Integer, primary_key=True)
+    query = Column(String, index=True) # normalized; watches sharing it share a scrape
+    product = Column(String) # as typed, used for scraping and messages
+    chat = Column(String) # Notifier.address of the origin
+    origin = Column(Text) # JSON origin the alert is sent to
+    below_cents = Column(Integer)
+    notified_cents = Column(Integer, nullable=True) # price of the last alert; cleared once it rises above the target
+    created_at = Column(Integer)
+
+    __table_args__ = (Index("ix_watch_chat_query", "chat", "query", unique=True),)
+
+
+def _watch_dict(row: PriceWatch) -> Dict[str, Any]:
+    return {
+        "id": row.id, "query": row.query, "product": row.product, "chat": row.chat,
+        "origin": json.loads(row.origin), "below": row.below_cents / 100,
+        "notified": row.notified_cents / 100 if row.notified_cents is not None else None
+    }
+
+
+class WatchList:
+    """Price-watch subscriptions, kept next to the price history so they survive restarts."""
+
+    def __init__(self, history: PriceHistory):
+        self.Session = history.Session
+        Base.metadata.create_all(bind=history.engine, tables=[PriceWatch.__table__])
+
+    def add(self, product: str, below: float, chat: str, origin: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Adds or updates this chat's watch on `product`. Returns the watch and whether it is new."""
+        key = normalize(product)
+        db = self.Session()
+        try:
+            row = db.query(PriceWatch).filter(PriceWatch.chat == chat, PriceWatch.query == key).first()
+            created = row is None
+            if created:
+                row = PriceWatch(query=key, chat=chat, created_at=int(time.time()))
+                db.add(row)
+            row.product = product
+            row.origin = json.dumps(origin)
+            row.below_cents = round(below * 100)
+            row.notified_cents = None
+            db.commit()
+            return _watch_dict(row), created
+        finally:
+            db.close()
+
+    def remove(self, chat: str, ref: str) -> Optional[Dict[str, Any]]:
+        """
+        Removes this chat's watch by id ("#3") or product name. A bare number is
+        tried as an id first and then as a product ("5090" for an RTX 5090 watch).
+        """
+        db = self.Session()
+        try:
+            q = db.query(PriceWatch).filter(PriceWatch.chat == chat)
+            row = None
+            number = ref[1:] if ref.startswith("#") else ref
+            if number.isdigit():
+                row = q.filter(PriceWatch.id == int(number)).first()
+            if not row and not ref.startswith("#"):
+                row = q.filter(PriceWatch.query == normalize(ref)).first()
+            if not row:
+                return None
+            watch = _watch_dict(row)
+            db.delete(row)
+            db.commit()
+            return watch
+        finally:
+            db.close()
+
+    def count(self, chat: str = None) -> int:
+        db = self.Session()
+        try:
+            q = db.query(PriceWatch)
+            return (q.filter(PriceWatch.chat == chat) if chat else q).count()
+        finally:
+            db.close()
+
+    def for_chat(self, chat: str) -> List[Dict[str, Any]]:
+        db = self.Session()
+        try:
+            return [_watch_dict(r) for r in db.query(PriceWatch).filter(PriceWatch.chat == chat).order_by(PriceWatch.id)]
+        finally:
+            db.close()
+
+    def by_product(self) -> "OrderedDict[str, List[Dict[str, Any]]]":
+        """All watches grouped by normalized product, oldest product first."""
+        db = self.Session()
+        try:
+            groups = OrderedDict()
+            for row in db.query(PriceWatch).order_by(PriceWatch.id):
+                groups.setdefault(row.query, []).append(_watch_dict(row))
+            return groups
+        finally:
+            db.close()
+
+    def mark_notified(self, watch_id: int, price: Optional[float]):
+        db = self.Session()
+        try:
+            db.query(PriceWatch).filter(PriceWatch.id == watch_id).update(
+                {"notified_cents": round(price * 100) if price is not None else None}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
@@ -5,6 +5,8 @@ import subprocess
 import datetime
 from app.core.config_manager import ConfigManager
 from app.core.llm_manager import LLMManager
+from app.core.prompt_builder import count_tokens, summarize_markdown, merge_markdown_sections, CHARS_PER_TOKEN
+from app.plugins.gcli.stream_parser import FileMapStreamParser
 
 class SDLCManager:
     def __init__(self, config):
@@ -28,6 +30,12 @@ class SDLCManager:
         self.pending_prompt = None
         self.context_secrets = {}
 
+    def terminate(self):
+        """Called when a run is aborted or the plugin shuts down."""
+        if self.current_phase not in ("IDLE", "DONE", "WAITING_APPROVAL", "WAITING_FOR_CREDENTIALS"):
+            self.current_phase = "ABORTED"
+            self.last_msg = "Aborted by user."
+
     def _get_active_project_path(self):
         # We need to track which project is 'active' for resume. 
         # Simple file-based tracker.
@@ -46,7 +54,7 @@ class SDLCManager:
         """Asks the configured LLM if the project needs credentials."""
         try:
             q = f"Does the following request require external API keys, secrets, or database credentials? Request: '{prompt}'. Return ONLY a JSON list of the key names needed, e.g. ['OPENAI_API_KEY', 'DB_URL']. If none, return []."
-            resp = self.llm.generate_content(q)
+            resp = self.llm.generate_content(q, cache="gcli.analyze_needs")
             text = resp.text.strip().replace("```json", "").replace("```", "")
             return json.loads(text)
         except:
@@ -98,7 +106,7 @@ class SDLCManager:
         
         # 1. Identify Project Name using the configured LLM
         try:
-            name_resp = self.llm.generate_content(f"Suggest a short, safe, filesystem-friendly folder name for: {prompt}. Return only the name.")
+            name_resp = self.llm.generate_content(f"Suggest a short, safe, filesystem-friendly folder name for: {prompt}. Return only the name.", cache="gcli.project_name")
             project_name = name_resp.text.strip().replace(" ", "_")
         except:
             project_name = f"Project_{int(time.time())}"
@@ -155,7 +163,27 @@ class SDLCManager:
             with open(req_path, 'r') as f:
                 current_reqs = f.read()
                 
-        prompt = f"""
+        budget = ConfigManager.get_llm_config().get("prompt_budgets", {}).get("gcli.refine", 3000)
+        summary = summarize_markdown(current_reqs, feedback, budget, self.llm.provider)
+        sectioned = len(summary["sections"]) > 1 and any(s["heading"] for s in summary["sections"])
+
+        if sectioned:
+            # Send the outline plus the sections relevant to the feedback, and ask only for
+            # the sections that change; they are merged back into the file below.
+            prompt = f"""
+        Existing Requirements (sections not relevant to the feedback are summarized):
+        {summary["text"]}
+        
+        User Feedback:
+        {feedback}
+        
+        Task: Update the REQUIREMENTS.md and Implementation Plan based on the feedback.
+        Return ONLY the sections you changed or added, each starting with its exact markdown heading line.
+        Return each changed section in full. Do not return unchanged sections.
+        If a changed section's heading appears more than once in the document, put its parent heading lines (headings only) before it.
+        """
+        else:
+            prompt = f"""
         Existing Requirements:
         {current_reqs}
         
@@ -165,16 +193,25 @@ class SDLCManager:
         Task: Update the REQUIREMENTS.md and Implementation Plan based on the feedback.
         Return the FULL updated markdown content.
         """
+        print(f"[GCLI] Refine prompt: ~{count_tokens(prompt, self.llm.provider)} tokens (document ~{count_tokens(current_reqs, self.llm.provider)})")
         
         try:
             response = self.llm.generate_content(prompt)
+            if sectioned and "#" not in response.text:
+                return json.dumps({"message": "Refinement failed: the model returned no updated sections."})
+            skipped = []
+            updated = merge_markdown_sections(current_reqs, response.text, skipped) if sectioned else response.text
+            if skipped:
+                print(f"[GCLI] Not merged, heading matches several sections: {', '.join(skipped)}")
             # Overwrite file
             with open(req_path, "w") as f:
-                f.write(response.text)
+                f.write(updated)
                 
             self.current_phase = "WAITING_APPROVAL"
             return json.dumps({
-                "message": f"Requirements Updated.\nBased on: '{feedback}'\n\nType '/gcli approve' to build or '/gcli refine <comments>' again.",
+                "message": f"Requirements Updated.\nBased on: '{feedback}'\n"
+                           + (f"Not applied (ambiguous heading): {', '.join(skipped)}\n" if skipped else "")
+                           + "\nType '/gcli approve' to build or '/gcli refine <comments>' again.",
                 "files": [req_path]
             })
         except Exception as e:
@@ -214,15 +251,13 @@ class SDLCManager:
         """
         
         try:
-            resp = self.llm.generate_content(code_prompt)
-            file_map = self._extract_file_map(resp.text)
-            if not file_map:
+            written, truncated = self._stream_files(code_prompt, project_path, stop_callback)
+            if not written:
                 return json.dumps({"message": "Coding failed: Model did not return valid JSON file map."})
-
-            self.last_msg = "Writing files..."
-            self._write_files(project_path, file_map)
-            self._ensure_env_files(project_path, file_map)
+            self._ensure_env_files(project_path, dict.fromkeys(written))
             
+        except InterruptedError:
+            raise
         except Exception as e:
             return json.dumps({"message": f"Coding failed: {e}"})
 
@@ -235,10 +270,48 @@ class SDLCManager:
         docker_res = json.loads(docker_json)
         
         final_msg = build_res["message"] + "\n\n" + docker_res["message"]
+        if truncated:
+            final_msg = f"⚠️ Model output was cut off: wrote {len(written)} complete files, dropped partial '{truncated}'.\n\n" + final_msg
         
         self.current_phase = "DONE"
         return json.dumps({"message": final_msg})
 
+    def _stream_files(self, code_prompt, project_path, stop_callback):
+        """
+        Streams the code generation response and writes each file as soon as its
+        JSON entry is complete. stop_callback runs on every chunk, so /stop aborts
+        mid-generation. Returns (written paths, path of a file cut off by truncation).
+        """
+        parser = FileMapStreamParser()
+        raw = [] # kept only until the first file parses, for the non-streaming fallback
+        written = []
+        chars = 0
+        with self.llm.stream_content(code_prompt) as stream:
+            for chunk in stream:
+                chars += len(chunk)
+                if raw is not None:
+                    raw.append(chunk)
+                for rel_path, content in parser.feed(chunk):
+                    self._write_files(project_path, {rel_path: content})
+                    written.append(rel_path)
+                    raw = None
+                stop_callback()
+                elapsed = time.time() - stream.started_at
+                self.last_msg = f"Generating code... {len(written)} files written, ~{int(chars / CHARS_PER_TOKEN.get(self.llm.provider, 4.0))} tokens, {stream.bytes_received / 1024:.1f} KB received ({elapsed:.0f}s)"
+        parser.close()
+
+        if not written and raw:
+            # Nothing parsed incrementally (e.g. unusual wrapping); try the whole response.
+            if parser.failed:
+                print(f"[GCLI] Streaming parse failed ({parser.error}); retrying on the full response.")
+            file_map = self._extract_file_map("".join(raw)) or {}
+            self._write_files(project_path, file_map)
+            return list(file_map.keys()), None
+
+        if parser.failed:
+            print(f"[GCLI] File map stopped parsing after {len(written)} files: {parser.error}")
+        return written, parser.truncated
+
     def _run_build_loop(self, project_path, stop_callback):
         self.current_phase = "BUILDING"
         
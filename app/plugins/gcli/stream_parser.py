@@ -0,0 +1,214 @@
+import re
+import json
+from typing import List, Tuple, Any
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class FileMapStreamParser:
+    """
+    Incremental parser for the code generation response: a JSON object that
+    maps file paths to file contents, possibly wrapped in a code fence or
+    preceded by chatter.
+
+    `feed()` returns each (path, content) pair as soon as its value is
+    complete, so files can be written while the model is still generating.
+    Only the file currently being received is held in memory. If the stream
+    ends early, everything completed so far has already been emitted and
+    `truncated` names the file that was cut off.
+    """
+
+    def __init__(self):
+        self.state = "preamble"
+        self.finished = False
+        self.failed = False
+        self.error = None
+        self.truncated = None
+        self.paths: List[str] = []
+        self._buf = ""
+        self._pos = 0
+        self._key = None
+        self._parts: List[str] = []
+        self._raw_depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if self.finished or self.failed:
+            return []
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        emitted = []
+        try:
+            while self._pos < len(self._buf) and not self.finished:
+                if not self._step(emitted):
+                    break # need more input
+        except ValueError as e:
+            self.failed = True
+            self.error = str(e)
+        return emitted
+
+    def close(self):
+        """Marks the end of the stream; records a partially received file, if any."""
+        if not self.finished and self.state in ("string", "raw", "colon", "value") and self._key is not None:
+            self.truncated = self._key
+        self._parts = []
+
+    def _skip_ws(self):
+        while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+            self._pos += 1
+        return self._pos < len(self._buf)
+
+    def _step(self, emitted) -> bool:
+        buf = self._buf
+        if self.state == "preamble":
+            start = buf.find("{", self._pos)
+            if start == -1:
+                self._pos = len(buf)
+                return False
+            self._pos = start + 1
+            self.state = "key"
+            return True
+
+        if self.state in ("string", "key_string"):
+            return self._finish_string(emitted)
+        if self.state == "raw":
+            if not self._read_raw():
+                return False
+            self._emit(json.loads("".join(self._parts)), emitted)
+            return True
+
+        if not self._skip_ws():
+            return False
+        c = buf[self._pos]
+
+        if self.state == "key":
+            if c == "}":
+                self._pos += 1
+                self.finished = True
+                return True
+            if c != '"':
+                raise ValueError(f"Expected a file path at offset {self._pos}, got {c!r}")
+            self._pos += 1
+            self._parts = []
+            self.state = "key_string"
+            return True
+
+        if self.state == "colon":
+            if c != ":":
+                raise ValueError(f"Expected ':' after {self._key!r}")
+            self._pos += 1
+            self.state = "value"
+            return True
+
+        if self.state == "value":
+            self._parts = []
+            if c == '"':
+                self._pos += 1
+                self.state = "string"
+            else:
+                self._raw_depth = 0
+                self._raw_in_string = False
+                self._raw_escape = False
+                self.state = "raw"
+            return True
+
+        if self.state == "after_value":
+            self._pos += 1
+            if c == ",":
+                self.state = "key"
+            elif c == "}":
+                self.finished = True
+            else:
+                raise ValueError(f"Expected ',' or '}}' after {self.paths[-1]!r}, got {c!r}")
+            return True
+
+        return False
+
+    def _finish_string(self, emitted) -> bool:
+        if not self._read_string():
+            return False
+        if self.state == "key_string":
+            self._key = "".join(self._parts)
+            self._parts = []
+            self.state = "colon"
+        else:
+            self._emit("".join(self._parts), emitted)
+        return True
+
+    def _emit(self, value, emitted):
+        emitted.append((self._key, value))
+        self.paths.append(self._key)
+        self._key = None
+        self._parts = []
+        self.state = "after_value"
+
+    def _read_string(self) -> bool:
+        """Consumes string content up to the closing quote. False if more input is needed."""
+        buf = self._buf
+        while True:
+            m = _STRING_SPECIAL.search(buf, self._pos)
+            if not m:
+                self._parts.append(buf[self._pos:])
+                self._pos = len(buf)
+                return False
+            self._parts.append(buf[self._pos:m.start()])
+            self._pos = m.start()
+            if buf[self._pos] == '"':
+                self._pos += 1
+                return True
+            # Backslash escape; wait for the whole sequence to arrive.
+            if self._pos + 1 >= len(buf):
+                return False
+            esc = buf[self._pos + 1]
+            if esc == "u":
+                if self._pos + 6 > len(buf):
+                    return False
+                code = int(buf[self._pos + 2:self._pos + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # High surrogate: combine with the following \\uXXXX.
+                    if self._pos + 12 > len(buf):
+                        return False
+                    if buf[self._pos + 6:self._pos + 8] == "\\u":
+                        low = int(buf[self._pos + 8:self._pos + 12], 16)
+                        self._parts.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        self._pos += 12
+                        continue
+                self._parts.append(chr(code))
+                self._pos += 6
+            elif esc in _ESCAPES:
+                self._parts.append(_ESCAPES[esc])
+                self._pos += 2
+            else:
+                raise ValueError(f"Invalid escape '\\{esc}' in {self._key!r}")
+
+    def _read_raw(self) -> bool:
+        """Collects a non-string value (object, array, number) verbatim."""
+        buf = self._buf
+        start = self._pos
+        while self._pos < len(buf):
+            c = buf[self._pos]
+            if self._raw_in_string:
+                if self._raw_escape:
+                    self._raw_escape = False
+                elif c == "\\":
+                    self._raw_escape = True
+                elif c == '"':
+                    self._raw_in_string = False
+            elif c == '"':
+                self._raw_in_string = True
+            elif c in "{[":
+                self._raw_depth += 1
+            elif c in "}]" and self._raw_depth > 0:
+                self._raw_depth -= 1
+                if self._raw_depth == 0:
+                    self._pos += 1
+                    self._parts.append(buf[start:self._pos])
+                    return True
+            elif self._raw_depth == 0 and c in ",}":
+                self._parts.append(buf[start:self._pos])
+                return True
+            self._pos += 1
+        self._parts.append(buf[start:self._pos])
+        return False
@@ -1,19 +1,20 @@
 import subprocess
 import time
 import shlex
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
 from app.core.plugin_base import PluginBase
+from app.core.browser_pool import BrowserPool
 
 class SystemPlugin(PluginBase):
     def on_load(self):
         self.running = False
+        self._driver = None
 
     def shutdown(self):
-        pass
+        if self._driver:
+            BrowserPool.get_instance().release(self._driver)
+            self._driver = None
 
     def is_busy(self) -> bool:
         return self.running
@@ -73,19 +74,18 @@ class SystemPlugin(PluginBase):
         return res.stdout if res.returncode == 0 else f"Error: {res.stderr}"
 
     def _get_driver(self):
-        options = webdriver.ChromeOptions()
-        # Add arguments to make it look less like an automated bot
-        options.add_argument("user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-        
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        # Additional stealth
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        return driver
+        """
+        The visible browser window, kept across commands so the user can keep
+        browsing (or solve a captcha) where the last command left off.
+        """
+        pool = BrowserPool.get_instance()
+        if self._driver and not pool.is_alive(self._driver):
+            # The user closed the window.
+            pool.release(self._driver, broken=True)
+            self._driver = None
+        if not self._driver:
+            self._driver = pool.acquire("visible", owner="system")
+        return self._driver
 
     def _search_product(self, product):
         try:
@@ -1,20 +1,79 @@
 const { default: makeWASocket, useMultiFileAuthState, DisconnectReason } = require('@whiskeysockets/baileys');
 const qrcode = require('qrcode-terminal');
-const axios = require('axios');
+const readline = require('readline');
 const fs = require('fs');
 require('dotenv').config();
 
-const SYNAPSE_API = process.env.SYNAPSE_API || "http://127.0.0.1:8000/api/command";
-// We might need a port to receive commands from Python, or just poll. 
-// For V1, we will just act as a client (Input -> API). 
-// Responses will be handled by Synapse calling a webhook? Or us polling?
-// Wait, run_bot.py polls. We should probably poll too or set up a simple Express server if we want push.
-// Let's stick to the run_bot.py pattern: Poll for the task result after sending.
+// Synapse launches this bridge as a child process and talks to it over a
+// JSON-lines channel: Synapse -> bridge on stdin, bridge -> Synapse on stdout
+// (prefixed so QR codes and logs on stdout pass through untouched).
+// Commands go straight to the orchestrator and results are pushed back on
+// completion, so there is no HTTP round trip and no polling.
+const IPC_PREFIX = '@@synapse ';
+let sock = null;
+let connectionState = 'connecting';
+let nextRequestId = 1;
+const pendingRequests = new Map(); // request id -> jid
+const activeTasks = new Map(); // task id -> { jid, status }
+
+function sendToSynapse(msg) {
+    process.stdout.write(IPC_PREFIX + JSON.stringify(msg) + '\n');
+}
+
+const channel = readline.createInterface({ input: process.stdin });
+channel.on('line', (line) => {
+    let msg;
+    try {
+        msg = JSON.parse(line);
+    } catch {
+        console.error('Malformed message from Synapse:', line);
+        return;
+    }
+    handleSynapseMessage(msg).catch((e) => console.error('Error handling Synapse message:', e.message));
+});
+// Synapse went away; nothing left to bridge to.
+channel.on('close', () => process.exit(0));
+
+async function handleSynapseMessage(msg) {
+    if (msg.type === 'ping') {
+        // Health probe from the Synapse supervisor.
+        sendToSynapse({ type: 'pong', id: msg.id, connection: connectionState });
+    } else if (msg.type === 'queued') {
+        const jid = pendingRequests.get(msg.id);
+        pendingRequests.delete(msg.id);
+        if (!jid || !sock) return;
+        const status = await createStatusMessage(sock, jid, `Command Queued (Task ${msg.task_id})...`);
+        activeTasks.set(String(msg.task_id), { jid, status });
+    } else if (msg.type === 'progress') {
+        const task = activeTasks.get(String(msg.task_id));
+        if (task) await task.status.update(formatProgress(msg.task_id, msg));
+    } else if (msg.type === 'notify') {
+        // Unprompted message for a chat (e.g. a price alert), not tied to a task.
+        if (msg.jid && sock) queueText(sock, msg.jid, msg.text);
+    } else if (msg.type === 'result') {
+        const task = activeTasks.get(String(msg.task_id));
+        if (!task) {
+            // Task started before a bridge restart; we lost its status message but
+            // Synapse still knows the chat, so deliver the result as a fresh message.
+            if (msg.jid && sock) {
+                const text = msg.status === 'DONE' ? parseResult(msg.result).message : `Task Failed: ${msg.error}`;
+                queueText(sock, msg.jid, text || 'Done.');
+            }
+            return;
+        }
+        activeTasks.delete(String(msg.task_id));
+        if (msg.status === 'DONE') {
+            await deliverResult(sock, task.jid, task.status, msg.result);
+        } else {
+            await task.status.finish(`Task Failed: ${msg.error}`);
+        }
+    }
+}
 
 async function connectToWhatsApp() {
     const { state, saveCreds } = await useMultiFileAuthState('auth_info_baileys');
 
-    const sock = makeWASocket({
+    sock = makeWASocket({
         printQRInTerminal: false,
         auth: state,
         browser: ["Mac OS", "Chrome", "10.15.7"],
@@ -30,6 +89,11 @@ async function connectToWhatsApp() {
             qrcode.generate(qr, { small: true });
         }
 
+        if (connection) {
+            connectionState = connection;
+            sendToSynapse({ type: 'connection', state: connection });
+        }
+
         if (connection === 'close') {
             const shouldReconnect = (lastDisconnect.error)?.output?.statusCode !== DisconnectReason.loggedOut;
             console.log('connection closed due to ', lastDisconnect.error, ', reconnecting ', shouldReconnect);
@@ -57,97 +121,169 @@ async function connectToWhatsApp() {
 
             console.log(`Received message from ${remoteJid}: ${text}`);
 
-            try {
-                // Forward to Synapse
-                const response = await axios.post(SYNAPSE_API, { text: text });
+            // Forward to Synapse; the task id comes back as a 'queued' message.
+            const id = nextRequestId++;
+            pendingRequests.set(id, remoteJid);
+            sendToSynapse({ type: 'command', id, jid: remoteJid, text });
+        }
+    });
+}
+
+// Outbound queue per chat: texts sent in quick succession are coalesced into one
+// message and each chat is held to a minimum gap between sends, so multi-part
+// results never trip WhatsApp's rate limits.
+const MIN_SEND_INTERVAL_MS = 1500;
+const MIN_EDIT_INTERVAL_MS = 3000;
+const MAX_MESSAGE_LEN = 4000;
+const outboxes = new Map(); // jid -> { pending: [], lastSend: 0, draining: false }
 
-                if (response.status === 200) {
-                    const taskId = response.data.task_id;
-                    await sock.sendMessage(remoteJid, { text: `Command Queued (Task ${taskId})...` });
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
-                    // Poll for result (simulating run_bot.py logic)
-                    pollTaskResult(sock, remoteJid, taskId);
+function queueText(sock, jid, text) {
+    let box = outboxes.get(jid);
+    if (!box) {
+        box = { pending: [], lastSend: 0, draining: false };
+        outboxes.set(jid, box);
+    }
+    box.pending.push(text);
+    if (!box.draining) {
+        box.draining = true;
+        drainOutbox(sock, jid, box);
+    }
+}
+
+async function drainOutbox(sock, jid, box) {
+    try {
+        while (box.pending.length > 0) {
+            const wait = MIN_SEND_INTERVAL_MS - (Date.now() - box.lastSend);
+            if (wait > 0) await sleep(wait);
+            const texts = box.pending.splice(0);
+            let current = "";
+            const chunks = [];
+            for (const t of texts) {
+                // A text longer than one message is split first, like ChatOutbox._coalesce.
+                for (let i = 0; i < t.length; i += MAX_MESSAGE_LEN) {
+                    const part = t.slice(i, i + MAX_MESSAGE_LEN);
+                    const candidate = current ? `${current}\n\n${part}` : part;
+                    if (candidate.length <= MAX_MESSAGE_LEN) {
+                        current = candidate;
+                    } else {
+                        if (current) chunks.push(current);
+                        current = part;
+                    }
+                }
+            }
+            if (current) chunks.push(current);
+            for (const chunk of chunks) {
+                try {
+                    await sock.sendMessage(jid, { text: chunk });
+                } catch (e) {
+                    console.log("Send error:", e.message);
                 }
-            } catch (error) {
-                console.error('Error sending to Synapse API:', error.message);
-                await sock.sendMessage(remoteJid, { text: `Error connecting to Synapse: ${error.message}` });
+                box.lastSend = Date.now();
             }
         }
-    });
+    } finally {
+        box.draining = false;
+    }
 }
 
-async function pollTaskResult(sock, jid, taskId) {
-    let attempts = 0;
-    const maxAttempts = 60; // 120 seconds
+// One status message per task, edited in place. Updates arriving faster than
+// MIN_EDIT_INTERVAL_MS collapse into the most recent one.
+async function createStatusMessage(sock, jid, text) {
+    const sent = await sock.sendMessage(jid, { text });
+    const box = outboxes.get(jid) || { pending: [], lastSend: 0, draining: false };
+    box.lastSend = Date.now();
+    outboxes.set(jid, box);
 
-    const interval = setInterval(async () => {
-        attempts++;
-        if (attempts > maxAttempts) {
-            clearInterval(interval);
-            await sock.sendMessage(jid, { text: "Task timed out." });
-            return;
-        }
+    const status = { key: sent?.key, text, pending: null, lastEdit: Date.now(), timer: null };
 
+    const apply = async () => {
+        status.timer = null;
+        const next = status.pending;
+        status.pending = null;
+        if (next === null || next === status.text || !status.key) return;
+        status.lastEdit = Date.now();
         try {
-            // Need the full URL for task status. Assuming standard Synapse endpoints.
-            // The taskId is unique.
-            const statusUrl = `http://127.0.0.1:8000/api/task/${taskId}`;
-            const res = await axios.get(statusUrl);
-
-            if (res.status === 200) {
-                const data = res.data;
-                if (data.status === "DONE") {
-                    clearInterval(interval);
-
-                    // Send result
-                    let message = "";
-                    let files = [];
-
-                    try {
-                        // Synapse might return JSON string in 'result'
-                        if (typeof data.result === 'string') {
-                            try {
-                                const parsed = JSON.parse(data.result);
-                                message = parsed.message || data.result;
-                                files = parsed.files || [];
-                            } catch {
-                                message = data.result;
-                            }
-                        } else {
-                            message = data.result?.message || JSON.stringify(data.result);
-                            files = data.result?.files || [];
-                        }
-                    } catch (e) {
-                        message = String(data.result);
-                    }
+            await sock.sendMessage(jid, { text: next, edit: status.key });
+            status.text = next;
+        } catch (e) {
+            console.log("Edit error:", e.message);
+        }
+    };
 
-                    if (message) {
-                        await sock.sendMessage(jid, { text: message });
-                    }
+    status.update = async (next) => {
+        if (next === status.text || next === status.pending) return;
+        status.pending = next;
+        const wait = MIN_EDIT_INTERVAL_MS - (Date.now() - status.lastEdit);
+        if (wait <= 0) {
+            await apply();
+        } else if (!status.timer) {
+            status.timer = setTimeout(apply, wait);
+        }
+    };
 
-                    // Handle files (Experimental)
-                    if (files && files.length > 0) {
-                        for (const file of files) {
-                            if (fs.existsSync(file)) {
-                                await sock.sendMessage(jid, { text: `Uploading ${file}...` });
-                                // Baileys doesn't support streaming local files directly in all versions easily without mimetype
-                                // We will just send text notification for now to avoid complexity, or try document.
-                                // For now: just text.
-                                await sock.sendMessage(jid, { text: `[File Generated: ${file}]` });
-                            }
-                        }
-                    }
+    status.finish = async (next) => {
+        if (status.timer) {
+            clearTimeout(status.timer);
+            status.timer = null;
+        }
+        status.pending = next;
+        const wait = MIN_EDIT_INTERVAL_MS - (Date.now() - status.lastEdit);
+        if (wait > 0) await sleep(wait);
+        await apply();
+    };
 
-                } else if (data.status === "FAILED") {
-                    clearInterval(interval);
-                    await sock.sendMessage(jid, { text: `Task Failed: ${data.error}` });
-                }
+    return status;
+}
+
+function formatProgress(taskId, data) {
+    const progress = data.progress || {};
+    let line = `Task ${taskId} running (${data.plugin_id || '?'})`;
+    if (progress.phase && progress.phase !== "N/A") line += ` [${progress.phase}]`;
+    if (progress.message) line += `\n${progress.message}`;
+    return line;
+}
+
+function parseResult(result) {
+    // Synapse might return JSON string in 'result'
+    let message = "";
+    let files = [];
+    try {
+        if (typeof result === 'string') {
+            try {
+                const parsed = JSON.parse(result);
+                message = parsed.message || result;
+                files = parsed.files || [];
+            } catch {
+                message = result;
             }
-        } catch (e) {
-            console.log("Polling error:", e.message);
+        } else {
+            message = result?.message || JSON.stringify(result);
+            files = result?.files || [];
         }
+    } catch (e) {
+        message = String(result);
+    }
+    return { message, files };
+}
+
+async function deliverResult(sock, jid, status, result) {
+    const { message, files } = parseResult(result);
+
+    // The status message becomes the result; overflow goes through the queue.
+    await status.finish(message ? message.slice(0, MAX_MESSAGE_LEN) : "Done.");
+    if (message && message.length > MAX_MESSAGE_LEN) {
+        queueText(sock, jid, message.slice(MAX_MESSAGE_LEN));
+    }
 
-    }, 2000);
+    // Baileys doesn't support streaming local files directly in all versions easily,
+    // so generated files are announced in a single message.
+    const existing = (files || []).filter((f) => fs.existsSync(f));
+    if (existing.length > 0) {
+        queueText(sock, jid, "Files generated:\n" + existing.map((f) => `- ${f}`).join("\n"));
+    }
 }
 
+sendToSynapse({ type: 'ready', pid: process.pid });
 connectToWhatsApp();
@@ -1,57 +1,251 @@
 import os
+import json
 import subprocess
 import threading
 import time
 from typing import Dict, Any
 from app.core.plugin_base import PluginBase
+from app.core.resource_monitor import register_shared_process, unregister_shared_process
+
+# Lines on the bridge's stdout starting with this prefix are channel messages;
+# everything else (QR code, Baileys logs) is passed through to our terminal.
+IPC_PREFIX = "@@synapse "
 
 class WhatsappPlugin(PluginBase):
+    """
+    Runs the Node.js Baileys bridge under a supervisor thread.
+
+    The supervisor installs npm dependencies off the startup path, restarts the
+    bridge with exponential backoff when it exits, and kills it when it stops
+    answering health pings. Baileys keeps its auth state on disk, so a restart
+    reconnects without a new QR scan.
+    """
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.process = None
         self.thread = None
+        self.supervisor = None
         self.plugin_dir = os.path.dirname(os.path.abspath(__file__))
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.progress_interval = self.config.get("progress_interval", 1.0)
+
+        # Supervisor settings
+        self.backoff_base = self.config.get("restart_backoff_base", 0.5)
+        self.backoff_max = self.config.get("restart_backoff_max", 30.0)
+        self.stable_after = self.config.get("restart_stable_after", 60.0)
+        self.health_interval = self.config.get("health_interval", 10.0)
+        self.health_timeout = self.config.get("health_timeout", 30.0)
+
+        # Supervisor state (reported by heartbeat)
+        self.state = "stopped"
+        self.connection = None
+        self.restarts = 0
+        self.last_exit_code = None
+        self.last_recovery_s = None
+        self.ping_rtt_ms = None
+        self._failures = 0
+        self._down_since = None
+        self._last_pong = 0.0
+        self._ping_id = 0
+        self._ping_sent = {}
+        self._task_jids = {} # task_id -> jid, so results survive a bridge restart
 
     def on_load(self):
-        """Starts the Node.js bridge."""
+        """Starts the bridge supervisor in the background."""
         print("[WhatsApp] Loading plugin...")
-        
-        # Check for node_modules
+        self._stop_event.clear()
+        self.supervisor = threading.Thread(target=self._supervise, name="whatsapp-supervisor", daemon=True)
+        self.supervisor.start()
+
+    def _install_dependencies(self) -> bool:
         node_modules = os.path.join(self.plugin_dir, "node_modules")
-        if not os.path.exists(node_modules):
-            print("[WhatsApp] Installing dependencies via npm...")
+        if os.path.exists(node_modules):
+            return True
+        self.state = "installing"
+        print("[WhatsApp] Installing dependencies via npm...")
+        try:
+            # Use local cache to avoid permission issues
+            subprocess.check_call(["npm", "install", "--cache", "./.npm-cache"], cwd=self.plugin_dir)
+            return True
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"[WhatsApp] Failed to install dependencies: {e}")
+            return False
+
+    def _supervise(self):
+        if not self._install_dependencies():
+            self.state = "error"
+            return
+
+        while not self._stop_event.is_set():
+            started = time.time()
+            if not self._start_node_process():
+                self._failures += 1
+                exited = "Bridge failed to start"
+            else:
+                self._watch_process()
+                unregister_shared_process(self.process.pid)
+                if self._stop_event.is_set():
+                    break
+                self.last_exit_code = self.process.returncode
+                if time.time() - started >= self.stable_after:
+                    self._failures = 0
+                self._failures += 1
+                exited = f"Bridge exited (code {self.last_exit_code})"
+
+            self._down_since = self._down_since or time.time()
+            self.state = "restarting"
+            delay = min(self.backoff_max, self.backoff_base * (2 ** (self._failures - 1)))
+            print(f"[WhatsApp] {exited}. Restarting in {delay:.1f}s...")
+            if self._stop_event.wait(delay):
+                break
+            self.restarts += 1
+
+        self.state = "stopped"
+
+    def _watch_process(self):
+        """Blocks until the bridge exits, pinging it and killing it if it goes unresponsive."""
+        process = self.process
+        self._last_pong = time.time()
+        while not self._stop_event.is_set():
             try:
-                # Use local cache to avoid permission issues
-                subprocess.check_call(["npm", "install", "--cache", "./.npm-cache"], cwd=self.plugin_dir)
-            except subprocess.CalledProcessError as e:
-                print(f"[WhatsApp] Failed to install dependencies: {e}")
+                process.wait(timeout=self.health_interval)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+            if time.time() - self._last_pong > self.health_timeout:
+                print(f"[WhatsApp] Bridge unresponsive for {self.health_timeout}s. Killing it.")
+                process.kill()
+                process.wait()
                 return
+            self._ping()
 
-        # Start Node.js process
-        self._start_node_process()
+    def _ping(self):
+        self._ping_id += 1
+        self._ping_sent = {self._ping_id: time.time()}
+        self._send({"type": "ping", "id": self._ping_id})
 
-    def _start_node_process(self):
-        """Starts the 'node index.js' subprocess."""
+    def _start_node_process(self) -> bool:
+        """Starts the 'node index.js' subprocess with a JSON-lines channel on stdin/stdout."""
         try:
             cmd = ["node", "index.js"]
             print(f"[WhatsApp] Starting bridge in {self.plugin_dir}...")
-            
-            # We want to pipe stdout so we can see the QR code in the main log
+            self.state = "starting"
+            self.connection = None
+
             self.process = subprocess.Popen(
                 cmd,
                 cwd=self.plugin_dir,
-                stdout=None, # Inherit stdout to show QR code in terminal
+                stdin=subprocess.PIPE,   # Synapse -> bridge messages
+                stdout=subprocess.PIPE,  # bridge -> Synapse messages + passthrough logs
                 stderr=None, # Inherit stderr
-                text=True
+                text=True,
+                bufsize=1
             )
+            # The supervisor may restart the bridge while some task runs; it is not that task's child.
+            register_shared_process(self.process.pid, "whatsapp")
+            self.thread = threading.Thread(target=self._read_loop, args=(self.process,), daemon=True)
+            self.thread.start()
             print(f"[WhatsApp] Bridge started (PID: {self.process.pid})")
-            
+            return True
+
         except Exception as e:
             print(f"[WhatsApp] Failed to start bridge: {e}")
+            return False
+
+    def _read_loop(self, process):
+        for line in process.stdout:
+            if not line.startswith(IPC_PREFIX):
+                print(line, end="")
+                continue
+            try:
+                msg = json.loads(line[len(IPC_PREFIX):])
+            except ValueError:
+                print(f"[WhatsApp] Malformed bridge message: {line.strip()}")
+                continue
+            try:
+                self._on_bridge_message(msg)
+            except Exception as e:
+                print(f"[WhatsApp] Error handling bridge message: {e}")
+
+    def _send(self, msg: Dict[str, Any]) -> bool:
+        process = self.process
+        if not process or process.poll() is not None:
+            return False
+        try:
+            with self._write_lock:
+                process.stdin.write(json.dumps(msg) + "\n")
+                process.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError, ValueError) as e:
+            print(f"[WhatsApp] Bridge channel write failed: {e}")
+            return False
+
+    def _on_bridge_message(self, msg: Dict[str, Any]):
+        kind = msg.get("type")
+        if kind == "command":
+            from app.core.orchestrator import Orchestrator
+            orc = Orchestrator.get_instance()
+            task_id = orc.create_task(msg.get("text", ""), {"channel": "whatsapp", "jid": msg.get("jid")})
+            self._task_jids[task_id] = msg.get("jid")
+            self._send({"type": "queued", "id": msg.get("id"), "task_id": task_id})
+            threading.Thread(target=self._run_task, args=(orc, task_id), daemon=True).start()
+        elif kind == "pong":
+            self._last_pong = time.time()
+            sent = self._ping_sent.pop(msg.get("id"), None)
+            if sent:
+                self.ping_rtt_ms = round((self._last_pong - sent) * 1000, 1)
+            self.connection = msg.get("connection", self.connection)
+        elif kind == "ready":
+            self._last_pong = time.time()
+            self.state = "running"
+            if self._down_since:
+                self.last_recovery_s = round(time.time() - self._down_since, 2)
+                self._down_since = None
+                print(f"[WhatsApp] Bridge recovered in {self.last_recovery_s}s.")
+        elif kind == "connection":
+            self.connection = msg.get("state")
+
+    def _run_task(self, orc, task_id: str):
+        """Runs a bridge command in the orchestrator, pushing progress and the final result."""
+        worker = threading.Thread(target=orc.handle_command, args=(task_id,), daemon=True)
+        worker.start()
+
+        last_progress = None
+        while worker.is_alive():
+            worker.join(self.progress_interval)
+            if not worker.is_alive():
+                break
+            task = orc.describe_task(task_id)
+            progress = task.get("progress") if task else None
+            if progress and progress != last_progress:
+                last_progress = progress
+                self._send({"type": "progress", "task_id": task_id, "plugin_id": task.get("plugin_id"), "progress": progress})
+
+        task = orc.describe_task(task_id) or {"status": "FAILED", "error": "Task not found."}
+        result = {
+            "type": "result",
+            "task_id": task_id,
+            "jid": self._task_jids.get(task_id),
+            "status": task.get("status"),
+            "result": task.get("result"),
+            "error": task.get("error")
+        }
+        # If the bridge is mid-restart, hold the result until it is back.
+        deadline = time.time() + self.backoff_max + self.health_timeout
+        while not self._send(result) and time.time() < deadline and not self._stop_event.is_set():
+            time.sleep(1)
+        self._task_jids.pop(task_id, None)
+
+    def notify(self, jid: str, text: str) -> bool:
+        """Sends a message to a chat outside of any command (used by Notifier)."""
+        return self._send({"type": "notify", "jid": jid, "text": text})
 
     def shutdown(self):
-        """Stops the Node.js subprocess."""
+        """Stops the supervisor and the Node.js subprocess."""
         print("[WhatsApp] Shutting down...")
+        self._stop_event.set()
         if self.process:
             self.process.terminate()
             try:
@@ -59,17 +253,32 @@ class WhatsappPlugin(PluginBase):
             except subprocess.TimeoutExpired:
                 self.process.kill()
             print("[WhatsApp] Bridge stopped.")
+        if self.supervisor and self.supervisor is not threading.current_thread():
+            # A restart must not overlap with this supervisor still respawning bridges.
+            self.supervisor.join(timeout=10)
+            if self.supervisor.is_alive():
+                print("[WhatsApp] Supervisor still running after 10s.")
 
     def execute(self, command: str, context: Dict[str, Any]) -> str:
         # This plugin doesn't handle internal commands yet, it's just a bridge.
-        return "WhatsApp bridge is running."
+        return f"WhatsApp bridge is {self.state} (restarts: {self.restarts})."
 
     def is_busy(self) -> bool:
         return self.process is not None and self.process.poll() is None
 
     def heartbeat(self) -> Dict[str, Any]:
-        alive = self.is_busy()
+        message = f"Restarts: {self.restarts}"
+        if self.last_recovery_s is not None:
+            message += f", last recovery {self.last_recovery_s}s"
+        if self.ping_rtt_ms is not None:
+            message += f", ping {self.ping_rtt_ms}ms"
         return {
-            "status": "running" if alive else "stopped",
-            "pid": self.process.pid if self.process else None
+            "status": self.state,
+            "progress": self.connection or "N/A",
+            "message": message,
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "last_recovery_s": self.last_recovery_s,
+            "ping_rtt_ms": self.ping_rtt_ms
         }
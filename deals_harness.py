@@ -0,0 +1,140 @@
+"""
+Local fixture server for the deals scrapers.
+
+  # 1. Serve canned eBay/Amazon/Slickdeals result pages
+  python deals_harness.py serve --port 8765 --block Amazon --js-only Slickdeals
+  #    config.json -> plugins.deals.base_urls = {"eBay": "http://127.0.0.1:8765", ...}
+
+  # 2. Or serve and scrape in one go, printing which path (HTTP or browser) each source took
+  python deals_harness.py run --product "iphone 16 pro" --block Amazon
+
+Pages are generated from the query. `--block` answers with a CAPTCHA page,
+`--js-only` with an empty shell that a plain fetch cannot see listings in (the
+browser fallback then runs), and `--delay` slows every response down.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from html import escape
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from app.core.config_manager import ConfigManager
+
+ROUTES = {"/sch/i.html": ("eBay", "_nkw"), "/s": ("Amazon", "k"), "/newsearch.php": ("Slickdeals", "q")}
+
+BLOCK_PAGE = "<html><head><title>Robot Check</title></head><body><form action='/errors/validateCaptcha'>Type the characters you see</form></body></html>"
+JS_SHELL = "<html><body><div id='root'></div><script src='/bundle.js'></script></body></html>"
+
+
+def render(source: str, query: str, count: int = 6) -> str:
+    q = escape(query)
+    rows = []
+    for i in range(count):
+        price = 99.0 + i * 50 if i else 12.99 # first listing looks like an accessory
+        name = f"{q} case" if i == 0 else f"{q} {64 * 2 ** i}GB"
+        if source == "eBay":
+            rows.append(f"<li class='s-item'><a class='s-item__link' href='/itm/{i}'>x</a>"
+                        f"<div class='s-item__title'>{name}</div><span class='s-item__price'>${price:,.2f}</span></li>")
+        elif source == "Amazon":
+            rows.append(f"<div class='s-result-item' data-component-type='s-search-result'><h2><a href='/dp/B0{i}'>{name}</a></h2>"
+                        f"<span class='a-price'><span class='a-offscreen'>${price:,.2f}</span></span></div>")
+        else:
+            rows.append(f"<div class='resultRow'><a class='dealTitle' href='https://slickdeals.net/f/{i}'>{name}</a>"
+                        f"<div class='price'>${price:,.2f}</div></div>")
+    return f"<html><body><ul>{''.join(rows)}</ul></body></html>"
+
+
+class FixtureServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, block=(), js_only=(), delay: float = 0):
+        self.hits = {}
+        harness = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                route = ROUTES.get(url.path)
+                if not route:
+                    self.send_error(404)
+                    return
+                source, param = route
+                harness.hits[source] = harness.hits.get(source, 0) + 1
+                time.sleep(delay)
+                if source in block:
+                    status, body = 503, BLOCK_PAGE
+                elif source in js_only:
+                    status, body = 200, JS_SHELL
+                else:
+                    status, body = 200, render(source, parse_qs(url.query).get(param, [""])[0])
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+
+def run_scrape(product: str, server: FixtureServer, runs: int):
+    from app.plugins.deals.deals_plugin import DealsPlugin
+    config = dict(ConfigManager.get_plugin_config("deals"), id="deals")
+    config["base_urls"] = {name: server.base_url for name, _ in ROUTES.values()}
+    # Keep the harness's path memory and price history out of the working directory,
+    # so a run leaves no price_history.db behind for the server to pick up.
+    workdir = tempfile.mkdtemp(prefix="deals_harness_")
+    config["paths_file"] = os.path.join(workdir, "deals_paths.json")
+    config["history"] = dict(config.get("history", {}), path=os.path.join(workdir, "price_history.db"))
+    plugin = DealsPlugin(config)
+    plugin.on_load()
+    try:
+        for run in range(runs):
+            start = time.time()
+            candidates, missing = plugin._scrape_all(product)
+            print(f"[Harness] Run {run + 1}: {len(candidates)} candidates in {time.time() - start:.2f}s"
+                  + (f", missing {', '.join(missing)}" if missing else ""))
+            for name, entry in plugin.engine.paths.sources.items():
+                print(f"[Harness]   {name}: {entry['path']}" + (f" ({entry['reason']})" if entry.get("reason") else ""))
+        print(f"[Harness] Fixture hits: {server.hits}")
+    finally:
+        plugin.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deals scraper fixture server")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("serve", "run"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--host", default="127.0.0.1")
+        cmd.add_argument("--port", type=int, default=8765 if name == "serve" else 0)
+        cmd.add_argument("--block", nargs="*", default=[], help="Sources that answer with a CAPTCHA page")
+        cmd.add_argument("--js-only", nargs="*", default=[], help="Sources whose listings need JavaScript")
+        cmd.add_argument("--delay", type=float, default=0)
+        if name == "run":
+            cmd.add_argument("--product", default="iphone 16 pro")
+            cmd.add_argument("--runs", type=int, default=2)
+
+    args = parser.parse_args()
+    ConfigManager.load()
+    server = FixtureServer(args.host, args.port, set(args.block), set(args.js_only), args.delay)
+    if args.cmd == "serve":
+        print(f"Deals fixtures on {server.base_url}")
+        server.server.serve_forever()
+    else:
+        run_scrape(args.product, server.start(), args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Offline benchmarks for the LLM-backed flows, using recorded fixtures.
+
+  # 1. Record a session against a real provider (appends to llm.replay.path)
+  LLM_RECORD=1 python llm_bench.py gcli --prompt "todo app with a REST API"
+  LLM_RECORD=1 python llm_bench.py deals --candidates candidates.json --product "iphone 16 pro"
+
+  # 2. Replay it offline, as often as you like
+  LLM_PROVIDER=replay python llm_bench.py gcli --prompt "todo app with a REST API" --runs 5
+  LLM_PROVIDER=replay python llm_bench.py deals --candidates candidates.json --product "iphone 16 pro" --runs 20
+
+`candidates.json` is a list of {source, price, link, name} dicts as returned by
+the deals scrapers. gcli runs write into a temporary projects root and stop
+before the build/docker steps. The LLM response cache is bypassed unless
+`--cache` is given, so recordings are complete and timings reflect the provider.
+"""
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from collections import defaultdict
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.core.config_manager import ConfigManager
+from app.core.llm_cache import LLMCache
+
+
+class Timer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def run(self, phase: str, fn, *args):
+        start = time.time()
+        result = fn(*args)
+        self.samples[phase].append(time.time() - start)
+        return result
+
+    def report(self):
+        print(f"{'phase':<24}{'runs':>6}{'median_s':>10}{'max_s':>10}")
+        for phase, values in self.samples.items():
+            print(f"{phase:<24}{len(values):>6}{statistics.median(values):>10.3f}{max(values):>10.3f}")
+
+
+def bench_gcli(prompt: str, feedback: str, runs: int):
+    from app.plugins.gcli.sdlc_workflow import SDLCManager
+    timer = Timer()
+    noop = lambda: None
+    for _ in range(runs):
+        manager = SDLCManager({})
+        manager.projects_root = tempfile.mkdtemp(prefix="gcli_bench_")
+        timer.run("start_new_project", manager.start_new_project, prompt, noop)
+        if manager.current_phase == "WAITING_FOR_CREDENTIALS":
+            timer.run("skip_credentials", manager.skip_credentials, noop)
+        timer.run("refine_requirements", manager.refine_requirements, feedback, noop)
+
+        project_path = manager._get_active_project_path()
+        with open(f"{project_path}/REQUIREMENTS.md") as f:
+            plan = f.read()
+        # Same prompt shape as resume_approval, minus the build and docker loops.
+        start = time.time()
+        first_file = []
+        write_files = manager._write_files
+        def timed_write(path, file_map):
+            if not first_file:
+                first_file.append(time.time() - start)
+            write_files(path, file_map)
+        manager._write_files = timed_write
+        written, _ = timer.run("generate_code", manager._stream_files, f"Return ONLY a JSON object that maps file paths to file contents.\nPlan: {plan}", project_path, noop)
+        if first_file:
+            timer.samples["first_file_written"].append(first_file[0])
+        print(f"[Bench] {project_path}: {len(written)} files")
+    timer.report()
+
+
+def bench_deals(candidates_path: str, product: str, runs: int):
+    from app.plugins.deals.deals_plugin import DealsPlugin
+    with open(candidates_path) as f:
+        candidates = json.load(f)
+    plugin = DealsPlugin({"id": "deals"})
+    timer = Timer()
+    for _ in range(runs):
+        winner = timer.run("analyze_with_llm", plugin._analyze_with_llm, candidates, product)
+    print(f"[Bench] Winner: {winner}")
+    timer.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline LLM flow benchmarks")
+    parser.add_argument("--cache", action="store_true", help="Allow LLM response cache hits")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    gcli = sub.add_parser("gcli", help="Time the GCLI planning, refine and code generation steps")
+    gcli.add_argument("--prompt", required=True)
+    gcli.add_argument("--feedback", default="Add unit tests and a health check endpoint.")
+    gcli.add_argument("--runs", type=int, default=1)
+
+    deals = sub.add_parser("deals", help="Time the deals LLM analysis on saved candidates")
+    deals.add_argument("--candidates", required=True, help="JSON file with scraped candidates")
+    deals.add_argument("--product", required=True)
+    deals.add_argument("--runs", type=int, default=1)
+
+    args = parser.parse_args()
+    ConfigManager.load()
+    LLMCache.get_instance().enabled = args.cache
+    if args.cmd == "gcli":
+        bench_gcli(args.prompt, args.feedback, args.runs)
+    else:
+        bench_deals(args.candidates, args.product, args.runs)
+
+
+if __name__ == "__main__":
+    main()
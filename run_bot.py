@@ -1,83 +1,27 @@
 import os
-import asyncio
-from telegram import Update
-from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
 from dotenv import load_dotenv
-import requests
+from app.core.config_manager import ConfigManager
+from app.core.telegram_bridge import TelegramBridge, HTTPSynapseClient, build_application
 
 load_dotenv()
 
-SYNAPSE_API = "http://127.0.0.1:8000/api/command"
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await context.bot.send_message(chat_id=update.effective_chat.id, text="Synapse Connected. Use /ag, /gcli, or /sys commands.")
-
-async def handle_msg(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
-    # Forward to Synapse API
-    try:
-        # We assume Synapse is running locally
-        res = requests.post(SYNAPSE_API, json={"text": text})
-        
-        if res.status_code == 200:
-            data = res.json()
-            task_id = data.get("task_id")
-            
-            await context.bot.send_message(chat_id=update.effective_chat.id, text=f"Command Queued (Task {task_id})...")
-            
-            # Poll for result
-            for _ in range(60): # 120 seconds timeout
-                await asyncio.sleep(2)
-                try:
-                    import json
-                    r_status = requests.get(f"http://127.0.0.1:8000/api/task/{task_id}")
-                    if r_status.status_code == 200:
-                        t_data = r_status.json()
-                        status = t_data.get("status")
-                        
-                        if status == "DONE":
-                            raw_result = t_data.get("result", "")
-                            # Try Parse JSON
-                            try:
-                                res_obj = json.loads(raw_result)
-                                message = res_obj.get("message", str(raw_result))
-                                files = res_obj.get("files", [])
-                            except:
-                                message = str(raw_result)
-                                files = []
-                                
-                            await context.bot.send_message(chat_id=update.effective_chat.id, text=message)
-                            
-                            # Send Files
-                            for fpath in files:
-                                if os.path.exists(fpath):
-                                    await context.bot.send_message(chat_id=update.effective_chat.id, text=f"Uploading {os.path.basename(fpath)}...")
-                                    with open(fpath, 'rb') as f:
-                                        await context.bot.send_document(chat_id=update.effective_chat.id, document=f)
-                            return
-                        elif status == "FAILED":
-                            await context.bot.send_message(chat_id=update.effective_chat.id, text=f"Error: {t_data.get('error')}")
-                            return
-                except Exception as e:
-                    print(f"Polling Error: {e}")
-                    pass
-            
-            await context.bot.send_message(chat_id=update.effective_chat.id, text="Task timed out (check logs).")
-        else:
-            await context.bot.send_message(chat_id=update.effective_chat.id, text=f"API Error: {res.status_code}")
-    except Exception as e:
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"Connection Error: {e}")
+SYNAPSE_URL = "http://127.0.0.1:8000"
 
 if __name__ == '__main__':
     t = os.getenv("TELEGRAM_TOKEN")
     if not t:
         print("Error: TELEGRAM_TOKEN not found in .env")
         exit(1)
-        
-    app = ApplicationBuilder().token(t).build()
-    app.add_handler(CommandHandler("start", start))
-    # Handle ALL text messages including commands that aren't /start
-    app.add_handler(MessageHandler(filters.TEXT, handle_msg))
-    
+
+    ConfigManager.load()
+    tg_cfg = ConfigManager.get_telegram_config()
+    if tg_cfg.get("mode") == "webhook":
+        # Updates are delivered to the API server at /api/telegram/<bot_id>; no polling loop needed.
+        print("Telegram webhook mode is enabled in config.json; the bot is served by the API server.")
+        exit(0)
+
+    bridge = TelegramBridge(HTTPSynapseClient(SYNAPSE_URL))
+    app = build_application(t, bridge, api_base_url=tg_cfg.get("api_base_url") or None)
+
     print("Bot Polling...")
     app.run_polling()
@@ -33,8 +33,9 @@ pkill -f "uvicorn app.main:app" || true
 sleep 2
 
 # 1. Start Backend Server
+# Plugins hot-reload themselves (SYNAPSE_HOT_RELOAD overrides plugin_loading.hot_reload), so uvicorn only restarts for core changes.
 echo "[*] Launching Backend Server (Uvicorn)..."
-python3 -m uvicorn app.main:app --reload &
+SYNAPSE_HOT_RELOAD=1 python3 -m uvicorn app.main:app --reload --reload-dir app --reload-exclude app/plugins &
 BACKEND_PID=$!
 
 # Wait a moment for server to initialize
@@ -0,0 +1,163 @@
+"""
+Offline test harness for the Telegram webhook mode.
+
+  # 1. Fake Bot API so the bots never talk to api.telegram.org
+  python telegram_harness.py fake-api --port 8081
+  #    config.json -> telegram.api_base_url = "http://127.0.0.1:8081"
+
+  # 2. Fire fake updates at the webhook and measure ingestion throughput
+  python telegram_harness.py load --bot-id 123456 --secret <webhook_secret> --count 500
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from app.core.telegram_webhook import TelegramWebhookManager
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> dict:
+    """Builds a minimal Telegram `Update` carrying a private text message."""
+    now = int(time.time())
+    update = {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": now,
+            "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text
+        }
+    }
+    if text.startswith("/"):
+        cmd_len = len(text.split(" ", 1)[0])
+        update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": cmd_len}]
+    return update
+
+
+class FakeBotAPI:
+    """Tiny stand-in for the Telegram Bot API that answers every call with success."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8081):
+        self.calls = {}
+        self._message_id = 0
+        self._lock = threading.Lock()
+        harness = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                result = harness.respond(method, body)
+                data = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def respond(self, method: str, body: bytes):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self._message_id += 1
+            message_id = self._message_id
+
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Synapse", "username": "synapse_fake_bot"}
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            return {"message_id": message_id, "date": int(time.time()), "chat": {"id": 0, "type": "private"}, "text": ""}
+        if method == "sendMediaGroup":
+            return []
+        return True
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+
+def run_load(url: str, secret: str, count: int, concurrency: int, batch: int, chat_count: int, text: str):
+    """Posts `count` fake updates to the webhook and reports throughput and latency."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret}
+    base_id = random.randint(1, 10**9)
+
+    def post(start):
+        nonlocal errors
+        updates = [
+            make_update(base_id + i, 1000 + (i % chat_count), text)
+            for i in range(start, min(start + batch, count))
+        ]
+        payload = updates if batch > 1 else updates[0]
+        t0 = time.perf_counter()
+        try:
+            res = session.post(url, json=payload, headers=headers, timeout=10)
+            ok = res.status_code == 200
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(post, range(0, count, batch)))
+    total = time.perf_counter() - t_start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"Sent {count} updates in {len(latencies)} requests ({errors} errors) in {total:.2f}s")
+    print(f"Throughput: {count / total:.1f} updates/s")
+    if latencies:
+        print(f"Latency p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram webhook test harness")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    fake = sub.add_parser("fake-api", help="Run a fake Telegram Bot API server")
+    fake.add_argument("--host", default="127.0.0.1")
+    fake.add_argument("--port", type=int, default=8081)
+
+    load = sub.add_parser("load", help="Send fake updates to the webhook endpoint")
+    load.add_argument("--server", default="http://127.0.0.1:8000")
+    load.add_argument("--bot-id", required=True)
+    load.add_argument("--secret", required=True, help="telegram.webhook_secret from config.json")
+    load.add_argument("--count", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--batch", type=int, default=1, help="Updates per request (>1 posts a JSON list)")
+    load.add_argument("--chats", type=int, default=10, help="Number of distinct fake chats")
+    load.add_argument("--text", default="ping")
+
+    args = parser.parse_args()
+    if args.cmd == "fake-api":
+        api = FakeBotAPI(args.host, args.port)
+        print(f"Fake Telegram Bot API on http://{args.host}:{args.port}")
+        api.serve_forever()
+    else:
+        url = f"{args.server.rstrip('/')}/api/telegram/{args.bot_id}"
+        secret = TelegramWebhookManager.derive_secret(args.secret, args.bot_id)
+        run_load(url, secret, args.count, args.concurrency, args.batch, args.chats, args.text)
+
+
+if __name__ == "__main__":
+    main()